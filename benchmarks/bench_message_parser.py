@@ -0,0 +1,33 @@
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from src.message_parser import MessageParser
+
+# parse cost per message for every built-in format, valid and invalid input
+
+MESSAGES = {
+    'XAUUSD': '🟢XAUUSD🟢\n現價: 2650.12\n\nPotential Uptrend Started',
+    'XAUUSD_COMBO': 'XAUUSD 1/3 Combo\n入場方向: Long🟢\n現價: 2650.12\n\n\n\n15mins: Uptrend\n1hr: Downtrend',
+    'NVDA': '🔴NVDA🔴\n現價: 135.5\n\nPotential Downtrend Started',
+}
+INVALID = 'Good morning everyone\nno signal today'
+
+def make_event(text: str):
+    return SimpleNamespace(raw_text=text, message=SimpleNamespace(date=datetime.now(timezone.utc)))
+
+def bench(parser: MessageParser, message_type: str, text: str, number: int) -> float:
+    event = make_event(text)
+    return min(timeit.repeat(lambda: parser.parse(event, message_type), number=number, repeat=5)) / number
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    parser = MessageParser()
+    print(f"{'format':<14}{'input':<9}{'us/msg':>9}")
+    for message_type, text in MESSAGES.items():
+        for label, sample in (('valid', text), ('invalid', INVALID)):
+            cost = bench(parser, message_type, sample, number)
+            print(f"{message_type:<14}{label:<9}{cost * 1e6:>9.2f}")
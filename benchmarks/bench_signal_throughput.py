@@ -0,0 +1,149 @@
+import argparse
+import asyncio
+import copy
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+from src.replay import make_event
+from src.telegram_bot import TelegramBot
+from src.tracing import percentile
+
+# Signals per second and per-signal latency of TelegramBot.handle_channel_message,
+# driven with synthetic NewMessage events against MT5 workers running src.fake_mt5.
+# Sweeps traders x order legs x burst size (signals arriving at the same moment).
+#
+# py ./benchmarks/bench_signal_throughput.py --latency 0.002 --save baseline.json
+# py ./benchmarks/bench_signal_throughput.py --latency 0.002 --baseline baseline.json --tolerance 0.25
+# exits with 1 when any case loses more than tolerance of its baseline throughput or p99
+
+PEER_ID = 678910
+SIGNAL = 'XAUUSD 1/3 Combo\n入場方向: Long🟢\n現價: {price}\n\n\n\n15mins: Uptrend\n1hr: Uptrend'
+
+class CollectingNotifier:
+    def __init__(self):
+        self.count = 0
+
+    def enqueue(self, chat_id: int, message: str):
+        self.count += 1
+
+    async def close(self, timeout: float = 5):
+        return
+
+def make_config(traders: int, legs: int) -> Dict[str, Any]:
+    with open(os.path.join(ROOT, 'config.example.json'), 'r', encoding='utf-8') as file:
+        config = json.load(file)
+    config['mt5_module'] = 'src.fake_mt5'
+    config['mt5_mode'] = 'process'
+    config['trace_log'] = ''
+    # message ids restart at 1 every case, a signal index would skip them as already handled
+    config['signal_index'] = ''
+    config['trade_journal'] = ''
+    config['catch_up_state'] = ''
+    config['metrics_port'] = 0
+    config['signals'] = [signal for signal in config['signals'] if signal['telegram_source_peer_id'] == str(PEER_ID)]
+    template = config['traders'][0]
+    template.update({
+        'acceptable_price_diff': 1000,
+        'order_probability': 100,
+        'max_total_positions': {'buy': 10 ** 9, 'sell': 10 ** 9},
+        'daily_margin': 10 ** 9,
+        'noti_chat_id': '1',
+        'risk_rules': [],
+    })
+    template['orders'] = [copy.deepcopy(template['orders'][0]) for _ in range(legs)]
+    config['traders'] = []
+    for idx in range(traders):
+        trader = copy.deepcopy(template)
+        trader['id'] = f'trader-{idx + 1}'
+        trader['mt5_login'] = str(idx + 1)
+        config['traders'].append(trader)
+    return config
+
+async def run_case(traders: int, legs: int, burst: int, rounds: int) -> Dict[str, float]:
+    bot = TelegramBot(make_config(traders, legs))
+    bot.notifier = CollectingNotifier()
+    await bot.traders.start()
+    message_ids = itertools.count(1)
+    latencies: List[float] = []
+
+    async def handle(event):
+        start = time.perf_counter()
+        await bot.handle_channel_message(event)
+        latencies.append(time.perf_counter() - start)
+
+    try:
+        # warm up the workers, tick streams and position books
+        await handle(make_event({'peer_id': PEER_ID, 'id': next(message_ids), 'date': time.time(), 'text': SIGNAL.format(price=2650)}))
+        latencies.clear()
+        started = time.perf_counter()
+        for _ in range(rounds):
+            events = [
+                make_event({'peer_id': PEER_ID, 'id': next(message_ids), 'date': time.time(), 'text': SIGNAL.format(price=2650)})
+                for _ in range(burst)
+            ]
+            await asyncio.gather(*(handle(event) for event in events))
+        elapsed = time.perf_counter() - started
+    finally:
+        await bot.traders.shutdown()
+    latencies.sort()
+    return {
+        'signals_per_s': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    regressions = []
+    for case, result in results.items():
+        base = baseline.get(case)
+        if base == None:
+            continue
+        if result['signals_per_s'] < base['signals_per_s'] * (1 - tolerance):
+            regressions.append(f"{case}: {result['signals_per_s']:.1f} signals/s < baseline {base['signals_per_s']:.1f}")
+        if result['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{case}: p99 {result['p99_ms']:.2f}ms > baseline {base['p99_ms']:.2f}ms")
+    return regressions
+
+def parse_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',')]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Signal processing throughput benchmark')
+    parser.add_argument('--traders', type=parse_list, default=[1, 2, 4])
+    parser.add_argument('--legs', type=parse_list, default=[1, 3])
+    parser.add_argument('--burst', type=parse_list, default=[1, 5])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.002, help='fake MT5 latency per terminal call in seconds')
+    parser.add_argument('--save', help='write results as a baseline json')
+    parser.add_argument('--baseline', help='compare against a baseline json and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    # read by src.fake_mt5 in every spawned worker
+    os.environ['FAKE_MT5_LATENCY'] = str(args.latency)
+    # TelegramClient writes its session file to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='mt5-bench-'))
+
+    results = {}
+    print(f"{'traders':>8}{'legs':>6}{'burst':>7}{'signals/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for traders, legs, burst in itertools.product(args.traders, args.legs, args.burst):
+        result = asyncio.run(run_case(traders, legs, burst, args.rounds))
+        results[f'{traders}x{legs}x{burst}'] = result
+        print(f"{traders:>8}{legs:>6}{burst:>7}{result['signals_per_s']:>12.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+    if args.save:
+        with open(os.path.join(ROOT, args.save) if not os.path.isabs(args.save) else args.save, 'w') as file:
+            json.dump(results, file, indent=4)
+    if args.baseline:
+        with open(os.path.join(ROOT, args.baseline) if not os.path.isabs(args.baseline) else args.baseline, 'r') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
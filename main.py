@@ -5,7 +5,7 @@ import asyncio
 if __name__ == "__main__":
     with open('config.json', 'r') as file:
         config = json.load(file)
-    bot = TelegramBot(config)
+    bot = TelegramBot(config, 'config.json')
     try:
         # asyncio.run(bot.print_telegram_channels())
         asyncio.run(bot.start())
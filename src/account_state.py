@@ -0,0 +1,90 @@
+import numpy as np
+from typing import Dict, Iterable, List, Tuple
+
+# Positions and deals as NumPy structured arrays, one column per field, so the
+# account totals are computed with array operations instead of a dict (and a
+# datetime) per row. Times stay in MT5 server seconds, as positions_get and
+# history_deals_get return them. The arrays pickle as a single buffer, which
+# keeps the RPC from the worker process cheap too.
+
+POSITION_TYPE_BUY = 0 # ENUM_POSITION_TYPE.POSITION_TYPE_BUY
+POSITION_TYPE_SELL = 1 # ENUM_POSITION_TYPE.POSITION_TYPE_SELL
+
+POSITION_DTYPE = np.dtype([
+    ('ticket', 'i8'), ('time', 'i8'), ('type', 'i1'), ('magic', 'i8'), ('volume', 'f8'), ('price_open', 'f8'),
+    ('price_current', 'f8'), ('sl', 'f8'), ('tp', 'f8'), ('profit', 'f8'), ('swap', 'f8'), ('symbol', 'U32'),
+])
+DEAL_DTYPE = np.dtype([
+    ('ticket', 'i8'), ('order', 'i8'), ('time', 'i8'), ('type', 'i1'), ('entry', 'i1'), ('magic', 'i8'), ('position_id', 'i8'),
+    ('volume', 'f8'), ('price', 'f8'), ('commission', 'f8'), ('swap', 'f8'), ('profit', 'f8'), ('symbol', 'U32'),
+])
+
+def positions_array(positions: Iterable) -> np.ndarray:
+    # positions_get result -> POSITION_DTYPE array
+    return np.fromiter(
+        ((
+            pos.ticket, pos.time, pos.type, pos.magic, pos.volume, pos.price_open,
+            pos.price_current, pos.sl, pos.tp, pos.profit, pos.swap, pos.symbol,
+        ) for pos in positions),
+        dtype=POSITION_DTYPE,
+    )
+
+def deals_array(deals: Iterable) -> np.ndarray:
+    # history_deals_get result -> DEAL_DTYPE array
+    return np.fromiter(
+        ((
+            deal.ticket, deal.order, deal.time, deal.type, deal.entry, deal.magic, deal.position_id,
+            deal.volume, deal.price, deal.commission, deal.swap, deal.profit, deal.symbol,
+        ) for deal in deals),
+        dtype=DEAL_DTYPE,
+    )
+
+def _symbol_rows(positions: np.ndarray, symbol: str | None) -> np.ndarray:
+    return positions if symbol == None else positions[positions['symbol'] == symbol]
+
+def side_counts(positions: np.ndarray, symbol: str | None = None) -> Tuple[int, int]:
+    # (buy positions, sell positions)
+    sides = _symbol_rows(positions, symbol)['type']
+    sell = int(np.count_nonzero(sides == POSITION_TYPE_SELL))
+    return len(sides) - sell, sell
+
+def exposure(positions: np.ndarray, symbol: str | None = None) -> Tuple[float, float]:
+    # (buy lots, sell lots)
+    rows = _symbol_rows(positions, symbol)
+    sell = rows['type'] == POSITION_TYPE_SELL
+    return float(rows['volume'][~sell].sum()), float(rows['volume'][sell].sum())
+
+def floating_pnl(positions: np.ndarray, symbol: str | None = None) -> float:
+    rows = _symbol_rows(positions, symbol)
+    return float(rows['profit'].sum() + rows['swap'].sum())
+
+def realized_pnl(deals: np.ndarray, start: float | None = None, end: float | None = None) -> float:
+    # profit + commission of the deals in [start, end], server time
+    mask = np.ones(len(deals), dtype=bool)
+    if start != None:
+        mask &= deals['time'] >= start
+    if end != None:
+        mask &= deals['time'] <= end
+    return float(deals['profit'][mask].sum() + deals['commission'][mask].sum())
+
+def position_totals(positions: np.ndarray) -> Dict[Tuple[str, int], List[float]]:
+    # (symbol, magic) -> [buy count, sell count, buy volume, sell volume], see PositionBook
+    if len(positions) == 0:
+        return {}
+    # one group per symbol x magic, unique on the two columns apart is much
+    # faster than on the (symbol, magic) records
+    symbols, symbol_idx = np.unique(positions['symbol'], return_inverse=True)
+    magics, magic_idx = np.unique(positions['magic'], return_inverse=True)
+    group = symbol_idx * len(magics) + magic_idx
+    groups = len(symbols) * len(magics)
+    sell = positions['type'] == POSITION_TYPE_SELL
+    volume = positions['volume']
+    buy_count = np.bincount(group, weights=~sell, minlength=groups)
+    sell_count = np.bincount(group, weights=sell, minlength=groups)
+    buy_volume = np.bincount(group, weights=np.where(sell, 0.0, volume), minlength=groups)
+    sell_volume = np.bincount(group, weights=np.where(sell, volume, 0.0), minlength=groups)
+    return {
+        (str(symbols[idx // len(magics)]), int(magics[idx % len(magics)])): [
+            int(buy_count[idx]), int(sell_count[idx]), float(buy_volume[idx]), float(sell_volume[idx]),
+        ] for idx in np.flatnonzero(buy_count + sell_count)
+    }
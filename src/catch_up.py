@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable, Dict, List, Tuple
+from telethon import TelegramClient, events
+from .metrics import REGISTRY
+
+# Last handled message id per signal chat, kept on disk between runs. At start
+# and whenever telethon reconnects, the messages posted since then are fetched
+# with one get_messages(min_id=...) per chat and filtered by age in one pass:
+# only messages younger than max_age seconds (the 30s the timestamp check
+# allows) are handed to the bot, the stale ones only move the cursor. At most
+# `limit` messages are fetched per chat, newest first, anything older than the
+# newest `limit` is stale anyway.
+
+CATCH_UP_MESSAGES = REGISTRY.counter('catch_up_messages_total', 'Messages fetched after a reconnect', ('result',))
+
+class CatchUpClient(TelegramClient):
+    # telethon has no public reconnect event. Its sender is handed the bound
+    # _handle_auto_reconnect when the client is built, so it has to be overridden
+    # in a subclass, patching the attribute on an instance later has no effect.
+    on_reconnect: Callable[[], Awaitable[None]] | None = None
+
+    async def _handle_auto_reconnect(self):
+        await super()._handle_auto_reconnect()
+        if self.on_reconnect != None:
+            await self.on_reconnect()
+
+class CatchUp:
+    def __init__(self, path: str, max_age: float = 30, limit: int = 100):
+        self.path = path
+        self.max_age = max_age
+        self.limit = limit
+        # marked chat id (str, json keys) -> last message id
+        self.last_ids: Dict[str, int] = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    self.last_ids = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable catch up state {path}: {e!r}")
+
+    def advance(self, chat_id: int, message_id: int):
+        # called for every handled message, saved later by save()
+        if message_id > self.last_ids.get(str(chat_id), 0):
+            self.last_ids[str(chat_id)] = message_id
+            self._dirty = True
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.last_ids, file, indent=4)
+        os.replace(temp_path, self.path)
+
+    async def fetch(self, client, chats: List[int], now: float) -> Tuple[List, List[Tuple[int, int]]]:
+        # (fresh NewMessage events oldest first, (chat id, message id) of the stale ones)
+        batches = await asyncio.gather(*(
+            client.get_messages(chat_id, min_id=self.last_ids.get(str(chat_id), 0), limit=self.limit) for chat_id in chats
+        ), return_exceptions=True)
+        fresh = []
+        stale = []
+        for chat_id, messages in zip(chats, batches):
+            if isinstance(messages, Exception):
+                print(f"[CatchUp] Failed to fetch {chat_id}: {messages!r}")
+                continue
+            for message in messages:
+                if now - message.date.timestamp() <= self.max_age:
+                    fresh.append(events.NewMessage.Event(message))
+                else:
+                    stale.append((chat_id, message.id))
+                self.advance(chat_id, message.id)
+        fresh.sort(key=lambda event: (event.message.date, event.message.id))
+        CATCH_UP_MESSAGES.inc(('fresh',), len(fresh))
+        CATCH_UP_MESSAGES.inc(('stale',), len(stale))
+        return fresh, stale
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, NamedTuple
+from .message_parser import MessageParser
+from .mt5_async import DEFAULT_TIMEOUTS
+from .risk import RiskEngine
+from .session_calendar import SessionCalendar
+
+# Watches config.json while the bot runs. A changed file is validated, diffed
+# against the running config and only the changed parts are applied by
+# TelegramBot.apply_config: routing table, trader parameters, MT5 workers of
+# added / removed traders. A config that fails validation is reported and the
+# running config stays as it is.
+
+# a change to any of these logs the trader's worker in again
+RESTART_KEYS = ('ticker', 'mt5_login', 'mt5_password', 'mt5_server', 'mt5_path', 'timezone_adjust', 'tick_stream_interval', 'max_tick_staleness')
+# only read at startup
+STATIC_KEYS = (
+    'telegram', 'notification', 'trace_log', 'trade_journal', 'signal_index', 'signal_index_ttl', 'dialog_cache',
+    'mt5_module', 'mt5_mode', 'config_reload_interval', 'metrics_host', 'metrics_port',
+    'catch_up_state', 'catch_up_max_age', 'catch_up_limit',
+)
+REQUIRED_SIGNAL_KEYS = ('ticker', 'telegram_source_chat_id', 'telegram_source_peer_id', 'message_type')
+REQUIRED_TRADER_KEYS = (
+    'id', 'ticker', 'mt5_server', 'mt5_login', 'mt5_password', 'mt5_path', 'noti_chat_id', 'timezone_adjust',
+    'acceptable_price_diff', 'max_total_positions', 'daily_margin', 'daily_margin_cutoff_timezone',
+    'order_probability', 'orders', 'noise_order_probaility', 'noise_order',
+)
+ORDER_KEYS = ('lot', 'sl', 'tp', 'noise_sl', 'noise_tp', 'deviation')
+
+class ConfigDiff(NamedTuple):
+    added: List[str] # trader ids
+    removed: List[str]
+    reconnected: List[str] # RESTART_KEYS changed
+    updated: List[str] # other trader keys changed
+    signals_changed: bool
+    chats_changed: bool
+    formats_changed: bool
+    static_changed: List[str] # ignored until restart
+
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.reconnected or self.updated or self.signals_changed or self.formats_changed)
+
+def validate_config(config: Dict[str, Any]):
+    # raises ValueError with every problem found
+    errors = []
+    try:
+        parser = MessageParser(config.get('message_formats'))
+    except Exception as e:
+        errors.append(f'message_formats: {e!r}')
+        parser = MessageParser()
+    for idx, signal in enumerate(config.get('signals', [])):
+        missing = [key for key in REQUIRED_SIGNAL_KEYS if key not in signal]
+        if missing:
+            errors.append(f'signals[{idx}] missing {missing}')
+            continue
+        for key in ('telegram_source_chat_id', 'telegram_source_peer_id'):
+            try:
+                int(signal[key])
+            except (ValueError, TypeError):
+                errors.append(f'signals[{idx}].{key} is not a number')
+        if signal['message_type'] not in parser.formats:
+            errors.append(f'signals[{idx}].message_type {signal['message_type']} is unknown')
+
+    traders = config.get('traders', [])
+    if config.get('mt5_mode', 'process') == 'thread' and len(traders) > 1:
+        errors.append("mt5_mode 'thread' supports one trader only")
+    ids = set()
+    for idx, trader_config in enumerate(traders):
+        missing = [key for key in REQUIRED_TRADER_KEYS if key not in trader_config]
+        if missing:
+            errors.append(f'traders[{idx}] missing {missing}')
+            continue
+        if trader_config['id'] in ids:
+            errors.append(f'traders[{idx}].id {trader_config['id']} is duplicated')
+        ids.add(trader_config['id'])
+        try:
+            int(trader_config['mt5_login'])
+            int(trader_config['noti_chat_id'])
+            float(trader_config['acceptable_price_diff'])
+            int(trader_config['daily_margin'])
+            int(trader_config['daily_margin_cutoff_timezone'])
+            int(trader_config['max_total_positions']['buy'])
+            int(trader_config['max_total_positions']['sell'])
+            for order_config in trader_config['orders'] + trader_config['noise_order']:
+                for key in ORDER_KEYS:
+                    float(order_config[key])
+        except (ValueError, TypeError, KeyError) as e:
+            errors.append(f'traders[{idx}] ({trader_config['id']}) invalid value: {e!r}')
+        for key in ('order_probability', 'noise_order_probaility'):
+            if not 0 <= trader_config[key] <= 100:
+                errors.append(f'traders[{idx}].{key} is not in 0 to 100')
+        unknown_timeouts = [key for key in trader_config.get('mt5_timeouts', {}) if key not in DEFAULT_TIMEOUTS]
+        if unknown_timeouts:
+            errors.append(f'traders[{idx}].mt5_timeouts unknown {unknown_timeouts}')
+        try:
+            RiskEngine(trader_config)
+        except (ValueError, KeyError) as e:
+            errors.append(f'traders[{idx}].risk_rules: {e}')
+        try:
+            SessionCalendar(trader_config.get('trading_sessions'), trader_config['timezone_adjust'])
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append(f'traders[{idx}].trading_sessions: {e}')
+    if errors:
+        raise ValueError('Invalid config:\n' + '\n'.join(errors))
+
+def diff_config(old: Dict[str, Any], new: Dict[str, Any]) -> ConfigDiff:
+    old_traders = {trader_config['id']: trader_config for trader_config in old['traders']}
+    new_traders = {trader_config['id']: trader_config for trader_config in new['traders']}
+    reconnected = []
+    updated = []
+    for trader_id, trader_config in new_traders.items():
+        old_config = old_traders.get(trader_id)
+        if old_config == None or old_config == trader_config:
+            continue
+        if any(old_config.get(key) != trader_config.get(key) for key in RESTART_KEYS):
+            reconnected.append(trader_id)
+        else:
+            updated.append(trader_id)
+    return ConfigDiff(
+        added=[trader_id for trader_id in new_traders if trader_id not in old_traders],
+        removed=[trader_id for trader_id in old_traders if trader_id not in new_traders],
+        reconnected=reconnected,
+        updated=updated,
+        # trader order decides routing too
+        signals_changed=old['signals'] != new['signals'] or list(old_traders) != list(new_traders),
+        chats_changed={signal['telegram_source_chat_id'] for signal in old['signals']} != {signal['telegram_source_chat_id'] for signal in new['signals']},
+        formats_changed=old.get('message_formats') != new.get('message_formats'),
+        static_changed=[key for key in STATIC_KEYS if old.get(key) != new.get(key)],
+    )
+
+class ConfigManager:
+    def __init__(self, bot, path: str, interval: float = 2):
+        self.bot = bot
+        self.path = path
+        self.interval = interval
+        self._stamp = self._read_stamp()
+
+    def _read_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    async def run(self):
+        if self.bot.traders_ready != None:
+            # a reload swaps workers, not while the first ones are logging in
+            await asyncio.shield(self.bot.traders_ready)
+        while True:
+            await asyncio.sleep(self.interval)
+            stamp = self._read_stamp()
+            if stamp == None or stamp == self._stamp:
+                continue
+            self._stamp = stamp
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f'[Config] Reload failed, keeping the running config: {e}')
+
+    async def reload(self):
+        with open(self.path, 'r', encoding='utf-8') as file:
+            config = json.load(file)
+        validate_config(config)
+        diff = diff_config(self.bot.config, config)
+        if diff.static_changed:
+            print(f'[Config] {diff.static_changed} only apply after a restart')
+            # keep running with the values the bot started with
+            for key in diff.static_changed:
+                if key in self.bot.config:
+                    config[key] = self.bot.config[key]
+                else:
+                    config.pop(key, None)
+        if diff.empty():
+            return
+        await self.bot.apply_config(config, diff)
+        print(
+            f'[Config] Reloaded: added {diff.added}, removed {diff.removed}, reconnected {diff.reconnected}, '
+            f'updated {diff.updated}, signals changed: {diff.signals_changed}'
+        )
@@ -0,0 +1,34 @@
+import json
+import os
+from typing import Dict, Iterable
+
+# chat id -> title of the dialogs the bot listens to, kept on disk between runs.
+# The access hashes live in telethon's session file, so a warm start resolves the
+# configured chats without downloading the dialog list.
+
+class DialogCache:
+    def __init__(self, path: str):
+        self.path = path
+        self.titles: Dict[str, str] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    self.titles = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable dialog cache {path}: {e!r}")
+
+    def get(self, chat_id: str) -> str | None:
+        return self.titles.get(str(chat_id))
+
+    def update(self, dialogs: Iterable):
+        for dialog in dialogs:
+            self.titles[str(dialog.id)] = dialog.title
+
+    def save(self):
+        if not self.path:
+            return
+        # replaced in one rename, a crash never leaves half a file
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.titles, file, ensure_ascii=False, indent=4)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+# One FIFO queue and worker task per trading account. Jobs of different
+# accounts run at the same time, jobs of one account run one after another in
+# submission order, so two signals close together cannot both pass the
+# max positions or daily margin check of the same account.
+class AccountDispatcher:
+    def __init__(self):
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+
+    def submit(self, account_id: str, job: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        queue = self._queues.get(account_id)
+        if queue == None:
+            queue = self._queues[account_id] = asyncio.Queue()
+            self._workers[account_id] = asyncio.create_task(self._run(queue), name=f'dispatch-{account_id}')
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((job, future))
+        return future
+
+    async def _run(self, queue: asyncio.Queue):
+        while True:
+            job, future = await queue.get()
+            try:
+                if future.cancelled():
+                    continue
+                try:
+                    result = await job()
+                except Exception as e:
+                    if not future.cancelled():
+                        future.set_exception(e)
+                else:
+                    if not future.cancelled():
+                        future.set_result(result)
+            finally:
+                queue.task_done()
+
+    def depth(self, account_id: str) -> int:
+        queue = self._queues.get(account_id)
+        return queue.qsize() if queue != None else 0
+
+    async def drain(self, account_id: str, timeout: float = 10):
+        # wait for the jobs already queued for one account
+        queue = self._queues.get(account_id)
+        if queue == None:
+            return
+        try:
+            await asyncio.wait_for(queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[Dispatcher] {account_id} still busy after {timeout}s")
+
+    async def close(self, timeout: float = 10):
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues.values())), timeout)
+        except asyncio.TimeoutError:
+            print("[Dispatcher] Pending signals dropped on shutdown")
+        for task in self._workers.values():
+            task.cancel()
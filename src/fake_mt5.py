@@ -0,0 +1,180 @@
+# In-memory stand-in for the MetaTrader5 package.
+# Set "mt5_module": "src.fake_mt5" in config.json to run the bot without a
+# terminal (dry run). Each worker process gets its own copy of this state.
+# FAKE_MT5_LATENCY (seconds) adds a delay to every terminal call, like the IPC
+# round trip of a real terminal.
+# FAKE_MT5_OUTAGE="after:duration" (seconds) drops the terminal connection
+# `after` seconds from initialize, for `duration` seconds. Calls return None
+# meanwhile and initialize fails until the outage is over.
+# FAKE_MT5_TRADE_MODE sets symbol_info().trade_mode (default 4, full access).
+import os
+import random
+import time
+from collections import namedtuple
+from typing import Dict, List
+
+TRADE_ACTION_DEAL = 1
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TIME_GTC = 0
+ORDER_FILLING_IOC = 1
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+SYMBOL_TRADE_MODE_DISABLED = 0
+SYMBOL_TRADE_MODE_LONGONLY = 1
+SYMBOL_TRADE_MODE_SHORTONLY = 2
+SYMBOL_TRADE_MODE_CLOSEONLY = 3
+SYMBOL_TRADE_MODE_FULL = 4
+
+SymbolInfo = namedtuple('SymbolInfo', ['name', 'point', 'digits', 'trade_mode'])
+Tick = namedtuple('Tick', ['time', 'bid', 'ask', 'last', 'time_msc'])
+TerminalInfo = namedtuple('TerminalInfo', ['connected', 'trade_allowed', 'name'])
+AccountInfo = namedtuple('AccountInfo', ['login', 'server', 'balance', 'equity', 'profit'])
+TradePosition = namedtuple('TradePosition', [
+    'ticket', 'time', 'type', 'magic', 'volume', 'price_open', 'price_current', 'sl', 'tp', 'profit', 'swap', 'symbol', 'comment',
+])
+TradeDeal = namedtuple('TradeDeal', ['ticket', 'order', 'time', 'type', 'entry', 'magic', 'position_id', 'volume', 'price', 'commission', 'swap', 'profit', 'symbol', 'comment'])
+OrderSendResult = namedtuple('OrderSendResult', ['retcode', 'deal', 'order', 'volume', 'price', 'bid', 'ask', 'comment', 'request_id'])
+
+_state = {
+    'login': 0,
+    'server': '',
+    'balance': 10000.0,
+    'price': 2650.0,
+    'spread': 0.2,
+    'point': 0.01,
+    'trade_mode': int(os.environ.get('FAKE_MT5_TRADE_MODE', 4)),
+    'next_ticket': 1,
+    # broker server clock is ahead of UTC, matches "timezone_adjust": 2 in config.example.json
+    'server_offset': 2 * 60 * 60,
+    'latency': float(os.environ.get('FAKE_MT5_LATENCY', 0)),
+    'initialized': False,
+    'outage': [float(value) for value in os.environ.get('FAKE_MT5_OUTAGE', '').split(':') if value],
+    'outage_start': None,
+    'outage_end': None,
+}
+_positions: Dict[int, TradePosition] = {}
+_deals: List[TradeDeal] = []
+
+
+def initialize(path: str = '', login: int = 0, password: str = '', server: str = '', **kwargs) -> bool:
+    if _state['outage_start'] == None and len(_state['outage']) == 2:
+        _state['outage_start'] = time.time() + _state['outage'][0]
+        _state['outage_end'] = _state['outage_start'] + _state['outage'][1]
+    if _in_outage():
+        return False
+    _state['login'] = login
+    _state['server'] = server
+    _state['initialized'] = True
+    return True
+
+
+def shutdown() -> None:
+    _state['initialized'] = False
+    return None
+
+
+def last_error():
+    if not _connected():
+        return (-10004, 'No IPC connection')
+    return (1, 'Success')
+
+
+def _in_outage() -> bool:
+    return _state['outage_start'] != None and _state['outage_start'] <= time.time() < _state['outage_end']
+
+
+def _connected() -> bool:
+    if _in_outage():
+        # the terminal dropped, it needs initialize again afterwards
+        _state['initialized'] = False
+    return _state['initialized']
+
+
+def _next_ticket() -> int:
+    ticket = _state['next_ticket']
+    _state['next_ticket'] += 1
+    return ticket
+
+
+def _wait() -> None:
+    if _state['latency'] > 0:
+        time.sleep(_state['latency'])
+
+
+def _server_time() -> float:
+    return time.time() + _state['server_offset']
+
+
+def _move_price() -> None:
+    _state['price'] = round(_state['price'] + random.uniform(-0.05, 0.05), 2)
+
+
+def terminal_info() -> TerminalInfo | None:
+    _wait()
+    if not _connected():
+        return None
+    return TerminalInfo(True, True, 'FakeMT5')
+
+
+def symbol_info(symbol: str) -> SymbolInfo:
+    _wait()
+    if not _connected():
+        return None
+    return SymbolInfo(symbol, _state['point'], 2, _state['trade_mode'])
+
+
+def symbol_info_tick(symbol: str) -> Tick:
+    _wait()
+    if not _connected():
+        return None
+    _move_price()
+    bid = _state['price']
+    ask = round(bid + _state['spread'], 2)
+    now = _server_time()
+    return Tick(int(now), bid, ask, bid, int(now * 1000))
+
+
+def account_info() -> AccountInfo:
+    _wait()
+    if not _connected():
+        return None
+    profit = sum(p.profit for p in _positions.values())
+    return AccountInfo(_state['login'], _state['server'], _state['balance'], _state['balance'] + profit, profit)
+
+
+def positions_get(symbol: str | None = None, **kwargs):
+    _wait()
+    if not _connected():
+        return None
+    return tuple(p for p in _positions.values() if symbol is None or p.symbol == symbol)
+
+
+def history_deals_get(date_from, date_to, **kwargs):
+    _wait()
+    if not _connected():
+        return None
+    start = date_from.timestamp()
+    end = date_to.timestamp()
+    return tuple(d for d in _deals if start <= d.time <= end)
+
+
+def order_send(request: dict) -> OrderSendResult:
+    _wait()
+    if not _connected():
+        return None
+    if request.get('volume', 0) <= 0:
+        return OrderSendResult(TRADE_RETCODE_INVALID, 0, 0, 0.0, 0.0, 0.0, 0.0, 'Invalid volume', 0)
+    ticket = _next_ticket()
+    now = int(_server_time())
+    _positions[ticket] = TradePosition(
+        ticket, now, request['type'], request.get('magic', 0), request['volume'], request['price'], request['price'],
+        request.get('sl', 0.0), request.get('tp', 0.0), 0.0, 0.0, request['symbol'], request.get('comment', ''),
+    )
+    _deals.append(TradeDeal(
+        _next_ticket(), ticket, now, request['type'], 0, request.get('magic', 0), ticket, request['volume'], request['price'],
+        0.0, 0.0, 0.0, request['symbol'], request.get('comment', ''),
+    ))
+    return OrderSendResult(TRADE_RETCODE_DONE, ticket, ticket, request['volume'], request['price'], 0.0, 0.0, 'Request executed', 0)
@@ -0,0 +1,62 @@
+# Local stand-in for the telegram sessions feeding src/ingest.py.
+# Every FakeSession delivers the same messages to the ingest after its own
+# delay (mean + random jitter, seconds), like one MTProto connection each.
+#
+# py -m src.fake_telegram --sessions 0.030,0.010,0.050 --messages 500
+# prints the arrival stats per session and checks every message was handled once
+import argparse
+import asyncio
+import random
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import List
+from .ingest import SignalIngest
+
+def make_event(chat_id: int, message_id: int, text: str):
+    # the attributes of a NewMessage event the bot reads, chat_id is the marked id (-100...)
+    peer_id = SimpleNamespace(channel_id=int(str(chat_id).removeprefix('-100')))
+    message = SimpleNamespace(peer_id=peer_id, id=message_id, date=datetime.now(timezone.utc), text=text, raw_text=text)
+    return SimpleNamespace(message=message, chat_id=chat_id, id=message_id, raw_text=text)
+
+class FakeSession:
+    def __init__(self, name: str, ingest: SignalIngest, delay: float = 0.0, jitter: float = 0.0):
+        self.name = name
+        self.delay = delay
+        self.jitter = jitter
+        self.handler = ingest.source(name)
+
+    async def deliver(self, event):
+        await asyncio.sleep(max(self.delay + random.uniform(-self.jitter, self.jitter), 0))
+        await self.handler(event)
+
+async def broadcast(sessions: List[FakeSession], events: List, interval: float = 0.0):
+    # every event to every session, the sessions race each other
+    deliveries = []
+    for event in events:
+        deliveries.extend(asyncio.create_task(session.deliver(event)) for session in sessions)
+        await asyncio.sleep(interval)
+    await asyncio.gather(*deliveries)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the signal ingest against fake sessions')
+    parser.add_argument('--sessions', default='0.030,0.010,0.050', help='mean delay of each session, seconds')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--interval', type=float, default=0.002, help='seconds between messages')
+    args = parser.parse_args()
+
+    async def main():
+        handled = []
+        async def handle(event):
+            handled.append((event.chat_id, event.message.id))
+        ingest = SignalIngest(handle)
+        sessions = [
+            FakeSession(f'session-{idx}', ingest, float(delay), args.jitter)
+            for idx, delay in enumerate(args.sessions.split(','))
+        ]
+        events = [make_event(-100678910, message_id, 'XAUUSD') for message_id in range(args.messages)]
+        await broadcast(sessions, events, args.interval)
+        print(ingest.report())
+        print(f"{len(handled)} handled, {len(set(handled))} unique of {args.messages} messages")
+
+    asyncio.run(main())
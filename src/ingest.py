@@ -0,0 +1,86 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+from telethon.tl.types import PeerChat
+from .metrics import REGISTRY
+from .tracing import percentile
+
+# Merges the NewMessage events of every telegram session listening to the
+# signal chats ("sessions" under "telegram" in config.json). The first session
+# to deliver a (chat, message id) hands it to the bot, the copies arriving on
+# the other sessions are dropped. Per session it keeps how often it was first
+# and how far behind the first copy it was, to see which path is the fastest.
+#
+# Message ids of channels and supergroups are the same for every account, but
+# a basic group numbers its messages per account, so the copies of one message
+# can't be matched. Basic group messages are only taken from the sessions in
+# basic_group_sessions (the first session and its catch up), the others' are dropped.
+#
+# `py -m src.fake_telegram` runs it against local fake sessions.
+
+SESSION_EVENTS = REGISTRY.counter('telegram_events_total', 'Signal chat messages received per session', ('session', 'result'))
+SESSION_LAG_SECONDS = REGISTRY.histogram('telegram_session_lag_seconds', 'Arrival behind the first session', ('session',))
+
+class SessionStats:
+    def __init__(self):
+        self.received = 0
+        self.first = 0
+        self.lag: List[float] = [] # seconds behind the first arrival, duplicates only
+
+class SignalIngest:
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], max_seen: int = 10000, basic_group_sessions: Iterable[str] | None = None):
+        self.handler = handler
+        self.max_seen = max_seen
+        # None takes basic group messages from every session
+        self.basic_group_sessions = None if basic_group_sessions == None else set(basic_group_sessions)
+        # (chat id, message id) -> perf_counter of the first arrival, oldest first
+        self.seen: OrderedDict[Tuple[int, int], float] = OrderedDict()
+        self.stats: Dict[str, SessionStats] = {}
+        self._handlers: Dict[str, Callable[[Any], Awaitable[None]]] = {}
+
+    def source(self, session: str) -> Callable[[Any], Awaitable[None]]:
+        # the event handler of one session, the same object every time so it can be removed again
+        handler = self._handlers.get(session)
+        if handler == None:
+            self.stats[session] = SessionStats()
+            async def handler(event):
+                await self.receive(session, event)
+            self._handlers[session] = handler
+        return handler
+
+    async def receive(self, session: str, event):
+        arrival = time.perf_counter()
+        stats = self.stats[session]
+        stats.received += 1
+        if self.basic_group_sessions != None and session not in self.basic_group_sessions and isinstance(event.message.peer_id, PeerChat):
+            SESSION_EVENTS.inc((session, 'basic_group'))
+            return
+        key = (event.chat_id, event.message.id)
+        first_arrival = self.seen.get(key)
+        if first_arrival != None:
+            stats.lag.append(arrival - first_arrival)
+            SESSION_EVENTS.inc((session, 'duplicate'))
+            SESSION_LAG_SECONDS.observe((session,), arrival - first_arrival)
+            return
+        self.seen[key] = arrival
+        if len(self.seen) > self.max_seen:
+            self.seen.popitem(last=False)
+        stats.first += 1
+        SESSION_EVENTS.inc((session, 'first'))
+        await self.handler(event)
+
+    def mark(self, chat_id: int, message_id: int):
+        # seen without handling it, a later copy is dropped too
+        self.seen[(chat_id, message_id)] = time.perf_counter()
+        if len(self.seen) > self.max_seen:
+            self.seen.popitem(last=False)
+
+    def report(self) -> str:
+        lines = [f"{'session':<24}{'received':>10}{'first%':>8}{'lag p50 ms':>12}{'lag p90 ms':>12}{'lag max ms':>12}"]
+        for session, stats in self.stats.items():
+            lag = sorted(value * 1000 for value in stats.lag)
+            lines.append(
+                f"{session:<24}{stats.received:>10}{stats.first / stats.received * 100 if stats.received else 0.0:>8.1f}"
+                f"{percentile(lag, 50):>12.2f}{percentile(lag, 90):>12.2f}{lag[-1] if lag else 0.0:>12.2f}"
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+from .tracing import percentile
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Append-only trade journal, one JSON line per event:
+#   {"kind": "signal", "ts", "src", "msg", "valid", "type", "trend", "price", "message_ts"}
+#   {"kind": "decision", "ts", "src", "msg", "trader", "accepted", "check", "reason"}
+#   {"kind": "order", "ts", "src", "msg", "trader", "label", "order_type", "leg", "ok", "order", "retcode",
+#    "volume", "sl", "tp", "deviation", "request_price", "price", "slippage", "latency", "error"}
+# slippage is in points, positive when the fill is worse than the requested price.
+# record() only queues the line, a background thread does the file writes.
+#
+# py -m src.journal export trade_journal.jsonl --out journal/ (--format parquet|arrow)
+# writes signals / decisions / orders as one columnar file each, needs pyarrow
+# py -m src.journal slippage trade_journal.jsonl
+# fill rate, slippage and order_send latency per trader and deviation
+
+class TradeJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._run, name='trade-journal', daemon=True)
+        self._writer.start()
+
+    def record(self, kind: str, **fields):
+        self._queue.put({'kind': kind, 'ts': round(time.time(), 3), **fields})
+
+    def _run(self):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            while True:
+                records = [self._queue.get()]
+                # whatever piled up meanwhile goes out in the same write
+                while not self._queue.empty():
+                    records.append(self._queue.get_nowait())
+                closing = records[-1] == None
+                lines = [json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in records if record != None]
+                file.write(''.join(lines))
+                file.flush()
+                if closing:
+                    return
+
+    def close(self, timeout: float = 5):
+        self._queue.put(None)
+        self._writer.join(timeout)
+
+def load(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def export(path: str, out_dir: str, format: str = 'parquet') -> Dict[str, str]:
+    # {kind: written file}
+    if pyarrow == None:
+        raise RuntimeError("Exporting the trade journal needs pyarrow: py -m pip install pyarrow")
+    by_kind: Dict[str, List[Dict[str, Any]]] = {}
+    for record in load(path):
+        by_kind.setdefault(record['kind'], []).append(record)
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    for kind, records in by_kind.items():
+        table = pyarrow.Table.from_pylist(records)
+        if format == 'parquet':
+            written[kind] = os.path.join(out_dir, f'{kind}s.parquet')
+            pyarrow.parquet.write_table(table, written[kind])
+        elif format == 'arrow':
+            written[kind] = os.path.join(out_dir, f'{kind}s.arrow')
+            pyarrow.feather.write_feather(table, written[kind])
+        else:
+            raise ValueError(f'Unknown export format: {format}')
+    return written
+
+def summarize_slippage(records: List[Dict[str, Any]]) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    # (trader, deviation) -> legs sent, legs filled, sorted slippage (points) and latency (ms) of the fills
+    summary: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    for record in records:
+        if record['kind'] != 'order':
+            continue
+        entry = summary.setdefault((record['trader'], record.get('deviation')), {'sent': 0, 'filled': 0, 'slippage': [], 'latency': []})
+        entry['sent'] += 1
+        if record['ok']:
+            entry['filled'] += 1
+            entry['slippage'].append(record['slippage'])
+            entry['latency'].append(record['latency'] * 1000)
+    for entry in summary.values():
+        entry['slippage'].sort()
+        entry['latency'].sort()
+    return summary
+
+def format_slippage(summary: Dict[Tuple[str, int], Dict[str, Any]]) -> str:
+    lines = [f"{'trader':<16}{'deviation':>10}{'sent':>8}{'fill%':>8}{'slip p50':>10}{'slip p90':>10}{'slip p99':>10}{'lat p50 ms':>12}"]
+    for (trader, deviation), entry in sorted(summary.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+        lines.append(
+            f"{trader:<16}{str(deviation):>10}{entry['sent']:>8}{entry['filled'] / entry['sent'] * 100:>8.1f}"
+            f"{percentile(entry['slippage'], 50):>10.1f}{percentile(entry['slippage'], 90):>10.1f}{percentile(entry['slippage'], 99):>10.1f}"
+            f"{percentile(entry['latency'], 50):>12.2f}"
+        )
+    return '\n'.join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Trade journal tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='write the journal as columnar files')
+    export_parser.add_argument('path', nargs='?', default='trade_journal.jsonl')
+    export_parser.add_argument('--out', default='journal')
+    export_parser.add_argument('--format', choices=['parquet', 'arrow'], default='parquet')
+    slippage_parser = commands.add_parser('slippage', help='fill rate and slippage per trader and deviation')
+    slippage_parser.add_argument('path', nargs='?', default='trade_journal.jsonl')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        started = time.perf_counter()
+        for kind, file_path in export(args.path, args.out, args.format).items():
+            print(f"{kind}: {file_path}")
+        print(f"exported in {time.perf_counter() - started:.2f}s")
+    elif args.command == 'slippage':
+        print(format_slippage(summarize_slippage(load(args.path))))
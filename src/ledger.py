@@ -0,0 +1,31 @@
+import numpy as np
+from .account_state import realized_pnl
+
+# Running realized PnL since the daily margin cutoff. The first sync of a day
+# reads the deals history from the cutoff, every later sync only asks mt5
+# for deals from the last seen deal time and skips tickets already counted.
+class DailyPnlLedger:
+    def __init__(self):
+        self.cutoff = None # mt5 server time of the current cutoff
+        self.realized = 0.0 # deal profit + commission since cutoff
+        self.last_ticket = 0
+        self.last_time = None # mt5 server time of the newest deal seen
+        self.deal_count = 0
+
+    def reset(self, cutoff: float):
+        self.cutoff = cutoff
+        self.realized = 0.0
+        self.last_ticket = 0
+        self.last_time = cutoff
+        self.deal_count = 0
+
+    def add_deals(self, deals: np.ndarray) -> int:
+        # deals: account_state.DEAL_DTYPE array
+        new = deals[(deals['ticket'] > self.last_ticket) & (deals['time'] >= self.cutoff)]
+        if len(new) == 0:
+            return 0
+        self.realized += realized_pnl(new)
+        self.last_ticket = int(new['ticket'].max())
+        self.last_time = max(self.last_time, int(new['time'].max()))
+        self.deal_count += len(new)
+        return len(new)
@@ -0,0 +1,33 @@
+import multiprocessing
+import time
+from typing import Any, Dict
+
+# Latest tick of one account, in shared memory so the MT5 worker process can
+# write it in the background and the bot process can read it without an RPC.
+# layout: updated_at (wall clock of the write), timestamp, bid, ask, point
+UPDATED_AT, TIMESTAMP, BID, ASK, POINT = range(5)
+
+class TickSnapshot:
+    def __init__(self):
+        self._values = multiprocessing.get_context('spawn').Array('d', 5)
+
+    def write(self, tick_data: Dict[str, Any]):
+        with self._values.get_lock():
+            self._values[TIMESTAMP] = tick_data['timestamp']
+            self._values[BID] = tick_data['bid']
+            self._values[ASK] = tick_data['ask']
+            self._values[POINT] = tick_data['point']
+            self._values[UPDATED_AT] = time.time()
+
+    def read(self, max_staleness: float) -> Dict[str, Any] | None:
+        # None when nothing was written yet or the last write is too old
+        with self._values.get_lock():
+            values = self._values[:]
+        if time.time() - values[UPDATED_AT] > max_staleness:
+            return None
+        return {
+            "timestamp": values[TIMESTAMP],
+            "bid": values[BID],
+            "ask": values[ASK],
+            "point": values[POINT],
+        }
@@ -1,6 +1,7 @@
+import re
 from datetime import datetime
 from telethon import events
-from typing import TypedDict, Union, Literal
+from typing import Any, Dict, List, TypedDict, Union, Literal
 
 class ValidMessage(TypedDict):
     valid: True
@@ -20,129 +21,171 @@ FormattedMessage = Union[ValidMessage, InvalidMessage]
 
 MessageParserType = Literal['XAUUSD', 'XAUUSD_COMBO', 'NVDA']
 
+# Each message format is a spec of fields read from fixed lines of the message.
+# A field can be:
+#   "values": the stripped line must be one of these (anchor)
+#   "regex": the stripped line must match, the first group is the value. A group
+#          that does not take part (eg. "15mins:" with nothing after it) leaves
+#          the field missing
+#   "map": the value must be one of the keys and is replaced by the mapped value,
+#          if "map_default" is given unknown values map to it instead of failing
+#   "type": "float" converts the value
+# "trend" and "current_price" are required. Every field listed in "confirm" must
+# agree with the trend, otherwise the message is a 'noise_order'. The confirm
+# fields are compared in order: a missing one makes the message unreadable,
+# unless an earlier one already disagreed with the trend.
+# More formats (or overrides) can be added under "message_formats" in config.json.
+PRICE_REGEX = r'^現價: ([^ ]*)$'
+TREND_MAP = {'Potential Uptrend Started': 'Up', 'Potential Downtrend Started': 'Down'}
+TIMEFRAME_TREND_MAP = {'Uptrend': 'Up', 'Downtrend': 'Down'}
+MISSING = object() # value of a field whose regex group did not match anything
+
+DEFAULT_MESSAGE_FORMATS: Dict[str, Dict[str, Any]] = {
+    'XAUUSD': {
+        'ticker': 'XAUUSD',
+        'fields': {
+            'header': {'line': 0, 'values': ['🔴XAUUSD🔴', '🟢XAUUSD🟢']},
+            'current_price': {'line': 1, 'regex': PRICE_REGEX, 'type': 'float'},
+            'trend': {'line': 3, 'map': TREND_MAP},
+        },
+    },
+    'XAUUSD_COMBO': {
+        'ticker': 'XAUUSD',
+        'fields': {
+            'header': {'line': 0, 'values': ['XAUUSD 1/3 Combo']},
+            'trend': {'line': 1, 'map': {'入場方向: Long🟢': 'Up', '入場方向: Short🔴': 'Down'}},
+            'current_price': {'line': 2, 'regex': PRICE_REGEX, 'type': 'float'},
+            # extra checking for the combo info
+            '15mins': {'line': 6, 'regex': r'^15mins:(?: ([^ ]*)|$)', 'map': TIMEFRAME_TREND_MAP, 'map_default': None},
+            '1hr': {'line': 7, 'regex': r'^1hr:(?: ([^ ]*)|$)', 'map': TIMEFRAME_TREND_MAP, 'map_default': None},
+        },
+        'confirm': ['15mins', '1hr'],
+    },
+    'NVDA': {
+        'ticker': 'NVIDIA CFD', # TODO: confirm ticker name
+        'fields': {
+            'header': {'line': 0, 'values': ['🔴NVDA🔴', '🟢NVDA🟢']},
+            'current_price': {'line': 1, 'regex': PRICE_REGEX, 'type': 'float'},
+            'trend': {'line': 3, 'map': TREND_MAP},
+        },
+    },
+}
+
+FIELD_KEYS = {'line', 'values', 'regex', 'map', 'map_default', 'type'}
+FIELD_TYPES = {'str': str, 'float': float}
+
+class MessageField:
+    __slots__ = ('name', 'line', 'values', 'regex', 'map', 'has_default', 'map_default', 'convert')
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        unknown = set(spec) - FIELD_KEYS
+        if unknown:
+            raise ValueError(f'[MessageParser] Unknown keys {sorted(unknown)} in field {name}')
+        if not isinstance(spec.get('line'), int) or spec['line'] < 0:
+            raise ValueError(f'[MessageParser] Field {name} needs a line number')
+        if spec.get('type', 'str') not in FIELD_TYPES:
+            raise ValueError(f'[MessageParser] Unknown type {spec["type"]} in field {name}')
+        self.name = name
+        self.line = spec['line']
+        self.values = frozenset(spec['values']) if 'values' in spec else None
+        self.regex = re.compile(spec['regex']) if 'regex' in spec else None
+        self.map = spec.get('map')
+        self.has_default = 'map_default' in spec
+        self.map_default = spec.get('map_default')
+        self.convert = FIELD_TYPES[spec.get('type', 'str')]
+
+    def read(self, lines: List[str]):
+        # raises ValueError when the line does not fit the spec
+        value = lines[self.line].strip()
+        if self.values != None and value not in self.values:
+            raise ValueError
+        if self.regex != None:
+            match = self.regex.match(value)
+            if match == None:
+                raise ValueError
+            value = match.group(1)
+            if value == None:
+                return MISSING
+        if self.map != None:
+            if value in self.map:
+                value = self.map[value]
+            elif self.has_default:
+                value = self.map_default
+            else:
+                raise ValueError
+        return self.convert(value) if value != None else None
+
+class MessageFormat:
+    __slots__ = ('name', 'ticker', 'fields', 'confirm', 'line_count')
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        fields = spec.get('fields', {})
+        for required in ('trend', 'current_price'):
+            if required not in fields:
+                raise ValueError(f'[MessageParser] Message format {name} has no {required} field')
+        self.name = name
+        self.ticker = spec['ticker']
+        # cheapest rejection first: fields on earlier lines are checked first
+        self.fields = sorted((MessageField(field, field_spec) for field, field_spec in fields.items()), key=lambda f: f.line)
+        self.confirm = tuple(spec.get('confirm', []))
+        for field in self.confirm:
+            if field not in fields:
+                raise ValueError(f'[MessageParser] Message format {name} confirms unknown field {field}')
+        self.line_count = max(field.line for field in self.fields) + 1
+
+    def read(self, raw_text: str) -> Dict[str, Any] | None:
+        lines = raw_text.splitlines()
+        if len(lines) < self.line_count:
+            return None
+        values = {}
+        try:
+            for field in self.fields:
+                values[field.name] = field.read(lines)
+        except ValueError:
+            return None
+        if any(value is MISSING for name, value in values.items() if name not in self.confirm):
+            return None
+        return values
+
+    def confirmed(self, values: Dict[str, Any]) -> bool | None:
+        # None when a confirm field is missing before any of them disagreed
+        for field in self.confirm:
+            if values[field] is MISSING:
+                return None
+            if values[field] != values['trend']:
+                return False
+        return True
+
 class MessageParser:
-    def parse(self, msg: events.NewMessage, type: MessageParserType) -> FormattedMessage:
-        if type == 'XAUUSD':
-            try:
-                text = msg.raw_text.splitlines()
-                timestamp = msg.message.date.timestamp()
-                # fx
-                if text[0].strip() not in ['🔴XAUUSD🔴', '🟢XAUUSD🟢']:
-                    raise TypeError
-                # price
-                price_texts = text[1].strip().split(' ')
-                if len(price_texts) != 2 or price_texts[0] != '現價:':
-                    raise TypeError
-                price = float(price_texts[1]) # might throw error if it is not a float
-                # trend
-                trend_text = text[3].strip()
-                if trend_text not in ['Potential Uptrend Started', 'Potential Downtrend Started']:
-                    raise TypeError
-                trend = 'Up' if trend_text == 'Potential Uptrend Started' else 'Down' if trend_text == 'Potential Downtrend Started' else None
-                if trend == None:
-                    raise TypeError
-                return {
-                    'valid': True,
-                    'type': 'normal',
-                    'ticker': 'XAUUSD',
-                    'trend': trend,
-                    'current_price': price,
-                    'message_timestamp': timestamp,
-                    'raw_msg': msg.raw_text,
-                }
-            except:
-                return {
-                    'valid': False,
-                    "msg": f'Bot failed to read the telegram message: \n{msg.raw_text}',
-                    'raw_msg': msg.raw_text,
-                }
-        if type == 'XAUUSD_COMBO':
-            try:
-                text = msg.raw_text.splitlines()
-                timestamp = msg.message.date.timestamp()
-                # fx
-                if text[0].strip() not in ['XAUUSD 1/3 Combo']:
-                    raise TypeError
-                # price
-                price_texts = text[2].strip().split(' ')
-                if len(price_texts) != 2 or price_texts[0] != '現價:':
-                    raise TypeError
-                price = float(price_texts[1]) # might throw error if it is not a float
-                # trend
-                trend_text = text[1].strip()
-                if trend_text not in ['入場方向: Short🔴', '入場方向: Long🟢']:
-                    raise TypeError
-                trend = 'Up' if trend_text == '入場方向: Long🟢' else 'Down' if trend_text == '入場方向: Short🔴' else None
-                if trend == None:
-                    raise TypeError
-                # extra checking for the combo info
-                fifteen_min_check = text[6].strip().split(' ')
-                hour_check = text[7].strip().split(' ')
-                if fifteen_min_check[0] != '15mins:' or hour_check[0] != '1hr:':
-                    raise TypeError
-                
-                if (trend == 'Up' and fifteen_min_check[1] == 'Uptrend' and hour_check[1] == 'Uptrend') or (trend == 'Down' and fifteen_min_check[1] == 'Downtrend' and hour_check[1] == 'Downtrend'):
-                    return {
-                        'valid': True,
-                        'type': 'normal',
-                        'ticker': 'XAUUSD',
-                        'trend': trend,
-                        'current_price': price,
-                        'message_timestamp': timestamp,
-                        'raw_msg': msg.raw_text,
-                    }
-                else:
-                    return {
-                        'valid': True,
-                        'type': 'noise_order',
-                        'ticker': 'XAUUSD',
-                        'trend': trend,
-                        'current_price': price,
-                        'message_timestamp': timestamp,
-                        'raw_msg': msg.raw_text,
-                    }
-            except:
-                return {
-                    'valid': False,
-                    "msg": f'Bot failed to read the telegram message: \n{msg.raw_text}',
-                    'raw_msg': msg.raw_text,
-                }
-        if type == 'NVDA':
-            try:
-                text = msg.raw_text.splitlines()
-                timestamp = msg.message.date.timestamp()
-                # fx
-                if text[0].strip() not in ['🔴NVDA🔴', '🟢NVDA🟢']:
-                    raise TypeError
-                # price
-                price_texts = text[1].strip().split(' ')
-                if len(price_texts) != 2 or price_texts[0] != '現價:':
-                    raise TypeError
-                price = float(price_texts[1]) # might throw error if it is not a float
-                # trend
-                trend_text = text[3].strip()
-                if trend_text not in ['Potential Uptrend Started', 'Potential Downtrend Started']:
-                    raise TypeError
-                trend = 'Up' if trend_text == 'Potential Uptrend Started' else 'Down' if trend_text == 'Potential Downtrend Started' else None
-                if trend == None:
-                    raise TypeError
-                return {
-                    'valid': True,
-                    'type': 'normal',
-                    'ticker': 'NVIDIA CFD', # TODO: confirm ticker name
-                    'trend': trend,
-                    'current_price': price,
-                    'message_timestamp': timestamp,
-                    'raw_msg': msg.raw_text,
-                }
-            except:
-                return {
-                    'valid': False,
-                    "msg": f'Bot failed to read the telegram message: \n{msg.raw_text}',
-                    'raw_msg': msg.raw_text,
-                }
+    def __init__(self, message_formats: Dict[str, Dict[str, Any]] | None = None):
+        self.formats = {
+            name: MessageFormat(name, spec)
+            for name, spec in {**DEFAULT_MESSAGE_FORMATS, **(message_formats or {})}.items()
+        }
+
+    def parse(self, msg: events.NewMessage, type: MessageParserType | str) -> FormattedMessage:
+        message_format = self.formats.get(type)
+        if message_format == None:
+            return {
+                'valid': False,
+                "msg": f'[MessageParser]Unknown Message Type',
+                'raw_msg': None,
+            }
+        values = message_format.read(msg.raw_text)
+        confirmed = message_format.confirmed(values) if values != None and values['trend'] in ('Up', 'Down') else None
+        if confirmed == None:
+            return {
+                'valid': False,
+                "msg": f'Bot failed to read the telegram message: \n{msg.raw_text}',
+                'raw_msg': msg.raw_text,
+            }
+        trend = values['trend']
         return {
-            'valid': False,
-            "msg": f'[MessageParser]Unknown Message Type',
-            'raw_msg': None,
+            'valid': True,
+            'type': 'normal' if confirmed else 'noise_order',
+            'ticker': message_format.ticker,
+            'trend': trend,
+            'current_price': values['current_price'],
+            'message_timestamp': msg.message.date.timestamp(),
+            'raw_msg': msg.raw_text,
         }
@@ -0,0 +1,143 @@
+import asyncio
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+# Counters, gauges and fixed-bucket histograms, served in the Prometheus text
+# format on "metrics_port" (config.json, http://127.0.0.1:<port>/metrics).
+# Everything is recorded from the event loop thread, so there are no locks:
+# an increment is a dict lookup and an add, a histogram observation adds a
+# bisect over the bucket bounds.
+
+# seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def _labels(names: Tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{str(value).replace('\\', '\\\\').replace('"', '\\"')}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), value: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in self.values.items():
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+class Gauge(Counter):
+    def set(self, labels: tuple, value: float):
+        self.values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f'# TYPE {self.name} gauge'
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self.values: Dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        entry = self.values.get(labels)
+        if entry == None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Counter | Histogram] = {}
+        # called before every scrape, eg. to set gauges from queue sizes
+        self.collectors: List[Callable[[], None]] = []
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            return self.metrics[metric.name]
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"[Metrics] Collector error: {e!r}")
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+class MetricsServer:
+    # GET /metrics, anything else is 404
+    def __init__(self, registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f"Metrics on http://{self.host}:{self.port}/metrics")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # drain the headers
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', self.registry.render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'not found\n'
+            writer.write(
+                f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server != None:
+            self._server.close()
+            await self._server.wait_closed()
@@ -1,45 +1,143 @@
 import MetaTrader5 as mt5
+import threading
+import time
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Any, Literal
+import numpy as np
+from typing import List, Dict, Any, Literal, Tuple, TypedDict
+from .account_state import deals_array, position_totals, positions_array
+from .ledger import DailyPnlLedger
+from .market_data import TickSnapshot
 # from pprint import pprint
 
+class OrderLeg(TypedDict):
+    lot: float
+    sl: float # points
+    tp: float # points
+    deviation: int
+
+class OrderLegResult(TypedDict):
+    leg: int
+    ok: bool
+    order: int | None
+    volume: float
+    retcode: int | None
+    magic: int
+    request_price: float | None
+    price: float | None
+    deviation: int # points
+    slippage: float | None # points the fill is worse than request_price, negative when better
+    error: str | None
+    latency: float # seconds spent in order_send
+    elapsed: float # seconds since the first leg was sent
+
+class EquitySnapshot(TypedDict):
+    equity: float
+    previous_equity: float # equity at the daily margin cutoff
+    realized: float
+    floating: float
+
 class MetaTrader:
-    def __init__(self, ticker: str, login: int, password: str, server: str, path: str, timezone_adjust: int):
+    def __init__(
+            self,
+            ticker: str,
+            login: int,
+            password: str,
+            server: str,
+            path: str,
+            timezone_adjust: int,
+            tick_snapshot: TickSnapshot | None = None,
+            max_tick_staleness: float = 1.0,
+        ):
         self.login = login
         self.password = password
         self.server = server
         self.ticker = ticker
         self.path = path
         self.timezone_adjust = -1 * 60 * 60 * timezone_adjust
+        self.ledger = DailyPnlLedger()
+        self.point = None # symbol_info().point never changes, fetched once
+        self.tick_snapshot = tick_snapshot
+        self.max_tick_staleness = max_tick_staleness
+        # held around every mt5 call, the tick stream thread shares the connection
+        self.lock = threading.RLock()
+        self._tick_stream = None
+        self._tick_stream_stop = threading.Event()
+
+        self._initialize()
 
+    def _initialize(self):
         if not mt5.initialize(
-                path=path, # eg. "C:/Program Files/Alpari MT5/terminal64.exe"
-                login=login,
-                password=password,
-                server=server
+                path=self.path, # eg. "C:/Program Files/Alpari MT5/terminal64.exe"
+                login=self.login,
+                password=self.password,
+                server=self.server
             ):
-            raise RuntimeError("Failed to initialize MetaTrader5")
+            raise RuntimeError(f"Failed to initialize MetaTrader5: {mt5.last_error()}")
 
-    def shutdown(self):
+    def check_connection(self) -> Dict[str, Any]:
+        # heartbeat: the terminal is up, connected to the broker and logged in to this account
+        terminal_info = mt5.terminal_info()
+        if terminal_info == None:
+            return {'ok': False, 'error': f'terminal_info returned None: {mt5.last_error()}'}
+        if not terminal_info.connected:
+            return {'ok': False, 'error': 'terminal is not connected to the trade server'}
+        account_info = mt5.account_info()
+        if account_info == None:
+            return {'ok': False, 'error': f'account_info returned None: {mt5.last_error()}'}
+        if account_info.login != self.login:
+            return {'ok': False, 'error': f'terminal is logged in to {account_info.login}'}
+        return {'ok': True, 'error': None}
+
+    def reconnect(self):
         mt5.shutdown()
+        self._initialize()
+
+    def shutdown(self):
+        self._tick_stream_stop.set()
+        with self.lock:
+            mt5.shutdown()
+
+    def start_tick_stream(self, interval: float):
+        # poll the tick in the background into tick_snapshot
+        if self.tick_snapshot == None or self._tick_stream != None:
+            return
+        self._tick_stream = threading.Thread(target=self._run_tick_stream, args=(interval,), name='mt5-tick-stream', daemon=True)
+        self._tick_stream.start()
+
+    def _run_tick_stream(self, interval: float):
+        last_error = None
+        while not self._tick_stream_stop.is_set():
+            try:
+                with self.lock:
+                    self.get_tick_data()
+                last_error = None
+            except Exception as e:
+                # once per outage, not every interval
+                if repr(e) != last_error:
+                    print(f"[{self.login}] Tick stream error: {e!r}")
+                last_error = repr(e)
+            self._tick_stream_stop.wait(interval)
 
     def is_market_avail(self) -> bool:
-        # TODO: this method should check whether the market is open or close
-        # but for now we just let mt5 give us error while making position
-        return True
+        # whether the symbol can be traded at all, the session hours are
+        # checked in the bot, see src/session_calendar.py
+        info = mt5.symbol_info(self.ticker)
+        if not info:
+            raise RuntimeError("Failed to get symbol info")
+        return info.trade_mode not in (mt5.SYMBOL_TRADE_MODE_DISABLED, mt5.SYMBOL_TRADE_MODE_CLOSEONLY)
     
-    def place_order(
+    def _build_request(
             self,
+            tick_data: Dict[str, Any],
             lot: float,
             order_type: Literal['BUY', 'SELL'],
             sl_point: float,
             tp_point: float,
             deviation = 20,
             comment = 'Opened by MT5-TELEGRAM-BOT'
-        ):
-        tick_data = self.get_tick_data()
+        ) -> Dict[str, Any]:
         if order_type == 'BUY':
-            request = {
+            return {
                 "action": mt5.TRADE_ACTION_DEAL,
                 "symbol": self.ticker,
                 "volume": lot,
@@ -54,7 +152,7 @@ class MetaTrader:
                 "type_filling": mt5.ORDER_FILLING_IOC,
             }
         elif order_type == 'SELL':
-            request = {
+            return {
                 "action": mt5.TRADE_ACTION_DEAL,
                 "symbol": self.ticker,
                 "volume": lot,
@@ -62,7 +160,7 @@ class MetaTrader:
                 "price": tick_data['bid'],
                 "sl": tick_data['bid'] + sl_point * tick_data['point'],
                 "tp": tick_data['bid'] - tp_point * tick_data['point'],
-                "deviation": 20,
+                "deviation": deviation,
                 "magic": 0,
                 "comment": comment,
                 "type_time": mt5.ORDER_TIME_GTC,
@@ -70,23 +168,97 @@ class MetaTrader:
             }
         else:
             raise TypeError("order_type Type Error")
+
+    def place_order(
+            self,
+            lot: float,
+            order_type: Literal['BUY', 'SELL'],
+            sl_point: float,
+            tp_point: float,
+            deviation = 20,
+            comment = 'Opened by MT5-TELEGRAM-BOT'
+        ):
+        tick_data = self.get_tick_data()
+        request = self._build_request(tick_data, lot, order_type, sl_point, tp_point, deviation, comment)
         result = mt5.order_send(request)
         if result.retcode != mt5.TRADE_RETCODE_DONE:
             raise RuntimeError(f"Failed to add position: {result.comment}")
         return result
 
+    def place_orders(
+            self,
+            legs: List[OrderLeg],
+            order_type: Literal['BUY', 'SELL'],
+            comment = 'Opened by MT5-TELEGRAM-BOT'
+        ) -> List[OrderLegResult]:
+        # legs are sent back to back, each priced from the latest bid / ask (a shared
+        # memory read while the tick stream is fresh), a failed leg is reported in
+        # its result and does not stop the others
+        sign = 1 if order_type == 'BUY' else -1
+        batch_start = time.perf_counter()
+        results: List[OrderLegResult] = []
+        for idx, leg in enumerate(legs):
+            send_start = time.perf_counter()
+            request = None
+            try:
+                tick_data = self.get_latest_tick()
+                request = self._build_request(tick_data, leg['lot'], order_type, leg['sl'], leg['tp'], leg['deviation'], comment)
+                send_start = time.perf_counter()
+                result = mt5.order_send(request)
+                if result == None:
+                    error = f"order_send returned None: {mt5.last_error()}"
+                elif result.retcode != mt5.TRADE_RETCODE_DONE:
+                    error = f"Failed to add position: {result.comment}"
+                else:
+                    error = None
+            except Exception as e:
+                result = None
+                error = repr(e)
+            send_end = time.perf_counter()
+            results.append({
+                'leg': idx,
+                'ok': error == None,
+                'order': result.order if result != None else None,
+                'volume': leg['lot'],
+                'retcode': result.retcode if result != None else None,
+                'magic': request['magic'] if request != None else 0,
+                'request_price': request['price'] if request != None else None,
+                'price': result.price if result != None else None,
+                'deviation': leg['deviation'],
+                'slippage': round(sign * (result.price - request['price']) / tick_data['point'], 1) + 0.0 if error == None else None, # + 0.0: no -0.0
+                'error': error,
+                'latency': send_end - send_start,
+                'elapsed': send_end - batch_start,
+            })
+        return results
+
     def get_tick_data(self) -> Dict[str, Any]:
-        info = mt5.symbol_info(self.ticker)
+        if self.point == None:
+            info = mt5.symbol_info(self.ticker)
+            if not info:
+                raise RuntimeError("Failed to get symbol info")
+            self.point = info.point
         tick = mt5.symbol_info_tick(self.ticker)
         if not tick:
             raise RuntimeError("Failed to get tick data")
 
-        return {
+        tick_data = {
             "timestamp": tick.time + self.timezone_adjust,
             "bid": tick.bid,
             "ask": tick.ask,
-            "point": info.point,
+            "point": self.point,
         }
+        if self.tick_snapshot != None:
+            self.tick_snapshot.write(tick_data)
+        return tick_data
+
+    def get_latest_tick(self) -> Dict[str, Any]:
+        # tick from the background stream, or a fresh one when it is too old
+        if self.tick_snapshot != None:
+            tick_data = self.tick_snapshot.read(self.max_tick_staleness)
+            if tick_data != None:
+                return tick_data
+        return self.get_tick_data()
 
     def get_positions(self, ticker = None) -> List[Dict[str, Any]]:
         positions = mt5.positions_get(symbol=ticker) if ticker != None else mt5.positions_get()
@@ -103,6 +275,26 @@ class MetaTrader:
                 "tp": pos.tp,
             } for pos in positions]
     
+    def get_positions_array(self, ticker = None) -> np.ndarray:
+        # account_state.POSITION_DTYPE, time in server time
+        positions = mt5.positions_get(symbol=ticker) if ticker != None else mt5.positions_get()
+        if positions == None:
+            raise RuntimeError(f"Failed to get positions: {mt5.last_error()}")
+        return positions_array(positions)
+
+    def get_deals_array(self, from_timestamp: float, to_timestamp: float | None = None) -> np.ndarray:
+        # account_state.DEAL_DTYPE of the deals between two bot timestamps (to now by default), time in server time
+        from_date = datetime.fromtimestamp(from_timestamp - self.timezone_adjust)
+        to_date = datetime.fromtimestamp(to_timestamp - self.timezone_adjust) if to_timestamp != None else datetime.now() - timedelta(seconds=self.timezone_adjust)
+        deals = mt5.history_deals_get(from_date, to_date)
+        if deals == None:
+            raise RuntimeError(f"Failed to get deals history: {mt5.last_error()}")
+        return deals_array(deals)
+
+    def get_position_counts(self, ticker = None) -> Dict[Tuple[str, int], List[float]]:
+        # (symbol, magic) -> [buy count, sell count, buy volume, sell volume]
+        return position_totals(self.get_positions_array(ticker))
+
     def get_current_equity(self) -> float:
         account_info = mt5.account_info()
         if account_info != None:
@@ -111,28 +303,34 @@ class MetaTrader:
             print("Cannot get current equity, acc info: ", account_info)
             raise ValueError
     
-    def get_previous_equity(self, timestamp) -> float:
-        current = self.get_current_equity()
-        # 1. closed positions (deal)
-        from_date = datetime.fromtimestamp(timestamp - self.timezone_adjust)
-        to_date = datetime.now() - timedelta(seconds=self.timezone_adjust)
+    def get_equity_snapshot(self, timestamp) -> EquitySnapshot:
+        # timestamp: daily margin cutoff
+        account_info = mt5.account_info()
+        if account_info == None:
+            print("Cannot get current equity, acc info: ", account_info)
+            raise ValueError
 
+        # 1. closed positions (deal), only the ones newer than the last sync
+        cutoff = timestamp - self.timezone_adjust
+        if self.ledger.cutoff != cutoff:
+            self.ledger.reset(cutoff)
+        from_date = datetime.fromtimestamp(self.ledger.last_time)
+        to_date = datetime.now() - timedelta(seconds=self.timezone_adjust)
         deals = mt5.history_deals_get(from_date, to_date)
-        # pprint(deals)
-        profit = 0
-        for deal in deals:
-            profit += deal.profit
-            profit += deal.commission
-
-        # 2. existing positions
-        positions = mt5.positions_get()
-        # pprint(positions)
-        for position in positions:
-            profit += position.profit
-        # print(profit)
-        # print(current - profit)
-        
-        return current - profit
+        if deals == None:
+            raise RuntimeError(f"Failed to get deals history: {mt5.last_error()}")
+        self.ledger.add_deals(deals_array(deals))
+
+        # 2. existing positions, account_info.profit is their floating profit
+        return {
+            "equity": account_info.equity,
+            "previous_equity": account_info.equity - self.ledger.realized - account_info.profit,
+            "realized": self.ledger.realized,
+            "floating": account_info.profit,
+        }
+
+    def get_previous_equity(self, timestamp) -> float:
+        return self.get_equity_snapshot(timestamp)['previous_equity']
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,276 @@
+import asyncio
+import importlib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .market_data import TickSnapshot
+from .metrics import REGISTRY
+from .position_book import PositionBook
+from .session_calendar import SessionCalendar
+from typing import TYPE_CHECKING, Any, Dict, List, Literal
+
+if TYPE_CHECKING:
+    import numpy as np
+    # src.mt5 imports MetaTrader5, see load_metatrader_class
+    from .mt5 import EquitySnapshot, OrderLeg, OrderLegResult
+
+# seconds, can be overridden per trader with "mt5_timeouts" in config.json
+DEFAULT_TIMEOUTS: Dict[str, float] = {
+    'start': 60,
+    'get_tick_data': 3,
+    'get_latest_tick': 3,
+    'get_positions': 5,
+    'get_position_counts': 5,
+    'get_positions_array': 5,
+    'get_deals_array': 10,
+    'get_current_equity': 3,
+    'get_previous_equity': 10,
+    'get_equity_snapshot': 10,
+    'place_order': 10,
+    'place_orders': 20,
+    'check_connection': 5,
+    'is_market_avail': 5,
+    'reconnect': 60,
+    'shutdown': 10,
+}
+
+# the time the MetaTrader method ran where it lives (worker process or executor
+# thread) and the whole call as the event loop sees it, pipe and queueing included
+MT5_METHOD_SECONDS = REGISTRY.histogram('mt5_method_seconds', 'MetaTrader method run time in the worker', ('trader', 'method'))
+MT5_CALL_SECONDS = REGISTRY.histogram('mt5_call_seconds', 'MetaTrader call round trip from the event loop', ('trader', 'method'))
+MT5_CALL_ERRORS = REGISTRY.counter('mt5_call_errors_total', 'Failed MetaTrader calls', ('trader', 'method', 'error'))
+
+def to_plain(value):
+    # mt5 returns named tuples (eg. OrderSendResult with a nested TradeRequest),
+    # hand out plain dicts/lists so both adapters return the same shape
+    if hasattr(value, '_asdict'):
+        return {key: to_plain(item) for key, item in value._asdict().items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    return value
+
+def load_metatrader_class(mt5_module: str = 'MetaTrader5'):
+    if mt5_module != 'MetaTrader5':
+        # must happen before src.mt5 is imported in this process
+        sys.modules['MetaTrader5'] = importlib.import_module(mt5_module)
+    from .mt5 import MetaTrader
+    return MetaTrader
+
+def metatrader_args(trader_config: Dict[str, Any], tick_snapshot: TickSnapshot) -> tuple:
+    # self, ticker: str, login: int, password: str, server: str, path: str, timezone_adjust: int,
+    # tick_snapshot: TickSnapshot, max_tick_staleness: float
+    return (
+        trader_config['ticker'],
+        int(trader_config['mt5_login']),
+        trader_config['mt5_password'],
+        trader_config['mt5_server'],
+        trader_config['mt5_path'],
+        trader_config['timezone_adjust'],
+        tick_snapshot,
+        float(trader_config.get('max_tick_staleness', 1.0)),
+    )
+
+class AsyncMetaTraderBase:
+    # Async version of the MetaTrader api, subclasses implement _invoke to
+    # run the blocking call somewhere that is not the event loop.
+    def __init__(self, trader_config: Dict[str, Any], mt5_module: str = 'MetaTrader5'):
+        self.id = trader_config['id']
+        self.ticker = trader_config['ticker']
+        self.mt5_module = mt5_module
+        self.timeouts = {**DEFAULT_TIMEOUTS, **trader_config.get('mt5_timeouts', {})}
+        # the worker keeps this fresh every tick_stream_interval seconds (0 to disable)
+        self.tick_snapshot = TickSnapshot()
+        self.max_tick_staleness = float(trader_config.get('max_tick_staleness', 1.0))
+        self.tick_stream_interval = float(trader_config.get('tick_stream_interval', 0.25))
+        self.position_book = PositionBook()
+        self.position_sync_interval = float(trader_config.get('position_sync_interval', 5))
+        # kept up to date by ConnectionSupervisor, dispatch skips the trader while False
+        self.healthy = True
+        self.health_error: str | None = None
+        self.heartbeat_interval = float(trader_config.get('heartbeat_interval', 5))
+        self.reconnect_max_backoff = float(trader_config.get('reconnect_max_backoff', 60))
+        # a failed call wakes the supervisor before its next heartbeat
+        self.check_now = asyncio.Event()
+        # dispatch skips the trader outside its trading sessions
+        self.calendar = SessionCalendar(trader_config.get('trading_sessions'), trader_config['timezone_adjust'])
+        self.calendar_refresh_interval = float(trader_config.get('calendar_refresh_interval', 24 * 3600))
+
+    def update_config(self, trader_config: Dict[str, Any]):
+        # config reload, the keys a running worker can take without logging in again
+        self.timeouts = {**DEFAULT_TIMEOUTS, **trader_config.get('mt5_timeouts', {})}
+        self.position_sync_interval = float(trader_config.get('position_sync_interval', 5))
+        self.heartbeat_interval = float(trader_config.get('heartbeat_interval', 5))
+        self.reconnect_max_backoff = float(trader_config.get('reconnect_max_backoff', 60))
+        calendar = SessionCalendar(trader_config.get('trading_sessions'), trader_config['timezone_adjust'])
+        calendar.trade_enabled = self.calendar.trade_enabled
+        self.calendar = calendar
+        self.calendar_refresh_interval = float(trader_config.get('calendar_refresh_interval', 24 * 3600))
+
+    async def start(self):
+        raise NotImplementedError
+
+    async def _invoke(self, method: str, *args, **kwargs) -> tuple:
+        # (result, seconds the method ran)
+        raise NotImplementedError
+
+    async def _call(self, method: str, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result, elapsed = await asyncio.wait_for(self._invoke(method, *args, **kwargs), self.timeouts[method])
+        except asyncio.TimeoutError:
+            self.check_now.set()
+            MT5_CALL_ERRORS.inc((self.id, method, 'timeout'))
+            raise TimeoutError(f'[{self.id}] MT5 {method} timed out after {self.timeouts[method]}s')
+        except Exception as e:
+            self.check_now.set()
+            MT5_CALL_ERRORS.inc((self.id, method, type(e).__name__))
+            raise
+        MT5_METHOD_SECONDS.observe((self.id, method), elapsed)
+        MT5_CALL_SECONDS.observe((self.id, method), time.perf_counter() - started)
+        return result
+
+    async def check_connection(self) -> Dict[str, Any]:
+        return await self._call('check_connection')
+
+    async def reconnect(self):
+        await self._call('reconnect')
+
+    async def is_market_avail(self) -> bool:
+        return await self._call('is_market_avail')
+
+    async def run_calendar_refresh(self):
+        # the symbol's trade_mode, at start and once every calendar_refresh_interval
+        while True:
+            try:
+                self.calendar.trade_enabled = await self.is_market_avail()
+                if not self.calendar.trade_enabled:
+                    print(f'[{self.id}] {self.ticker} is not tradable, signals are skipped')
+            except Exception as e:
+                # keeps the last known state
+                print(f'[{self.id}] Trade mode refresh error: {e!r}')
+            await asyncio.sleep(self.calendar_refresh_interval)
+
+    async def place_order(
+            self,
+            lot: float,
+            order_type: Literal['BUY', 'SELL'],
+            sl_point: float,
+            tp_point: float,
+            deviation = 20,
+            comment = 'Opened by MT5-TELEGRAM-BOT'
+        ) -> Dict[str, Any]:
+        return await self._call('place_order', lot, order_type, sl_point, tp_point, deviation, comment)
+
+    async def place_orders(
+            self,
+            legs: List['OrderLeg'],
+            order_type: Literal['BUY', 'SELL'],
+            comment = 'Opened by MT5-TELEGRAM-BOT'
+        ) -> List['OrderLegResult']:
+        leg_results = await self._call('place_orders', legs, order_type, comment)
+        for leg_result in leg_results:
+            if leg_result['ok']:
+                self.position_book.add_fill(self.ticker, leg_result['magic'], order_type, leg_result['volume'])
+        return leg_results
+
+    async def get_tick_data(self) -> Dict[str, Any]:
+        return await self._call('get_tick_data')
+
+    async def get_latest_tick(self) -> Dict[str, Any]:
+        # read straight from shared memory, only ask the worker when it is stale
+        tick_data = self.tick_snapshot.read(self.max_tick_staleness)
+        if tick_data != None:
+            return tick_data
+        return await self._call('get_tick_data')
+
+    async def get_positions(self, ticker = None) -> List[Dict[str, Any]]:
+        return await self._call('get_positions', ticker)
+
+    async def get_positions_array(self, ticker = None) -> 'np.ndarray':
+        # see src/account_state.py for the columns and aggregations
+        return await self._call('get_positions_array', ticker)
+
+    async def get_deals_array(self, from_timestamp: float, to_timestamp: float | None = None) -> 'np.ndarray':
+        return await self._call('get_deals_array', from_timestamp, to_timestamp)
+
+    async def sync_positions(self):
+        token = self.position_book.begin_reconcile()
+        counts = await self._call('get_position_counts')
+        self.position_book.reconcile(counts, token)
+
+    async def run_position_sync(self):
+        # background reconcile of the position book with positions_get
+        while True:
+            await asyncio.sleep(self.position_sync_interval)
+            try:
+                await self.sync_positions()
+            except Exception as e:
+                print(f'[{self.id}] Position sync error: {e!r}')
+
+    async def get_position_count(self, ticker: str, order_type: Literal['BUY', 'SELL']) -> int:
+        if not self.position_book.synced:
+            await self.sync_positions()
+        return self.position_book.count(ticker, order_type)
+
+    async def get_exposure(self, ticker: str, order_type: Literal['BUY', 'SELL']) -> Dict[str, Any]:
+        # open positions on one side, from the position book
+        if not self.position_book.synced:
+            await self.sync_positions()
+        return {
+            'count': self.position_book.count(ticker, order_type),
+            'volume': self.position_book.volume(ticker, order_type),
+            'last_fill_at': self.position_book.last_fill_at,
+        }
+
+    async def get_current_equity(self) -> float:
+        return await self._call('get_current_equity')
+
+    async def get_previous_equity(self, timestamp) -> float:
+        return await self._call('get_previous_equity', timestamp)
+
+    async def get_equity_snapshot(self, timestamp) -> 'EquitySnapshot':
+        return await self._call('get_equity_snapshot', timestamp)
+
+    async def shutdown(self):
+        raise NotImplementedError
+
+class AsyncMetaTrader(AsyncMetaTraderBase):
+    # Runs MetaTrader in this process on its own single thread executor, so
+    # calls to the terminal are serialized and never block the event loop.
+    # The MetaTrader5 package only holds one connection per process, use the
+    # process pool (mt5_pool.MetaTraderWorker) for more than one trader.
+    def __init__(self, trader_config: Dict[str, Any], mt5_module: str = 'MetaTrader5'):
+        super().__init__(trader_config, mt5_module)
+        self._args = metatrader_args(trader_config, self.tick_snapshot)
+        self._executor = None
+        self._trader = None
+
+    async def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'mt5-{self.id}')
+        loop = asyncio.get_running_loop()
+        MetaTrader = await loop.run_in_executor(self._executor, load_metatrader_class, self.mt5_module)
+        self._trader = await loop.run_in_executor(self._executor, lambda: MetaTrader(*self._args))
+        if self.tick_stream_interval > 0:
+            self._trader.start_tick_stream(self.tick_stream_interval)
+
+    async def _invoke(self, method: str, *args, **kwargs):
+        if self._trader == None:
+            raise RuntimeError(f'MT5 [{self.id}] is not started')
+        loop = asyncio.get_running_loop()
+        trader = self._trader
+        def run():
+            with trader.lock:
+                started = time.perf_counter()
+                result = getattr(trader, method)(*args, **kwargs)
+                return to_plain(result), time.perf_counter() - started
+        return await loop.run_in_executor(self._executor, run)
+
+    async def shutdown(self):
+        if self._trader == None:
+            return
+        try:
+            await self._call('shutdown')
+        except Exception as e:
+            print(f'[{self.id}] MT5 shutdown error: {e!r}')
+        self._trader = None
+        self._executor.shutdown(wait=False)
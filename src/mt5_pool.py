@@ -0,0 +1,174 @@
+import asyncio
+import itertools
+import multiprocessing
+import threading
+import time
+from typing import Any, Dict, List
+from .mt5_async import AsyncMetaTrader, AsyncMetaTraderBase, load_metatrader_class, metatrader_args, to_plain
+
+# The MetaTrader5 package keeps one terminal connection per process, so every
+# trader gets its own worker process holding its own MetaTrader instance.
+# The bot talks to the workers through MetaTraderWorker, an async RPC front
+# with the same methods as MetaTrader.
+
+def _worker_main(conn, trader_args: tuple, mt5_module: str, tick_stream_interval: float):
+    MetaTrader = load_metatrader_class(mt5_module)
+    try:
+        trader = MetaTrader(*trader_args)
+    except Exception as e:
+        conn.send((0, False, e))
+        return
+    if tick_stream_interval > 0:
+        trader.start_tick_stream(tick_stream_interval)
+    conn.send((0, True, None))
+
+    while True:
+        try:
+            call_id, method, args, kwargs = conn.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            with trader.lock:
+                started = time.perf_counter()
+                value = getattr(trader, method)(*args, **kwargs)
+                # the run time rides back with the result for the parent's metrics
+                result = (True, (to_plain(value), time.perf_counter() - started))
+        except Exception as e:
+            result = (False, e)
+        try:
+            conn.send((call_id, *result))
+        except Exception as e:
+            # the result or exception itself could not be pickled
+            conn.send((call_id, False, RuntimeError(f'[{method}] {e!r}')))
+        if method == 'shutdown':
+            break
+    conn.close()
+
+class MetaTraderWorker(AsyncMetaTraderBase):
+    def __init__(self, trader_config: Dict[str, Any], mt5_module: str = 'MetaTrader5'):
+        super().__init__(trader_config, mt5_module)
+        self._args = metatrader_args(trader_config, self.tick_snapshot)
+        self._process = None
+        self._conn = None
+        self._loop = None
+        self._reader = None
+        self._send_lock = threading.Lock()
+        self._call_ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    async def start(self):
+        ctx = multiprocessing.get_context('spawn')
+        self._conn, child_conn = ctx.Pipe()
+        self._loop = asyncio.get_running_loop()
+        ready = self._loop.create_future()
+        self._pending[0] = ready
+        self._process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self._args, self.mt5_module, self.tick_stream_interval),
+            name=f'mt5-{self.id}',
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self._reader = threading.Thread(target=self._read_loop, name=f'mt5-{self.id}-reader', daemon=True)
+        self._reader.start()
+        await ready
+
+    def _read_loop(self):
+        while True:
+            try:
+                call_id, ok, payload = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            future = self._pending.pop(call_id, None)
+            if future != None:
+                self._loop.call_soon_threadsafe(self._resolve, future, ok, payload)
+        # worker exited, fail whatever is still waiting
+        for call_id in list(self._pending):
+            future = self._pending.pop(call_id, None)
+            if future != None:
+                self._loop.call_soon_threadsafe(self._resolve, future, False, RuntimeError(f'MT5 worker [{self.id}] exited'))
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, ok: bool, payload):
+        # a timed out call is already cancelled when its late result arrives
+        if future.done():
+            return
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(payload)
+
+    async def _invoke(self, method: str, *args, **kwargs):
+        if self._process == None or not self._process.is_alive():
+            raise RuntimeError(f'MT5 worker [{self.id}] is not running')
+        call_id = next(self._call_ids)
+        future = self._loop.create_future()
+        self._pending[call_id] = future
+        with self._send_lock:
+            self._conn.send((call_id, method, args, kwargs))
+        try:
+            return await future
+        finally:
+            self._pending.pop(call_id, None)
+
+    async def reconnect(self):
+        if self._process == None or not self._process.is_alive():
+            # the worker process itself is gone, log in on a new one
+            await self.shutdown()
+            await asyncio.wait_for(self.start(), self.timeouts['start'])
+            return
+        await super().reconnect()
+
+    async def shutdown(self):
+        if self._process == None:
+            return
+        if self._process.is_alive():
+            try:
+                await self._call('shutdown')
+            except Exception as e:
+                print(f'[{self.id}] MT5 worker shutdown error: {e!r}')
+        await asyncio.to_thread(self._process.join, 5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+        # the reader sees EOF once the worker is gone, then the pipe can be closed
+        await asyncio.to_thread(self._reader.join, 5)
+        self._conn.close()
+
+class MetaTraderPool:
+    # "mt5_mode": "process" (default) runs one worker process per trader,
+    # "thread" runs a single trader in the bot process on its own executor
+    def __init__(self, traders_config: List[Dict[str, Any]], mt5_module: str = 'MetaTrader5', mt5_mode: str = 'process'):
+        if mt5_mode not in ('process', 'thread'):
+            raise ValueError(f'Unknown mt5_mode: {mt5_mode}')
+        if mt5_mode == 'thread' and len(traders_config) > 1:
+            raise ValueError("mt5_mode 'thread' supports one trader only, MetaTrader5 holds one connection per process")
+        self.mt5_module = mt5_module
+        self.mt5_mode = mt5_mode
+        # same order as config['traders'], a config reload swaps in a new list
+        self.workers: List[AsyncMetaTraderBase] = [self.create(trader) for trader in traders_config]
+
+    def create(self, trader_config: Dict[str, Any]) -> AsyncMetaTraderBase:
+        # not started
+        if self.mt5_mode == 'process':
+            return MetaTraderWorker(trader_config, self.mt5_module)
+        return AsyncMetaTrader(trader_config, self.mt5_module)
+
+    async def start(self):
+        # every terminal logs in at the same time
+        await asyncio.gather(*(
+            asyncio.wait_for(worker.start(), worker.timeouts['start']) for worker in self.workers
+        ))
+
+    async def shutdown(self):
+        await asyncio.gather(*(worker.shutdown() for worker in self.workers))
+
+    def __getitem__(self, idx: int) -> AsyncMetaTraderBase:
+        return self.workers[idx]
+
+    def __len__(self):
+        return len(self.workers)
+
+    def __iter__(self):
+        return iter(self.workers)
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from typing import Any, Dict, List
+from telethon.errors import FloodWaitError
+
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+class ChatStats:
+    __slots__ = ('queued', 'sent', 'failed', 'batches', 'flood_waits', 'last_latency', 'max_latency', 'total_latency')
+
+    def __init__(self):
+        self.queued = 0 # messages handed to enqueue
+        self.sent = 0 # messages delivered (a batch counts each message in it)
+        self.failed = 0 # messages dropped after max_retries or max_flood_waits
+        self.batches = 0 # telegram send_message calls that succeeded
+        self.flood_waits = 0
+        self.last_latency = 0.0 # seconds from enqueue of the oldest message to delivery
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+# Notifications are queued per chat and sent by one background task per chat,
+# so handle_channel_message never waits on a telegram round trip. Messages that
+# arrive within coalesce_window of each other are joined into one message.
+class NotificationDispatcher:
+    def __init__(self, client, coalesce_window: float = 0.5, max_retries: int = 5, max_backoff: float = 60, max_flood_waits: int = 10):
+        self.client = client
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.max_flood_waits = max_flood_waits
+        self.max_backoff = max_backoff
+        self.queues: Dict[int, asyncio.Queue] = {}
+        self.stats: Dict[int, ChatStats] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    def enqueue(self, chat_id: int, message: str):
+        queue = self.queues.get(chat_id)
+        if queue == None:
+            queue = self.queues[chat_id] = asyncio.Queue()
+            self.stats[chat_id] = ChatStats()
+            self._workers[chat_id] = asyncio.create_task(self._run(chat_id, queue))
+        queue.put_nowait((time.perf_counter(), message))
+        self.stats[chat_id].queued += 1
+
+    async def _run(self, chat_id: int, queue: asyncio.Queue):
+        while True:
+            batch = [await queue.get()]
+            # give a burst a moment to land in the same message
+            await asyncio.sleep(self.coalesce_window)
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            for chunk in self._chunks(batch):
+                await self._send(chat_id, chunk)
+            for _ in batch:
+                queue.task_done()
+
+    @staticmethod
+    def _chunks(batch: List[tuple]) -> List[List[tuple]]:
+        # keep every message whole and each send under telegram's length limit
+        chunks = [[]]
+        length = 0
+        for item in batch:
+            item_length = len(item[1]) + 2
+            if chunks[-1] and length + item_length > TELEGRAM_MAX_MESSAGE_LENGTH:
+                chunks.append([])
+                length = 0
+            chunks[-1].append(item)
+            length += item_length
+        return chunks
+
+    async def _send(self, chat_id: int, chunk: List[tuple]):
+        stats = self.stats[chat_id]
+        message = '\n\n'.join(item[1] for item in chunk)[:TELEGRAM_MAX_MESSAGE_LENGTH]
+        backoff = 1
+        # a flood wait is telegram asking to slow down, not a failed send,
+        # it has its own cap and leaves the retries of real errors untouched
+        attempt = 0
+        flood_waits = 0
+        while True:
+            try:
+                if not self.client.is_connected():
+                    raise ConnectionError("Telegram Client is not connected")
+                await self.client.send_message(entity=chat_id, message=message)
+            except FloodWaitError as e:
+                stats.flood_waits += 1
+                if flood_waits == self.max_flood_waits:
+                    break
+                flood_waits += 1
+                print(f"[Notifier] Flood wait {e.seconds}s for chat {chat_id}")
+                await asyncio.sleep(e.seconds)
+                continue
+            except Exception as e:
+                if attempt == self.max_retries:
+                    break
+                attempt += 1
+                print(f"[Notifier] Failed to send to chat {chat_id}, retry in {backoff}s: {e!r}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            latency = time.perf_counter() - chunk[0][0]
+            stats.sent += len(chunk)
+            stats.batches += 1
+            stats.last_latency = latency
+            stats.max_latency = max(stats.max_latency, latency)
+            stats.total_latency += latency
+            return
+        stats.failed += len(chunk)
+        print(f"[Notifier] Dropped {len(chunk)} message(s) for chat {chat_id}")
+
+    def metrics(self) -> Dict[int, Dict[str, Any]]:
+        return {
+            chat_id: {
+                'queue_depth': self.queues[chat_id].qsize(),
+                'queued': stats.queued,
+                'sent': stats.sent,
+                'failed': stats.failed,
+                'batches': stats.batches,
+                'flood_waits': stats.flood_waits,
+                'last_latency': stats.last_latency,
+                'max_latency': stats.max_latency,
+                'avg_latency': stats.total_latency / stats.batches if stats.batches else 0.0,
+            } for chat_id, stats in self.stats.items()
+        }
+
+    async def close(self, timeout: float = 5):
+        # let queued notifications go out before the client disconnects
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self.queues.values())), timeout)
+        except asyncio.TimeoutError:
+            print("[Notifier] Pending notifications dropped on shutdown")
+        for task in self._workers.values():
+            task.cancel()
@@ -0,0 +1,34 @@
+from typing import Any, Dict, List, NamedTuple, TYPE_CHECKING
+from .message_parser import FormattedMessage
+from .utils import add_noise_int
+
+if TYPE_CHECKING:
+    # src.mt5 imports MetaTrader5
+    from .mt5 import OrderLeg
+
+# The legs of a signal are planned as soon as the message is parsed: lot,
+# noisy SL / TP distances in points and the configured deviation. Only the
+# bid / ask is applied at send time, in MetaTrader.place_orders.
+
+class OrderPlan(NamedTuple):
+    label: str # 'order' or 'noise order', used in the notifications
+    orders_config: List[Dict[str, Any]]
+    legs: List['OrderLeg']
+
+def plan_orders(trader_config: Dict[str, Any], result: FormattedMessage) -> OrderPlan | None:
+    if not result['valid']:
+        return None
+    if result['type'] == 'normal':
+        label, orders_config = 'order', trader_config['orders']
+    elif result['type'] == 'noise_order':
+        label, orders_config = 'noise order', trader_config['noise_order']
+    else:
+        return None
+    return OrderPlan(label, orders_config, [
+        {
+            'lot': float(order_config['lot']),
+            'sl': add_noise_int(order_config['sl'], order_config['noise_sl']),
+            'tp': add_noise_int(order_config['tp'], order_config['noise_tp']),
+            'deviation': int(order_config['deviation']),
+        } for order_config in orders_config
+    ])
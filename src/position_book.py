@@ -0,0 +1,61 @@
+import time
+from typing import Dict, List, Literal, Tuple
+
+POSITION_TYPE_BUY = 0 # ENUM_POSITION_TYPE.POSITION_TYPE_BUY
+POSITION_TYPE_SELL = 1 # ENUM_POSITION_TYPE.POSITION_TYPE_SELL
+
+PositionKey = Tuple[str, int] # (symbol, magic)
+# [buy count, sell count, buy volume, sell volume]
+PositionTotals = List[float]
+
+# Open position counts and volumes of one account per symbol/magic and side.
+# Our own fills are added right away, positions closed by SL/TP or by hand
+# disappear on the next reconcile with positions_get. Fills that land while a
+# reconcile is in flight are replayed on top of it, so counts only ever
+# overstate between syncs, which is the safe side for max_total_positions.
+class PositionBook:
+    def __init__(self):
+        self.totals: Dict[PositionKey, PositionTotals] = {}
+        self.synced = False
+        self.last_fill_at = None # wall clock of our last fill
+        self._fill_seq = 0
+        self._recent_fills: List[Tuple[int, PositionKey, int, float]] = []
+
+    @staticmethod
+    def _side(order_type: Literal['BUY', 'SELL']) -> int:
+        return POSITION_TYPE_BUY if order_type == 'BUY' else POSITION_TYPE_SELL
+
+    def count(self, symbol: str, order_type: Literal['BUY', 'SELL']) -> int:
+        side = self._side(order_type)
+        return int(sum(totals[side] for (key_symbol, _), totals in self.totals.items() if key_symbol == symbol))
+
+    def volume(self, symbol: str, order_type: Literal['BUY', 'SELL']) -> float:
+        side = self._side(order_type)
+        return sum(totals[side + 2] for (key_symbol, _), totals in self.totals.items() if key_symbol == symbol)
+
+    def add_fill(self, symbol: str, magic: int, order_type: Literal['BUY', 'SELL'], volume: float):
+        side = self._side(order_type)
+        key = (symbol, magic)
+        self._apply(self.totals, key, side, volume)
+        self._fill_seq += 1
+        self._recent_fills.append((self._fill_seq, key, side, volume))
+        self.last_fill_at = time.time()
+
+    @staticmethod
+    def _apply(totals: Dict[PositionKey, PositionTotals], key: PositionKey, side: int, volume: float):
+        entry = totals.setdefault(key, [0, 0, 0.0, 0.0])
+        entry[side] += 1
+        entry[side + 2] += volume
+
+    def begin_reconcile(self) -> int:
+        return self._fill_seq
+
+    def reconcile(self, totals: Dict[PositionKey, PositionTotals], token: int):
+        # totals: positions_get result taken after begin_reconcile returned token
+        totals = {key: list(entry) for key, entry in totals.items()}
+        for seq, key, side, volume in self._recent_fills:
+            if seq > token:
+                self._apply(totals, key, side, volume)
+        self._recent_fills = [fill for fill in self._recent_fills if fill[0] > token]
+        self.totals = totals
+        self.synced = True
@@ -0,0 +1,338 @@
+import argparse
+import asyncio
+import copy
+import json
+import random
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Literal
+import numpy as np
+from .dispatcher import AccountDispatcher
+from .message_parser import MessageParser
+from .router import SignalRouter
+from .session_calendar import SessionCalendar
+from .telegram_bot import TelegramBot
+
+# Offline replay of recorded channel messages against historical ticks.
+# Messages go through the same TelegramBot.handle_channel_message (routing,
+# parsing, pre-trade checks, order legs) with every trader backed by a
+# SimulatedMetaTrader instead of an MT5 terminal.
+#
+# messages: json lines {"peer_id": 678910, "id": 1, "date": 1737338986.0, "text": "..."}
+# ticks: csv "time,bid,ask" with a header row, or .npz with time/bid/ask arrays,
+#        time in unix seconds (the same clock as the bot's adjusted tick timestamp)
+# variants: json list of {"name": "...", "trader": {trader config overrides}}
+#
+# py -m src.replay --config config.json --messages messages.jsonl --ticks XAUUSD.npz --variants variants.json
+
+SIDE_BUY = 1
+SIDE_SELL = -1
+
+class TickHistory:
+    def __init__(self, times: np.ndarray, bid: np.ndarray, ask: np.ndarray):
+        order = np.argsort(times, kind='stable')
+        self.times = np.ascontiguousarray(times[order], dtype=np.float64)
+        self.bid = np.ascontiguousarray(bid[order], dtype=np.float64)
+        self.ask = np.ascontiguousarray(ask[order], dtype=np.float64)
+
+    @classmethod
+    def load(cls, path: str) -> 'TickHistory':
+        if path.endswith('.npz'):
+            data = np.load(path)
+            return cls(data['time'], data['bid'], data['ask'])
+        data = np.loadtxt(path, delimiter=',', skiprows=1, usecols=(0, 1, 2), ndmin=2)
+        return cls(data[:, 0], data[:, 1], data[:, 2])
+
+    def index_at(self, t: float) -> int:
+        # last tick at or before t, -1 before the first tick
+        return int(np.searchsorted(self.times, t, side='right')) - 1
+
+class SimulatedMetaTrader:
+    # Same async api as AsyncMetaTraderBase, as far as handle_channel_message uses it.
+    # Every position's exit is resolved when it is opened: the first later tick
+    # that crosses its SL or TP, found for all legs of a signal at once with numpy.
+    def __init__(self, trader_config: Dict[str, Any], ticks: TickHistory, point: float, contract_size: float, balance: float):
+        self.id = trader_config['id']
+        self.ticker = trader_config['ticker']
+        self.ticks = ticks
+        self.point = point
+        self.contract_size = contract_size
+        self.balance = balance
+        self.healthy = True
+        # replayed signals outside the trading sessions are skipped like live ones
+        self.calendar = SessionCalendar(trader_config.get('trading_sessions'), trader_config['timezone_adjust'])
+        self.now = 0.0
+        # one row per filled leg
+        self.entry_time: List[float] = []
+        self.exit_time: List[float] = []
+        self.side: List[int] = []
+        self.lot: List[float] = []
+        self.entry_price: List[float] = []
+        self.exit_price: List[float] = []
+
+    def _arrays(self):
+        return (
+            np.asarray(self.entry_time), np.asarray(self.exit_time), np.asarray(self.side),
+            np.asarray(self.lot), np.asarray(self.entry_price), np.asarray(self.exit_price),
+        )
+
+    def _tick(self, idx: int) -> Dict[str, Any]:
+        if idx < 0:
+            raise RuntimeError("Failed to get tick data")
+        return {
+            "timestamp": float(self.ticks.times[idx]),
+            "bid": float(self.ticks.bid[idx]),
+            "ask": float(self.ticks.ask[idx]),
+            "point": self.point,
+        }
+
+    async def get_latest_tick(self) -> Dict[str, Any]:
+        return self._tick(self.ticks.index_at(self.now))
+
+    async def get_tick_data(self) -> Dict[str, Any]:
+        return self._tick(self.ticks.index_at(self.now))
+
+    async def get_position_count(self, ticker: str, order_type: Literal['BUY', 'SELL']) -> int:
+        if not self.side:
+            return 0
+        entry_time, exit_time, side, *_ = self._arrays()
+        wanted = SIDE_BUY if order_type == 'BUY' else SIDE_SELL
+        return int(np.count_nonzero((entry_time <= self.now) & (exit_time > self.now) & (side == wanted)))
+
+    async def get_exposure(self, ticker: str, order_type: Literal['BUY', 'SELL']) -> Dict[str, Any]:
+        if not self.side:
+            return {'count': 0, 'volume': 0.0, 'last_fill_at': None}
+        entry_time, exit_time, side, lot, *_ = self._arrays()
+        wanted = SIDE_BUY if order_type == 'BUY' else SIDE_SELL
+        opened = (entry_time <= self.now) & (exit_time > self.now) & (side == wanted)
+        return {
+            'count': int(np.count_nonzero(opened)),
+            'volume': round(float(lot[opened].sum()), 2),
+            'last_fill_at': self.entry_time[-1],
+        }
+
+    def pnl_at(self, t: float) -> tuple:
+        # (realized, floating) of every leg opened so far, as of time t
+        if not self.side:
+            return 0.0, 0.0
+        entry_time, exit_time, side, lot, entry_price, exit_price = self._arrays()
+        closed = exit_time <= t
+        realized = np.sum((exit_price[closed] - entry_price[closed]) * side[closed] * lot[closed]) * self.contract_size
+        opened = (entry_time <= t) & ~closed
+        floating = 0.0
+        if opened.any():
+            idx = self.ticks.index_at(t)
+            # buys close on bid, sells on ask
+            close_price = np.where(side[opened] == SIDE_BUY, self.ticks.bid[idx], self.ticks.ask[idx])
+            floating = np.sum((close_price - entry_price[opened]) * side[opened] * lot[opened]) * self.contract_size
+        return float(realized), float(floating)
+
+    async def get_equity_snapshot(self, timestamp) -> Dict[str, float]:
+        realized, floating = self.pnl_at(self.now)
+        previous_realized, previous_floating = self.pnl_at(timestamp)
+        return {
+            "equity": self.balance + realized + floating,
+            "previous_equity": self.balance + previous_realized + previous_floating,
+            "realized": realized - previous_realized,
+            "floating": floating,
+        }
+
+    async def place_orders(self, legs: List[Dict[str, Any]], order_type: Literal['BUY', 'SELL'], comment = '') -> List[Dict[str, Any]]:
+        idx = self.ticks.index_at(self.now)
+        tick = self._tick(idx)
+        side = SIDE_BUY if order_type == 'BUY' else SIDE_SELL
+        entry = tick['ask'] if side == SIDE_BUY else tick['bid']
+        sl_points = np.array([float(leg['sl']) for leg in legs])
+        tp_points = np.array([float(leg['tp']) for leg in legs])
+        sl = entry - side * sl_points * self.point
+        tp = entry + side * tp_points * self.point
+        exit_idx, exit_price = self._resolve_exits(idx + 1, side, sl, tp)
+
+        results = []
+        for leg_idx, leg in enumerate(legs):
+            self.entry_time.append(tick['timestamp'])
+            self.exit_time.append(float(self.ticks.times[exit_idx[leg_idx]]) if exit_idx[leg_idx] >= 0 else float('inf'))
+            self.side.append(side)
+            self.lot.append(float(leg['lot']))
+            self.entry_price.append(entry)
+            self.exit_price.append(float(exit_price[leg_idx]))
+            results.append({
+                'leg': leg_idx,
+                'ok': True,
+                'order': len(self.side),
+                'volume': float(leg['lot']),
+                'retcode': 10009,
+                'magic': 123456 if side == SIDE_BUY else 0,
+                'request_price': entry,
+                'price': entry,
+                'deviation': int(leg['deviation']),
+                'slippage': 0.0,
+                'error': None,
+                'latency': 0.0,
+                'elapsed': 0.0,
+            })
+        return results
+
+    def _resolve_exits(self, start: int, side: int, sl: np.ndarray, tp: np.ndarray):
+        # first tick from start where each leg hits SL or TP, scanned in growing
+        # windows so a leg closing soon does not touch the rest of the history
+        legs = len(sl)
+        exit_idx = np.full(legs, -1, dtype=np.int64)
+        exit_price = np.full(legs, np.nan)
+        prices = self.ticks.bid if side == SIDE_BUY else self.ticks.ask
+        pending = np.arange(legs)
+        window = 4096
+        while pending.size and start < len(prices):
+            end = min(start + window, len(prices))
+            chunk = prices[start:end]
+            if side == SIDE_BUY:
+                hit = (chunk[None, :] <= sl[pending, None]) | (chunk[None, :] >= tp[pending, None])
+            else:
+                hit = (chunk[None, :] >= sl[pending, None]) | (chunk[None, :] <= tp[pending, None])
+            any_hit = hit.any(axis=1)
+            first = hit.argmax(axis=1)
+            done = pending[any_hit]
+            exit_idx[done] = start + first[any_hit]
+            exit_price[done] = prices[exit_idx[done]]
+            pending = pending[~any_hit]
+            start = end
+            window *= 4
+        return exit_idx, exit_price
+
+    def close_all(self):
+        # positions still open at the end of the history close at the last tick
+        last = len(self.ticks.times) - 1
+        for idx, exit_time in enumerate(self.exit_time):
+            if exit_time == float('inf'):
+                self.exit_time[idx] = float(self.ticks.times[last])
+                self.exit_price[idx] = float(self.ticks.bid[last] if self.side[idx] == SIDE_BUY else self.ticks.ask[last])
+
+    def report(self) -> Dict[str, Any]:
+        if not self.side:
+            return {'legs': 0, 'wins': 0, 'win_rate': 0.0, 'pnl': 0.0, 'max_drawdown': 0.0}
+        entry_time, exit_time, side, lot, entry_price, exit_price = self._arrays()
+        pnl = (exit_price - entry_price) * side * lot * self.contract_size
+        curve = np.cumsum(pnl[np.argsort(exit_time, kind='stable')])
+        drawdown = np.maximum.accumulate(np.maximum(curve, 0)) - curve
+        return {
+            'legs': int(pnl.size),
+            'wins': int(np.count_nonzero(pnl > 0)),
+            'win_rate': float(np.count_nonzero(pnl > 0) / pnl.size),
+            'pnl': float(pnl.sum()),
+            'max_drawdown': float(drawdown.max()),
+        }
+
+class ReplayNotifier:
+    def __init__(self):
+        self.messages: List[tuple] = []
+
+    def enqueue(self, chat_id: int, message: str):
+        self.messages.append((chat_id, message))
+
+class ReplayBot(TelegramBot):
+    # TelegramBot without telegram or MT5: handle_channel_message is unchanged
+    def __init__(self, config, ticks: TickHistory, point: float, contract_size: float, balance: float):
+        self.config = config
+        self.parser = MessageParser(config.get('message_formats'))
+        self.notifier = ReplayNotifier()
+        self.traders = [
+            SimulatedMetaTrader(trader_config, ticks, point, contract_size, balance)
+            for trader_config in config['traders']
+        ]
+        self.router = SignalRouter(config, self.traders)
+        self.dispatcher = AccountDispatcher()
+        self.trace_log = None
+        self.signal_index = None
+        self.journal = None
+        self.traders_ready = None
+        self.now = 0.0
+        self.clock = lambda: self.now
+
+    async def replay(self, messages: List[Dict[str, Any]], delay: float = 0.0):
+        # delay: seconds between the message time and the bot acting on it
+        for message in messages:
+            self.now = float(message['date']) + delay
+            for trader in self.traders:
+                trader.now = self.now
+            try:
+                await self.handle_channel_message(make_event(message))
+            except ValueError as e:
+                print(f"[Replay] message {message.get('id')}: {e}")
+        for trader in self.traders:
+            trader.close_all()
+
+def make_event(message: Dict[str, Any]):
+    date = datetime.fromtimestamp(float(message['date']), timezone.utc)
+    telegram_message = SimpleNamespace(
+        id=message.get('id', 0),
+        date=date,
+        peer_id=SimpleNamespace(channel_id=int(message['peer_id'])),
+        raw_text=message['text'],
+        text=message['text'],
+    )
+    return SimpleNamespace(message=telegram_message, raw_text=message['text'], id=telegram_message.id)
+
+def load_messages(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as file:
+        messages = [json.loads(line) for line in file if line.strip()]
+    return sorted(messages, key=lambda message: float(message['date']))
+
+def run_variants(
+        config: Dict[str, Any],
+        messages: List[Dict[str, Any]],
+        ticks: TickHistory,
+        variants: List[Dict[str, Any]],
+        point: float = 0.01,
+        contract_size: float = 100,
+        balance: float = 10000,
+        delay: float = 0.0,
+        seed: int = 0,
+    ) -> Dict[str, Dict[str, Any]]:
+    # {variant name: {trader id: report}}, every variant replays from a clean account
+    reports = {}
+    for variant in variants or [{'name': 'config', 'trader': {}}]:
+        variant_config = copy.deepcopy(config)
+        for trader_config in variant_config['traders']:
+            trader_config.update(copy.deepcopy(variant.get('trader', {})))
+        random.seed(seed) # same order_probability / noise draws for every variant
+        bot = ReplayBot(variant_config, ticks, point, contract_size, balance)
+        asyncio.run(bot.replay(messages, delay))
+        reports[variant['name']] = {trader.id: trader.report() for trader in bot.traders}
+    return reports
+
+def format_reports(reports: Dict[str, Dict[str, Any]]) -> str:
+    lines = [f"{'variant':<20}{'trader':<14}{'legs':>6}{'win%':>8}{'pnl':>14}{'max dd':>12}"]
+    for name, traders in reports.items():
+        for trader_id, report in traders.items():
+            lines.append(
+                f"{name:<20}{trader_id:<14}{report['legs']:>6}{report['win_rate'] * 100:>8.1f}"
+                f"{report['pnl']:>14.2f}{report['max_drawdown']:>12.2f}"
+            )
+    return '\n'.join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay recorded signals against historical ticks')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--messages', required=True)
+    parser.add_argument('--ticks', required=True)
+    parser.add_argument('--variants')
+    parser.add_argument('--point', type=float, default=0.01)
+    parser.add_argument('--contract-size', type=float, default=100)
+    parser.add_argument('--balance', type=float, default=10000)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        config = json.load(file)
+    variants = None
+    if args.variants:
+        with open(args.variants, 'r') as file:
+            variants = json.load(file)
+    started = time.perf_counter()
+    messages = load_messages(args.messages)
+    ticks = TickHistory.load(args.ticks)
+    reports = run_variants(config, messages, ticks, variants, args.point, args.contract_size, args.balance, args.delay, args.seed)
+    print(format_reports(reports))
+    print(f"\n{len(messages)} messages, {len(ticks.times)} ticks, {len(reports)} variant(s) in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,164 @@
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Tuple
+from .message_parser import ValidMessage
+from .metrics import REGISTRY
+from .utils import random_by_probability
+
+# Pre-trade checks of one trader. Every check reads the same RiskContext, which
+# loads each part of the account snapshot (tick, open positions, equity) at most
+# once and only when a check asks for it. Checks run cheapest first and stop at
+# the first rejection, so a signal rejected on price never costs an equity query.
+#
+# The five original checks come from the trader's config keys. More rules can be
+# added per trader with "risk_rules" in config.json, eg.
+#   "risk_rules": [
+#       {"type": "max_spread", "points": 40},
+#       {"type": "cooldown", "seconds": 60},
+#       {"type": "max_exposure", "lots": 4}
+#   ]
+
+RISK_CHECKS = REGISTRY.counter('risk_checks_total', 'Pre-trade check outcomes', ('trader', 'check', 'result'))
+
+# cost of what a check reads
+COST_LOCAL = 0 # the message or bot state
+COST_TICK = 1 # shared tick snapshot
+COST_POSITIONS = 2 # position book
+COST_TERMINAL = 3 # round trip to the terminal
+
+def daily_cutoff_timestamp(now: float, cutoff_timezone: str) -> float:
+    today = datetime.fromtimestamp(now, timezone(timedelta(hours=int(cutoff_timezone)))).isoformat()
+    return datetime.fromisoformat(f'{today[0:10]}T00:00:00+{cutoff_timezone}:00').timestamp()
+
+class RiskContext:
+    def __init__(self, trader, trader_config: Dict[str, Any], result: ValidMessage, order_type: Literal['BUY', 'SELL'], now: float, planned_volume: float = 0.0):
+        self.trader = trader
+        self.trader_config = trader_config
+        self.result = result
+        self.order_type = order_type
+        self.now = now
+        self.planned_volume = planned_volume # lots of the legs this signal would send
+        self.rejected_by: str | None = None # name of the check that rejected the signal
+        self._tick = None
+        self._exposure = None
+        self._equity = None
+
+    async def tick(self) -> Dict[str, Any]:
+        if self._tick == None:
+            self._tick = await self.trader.get_latest_tick()
+        return self._tick
+
+    async def exposure(self) -> Dict[str, Any]:
+        if self._exposure == None:
+            self._exposure = await self.trader.get_exposure(self.trader_config['ticker'], self.order_type)
+        return self._exposure
+
+    async def equity(self) -> Dict[str, Any]:
+        if self._equity == None:
+            cutoff = daily_cutoff_timestamp(self.now, self.trader_config['daily_margin_cutoff_timezone'])
+            self._equity = await self.trader.get_equity_snapshot(cutoff)
+        return self._equity
+
+# a check returns the rejection message, or None to let the signal through
+CheckFunction = Callable[[RiskContext, Dict[str, Any]], Awaitable[str | None]]
+
+async def check_price_diff(ctx: RiskContext, params: Dict[str, Any]) -> str | None:
+    tick_data = await ctx.tick()
+    tick_price = tick_data['ask'] if ctx.order_type == 'BUY' else tick_data['bid']
+    if abs(tick_price - ctx.result['current_price']) > float(ctx.trader_config['acceptable_price_diff']):
+        return f'Tick price [{tick_price}] & message price [{ctx.result['current_price']}] diff > {ctx.trader_config['acceptable_price_diff']}'
+    return None
+
+async def check_max_positions(ctx: RiskContext, params: Dict[str, Any]) -> str | None:
+    position_count = (await ctx.exposure())['count']
+    side = 'buy' if ctx.order_type == 'BUY' else 'sell'
+    if position_count >= ctx.trader_config['max_total_positions'][side]:
+        return f'Received telegram message but there is/are {position_count} {side} order already (Max: {ctx.trader_config['max_total_positions'][side]})'
+    return None
+
+async def check_timestamp(ctx: RiskContext, params: Dict[str, Any]) -> str | None:
+    # within 30s of signal receive message time vs VM time
+    tick_data = await ctx.tick()
+    if abs(tick_data['timestamp'] - ctx.result['message_timestamp']) > 30:
+        return f'Tick timestamp [{tick_data['timestamp']}] & message timestamp [{ctx.result['message_timestamp']}] diff > 30'
+    return None
+
+async def check_daily_margin(ctx: RiskContext, params: Dict[str, Any]) -> str | None:
+    equity_snapshot = await ctx.equity()
+    equity = equity_snapshot['equity']
+    prev_equity = equity_snapshot['previous_equity']
+    if prev_equity - equity > int(ctx.trader_config['daily_margin']):
+        return f'Reached daily margin:\nPrevious Equity: {prev_equity}\nCurrent Equity: {equity}\nMargin: {ctx.trader_config['daily_margin']}'
+    return None
+
+async def check_probability(ctx: RiskContext, params: Dict[str, Any]) -> str | None:
+    # reverse the value to make the code cleaner
+    if ctx.result['type'] == 'normal':
+        if random_by_probability(100 - ctx.trader_config['order_probability']):
+            return f'Not handling this executing (order probability: {ctx.trader_config['order_probability']}%)'
+    elif ctx.result['type'] == 'noise_order':
+        if random_by_probability(100 - ctx.trader_config['noise_order_probaility']):
+            return f'Not handling this noise (noise order probability: {ctx.trader_config['noise_order_probaility']}%)'
+    return None
+
+async def check_max_spread(ctx: RiskContext, params: Dict[str, Any]) -> str | None:
+    tick_data = await ctx.tick()
+    spread = round((tick_data['ask'] - tick_data['bid']) / tick_data['point'])
+    if spread > float(params['points']):
+        return f'Spread [{spread}] > {params['points']} points'
+    return None
+
+async def check_cooldown(ctx: RiskContext, params: Dict[str, Any]) -> str | None:
+    last_fill_at = (await ctx.exposure())['last_fill_at']
+    if last_fill_at != None and ctx.now - last_fill_at < float(params['seconds']):
+        return f'Last order was {ctx.now - last_fill_at:.0f}s ago (cooldown: {params['seconds']}s)'
+    return None
+
+async def check_max_exposure(ctx: RiskContext, params: Dict[str, Any]) -> str | None:
+    # open lots on the signal's side plus the lots it would add
+    volume = (await ctx.exposure())['volume']
+    if round(volume + ctx.planned_volume, 8) > float(params['lots']):
+        return f'Open {ctx.order_type.lower()} volume [{volume}] + planned [{ctx.planned_volume}] > max exposure {params['lots']} lots'
+    return None
+
+# type -> (cost, check)
+RISK_RULES: Dict[str, Tuple[int, CheckFunction]] = {
+    'probability': (COST_LOCAL, check_probability),
+    'price_diff': (COST_TICK, check_price_diff),
+    'timestamp': (COST_TICK, check_timestamp),
+    'max_spread': (COST_TICK, check_max_spread),
+    'max_positions': (COST_POSITIONS, check_max_positions),
+    'cooldown': (COST_POSITIONS, check_cooldown),
+    'max_exposure': (COST_POSITIONS, check_max_exposure),
+    'daily_margin': (COST_TERMINAL, check_daily_margin),
+}
+BUILT_IN_RULES = ['price_diff', 'max_positions', 'timestamp', 'daily_margin', 'probability']
+
+class RiskCheck:
+    __slots__ = ('name', 'cost', 'run', 'params')
+
+    def __init__(self, name: str, params: Dict[str, Any]):
+        if name not in RISK_RULES:
+            raise ValueError(f'Unknown risk rule type: {name}')
+        self.name = name
+        self.cost, self.run = RISK_RULES[name]
+        self.params = params
+
+class RiskEngine:
+    def __init__(self, trader_config: Dict[str, Any]):
+        checks = [RiskCheck(name, {}) for name in BUILT_IN_RULES]
+        for rule in trader_config.get('risk_rules', []):
+            checks.append(RiskCheck(rule['type'], rule))
+        # stable sort, checks of the same cost keep the order above
+        self.checks: List[RiskCheck] = sorted(checks, key=lambda check: check.cost)
+
+    async def evaluate(self, ctx: RiskContext, trace = None) -> str | None:
+        for check in self.checks:
+            rejection = await check.run(ctx, check.params)
+            if trace != None:
+                trace.lap(f'check_{check.name}', ctx.trader_config['id'])
+            if rejection != None:
+                ctx.rejected_by = check.name
+                RISK_CHECKS.inc((ctx.trader_config['id'], check.name, 'rejected'))
+                return rejection
+            RISK_CHECKS.inc((ctx.trader_config['id'], check.name, 'passed'))
+        return None
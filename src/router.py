@@ -0,0 +1,34 @@
+from typing import Any, Dict, List, NamedTuple, Tuple
+from .risk import RiskEngine
+
+class Subscriber(NamedTuple):
+    idx: int # index in config['traders']
+    trader_config: Dict[str, Any]
+    trader: Any # AsyncMetaTraderBase
+    risk: RiskEngine
+
+class Route(NamedTuple):
+    signal: Dict[str, Any]
+    subscribers: Tuple[Subscriber, ...]
+
+# peer id -> signal -> subscribed traders and their risk checks, built once from the config.
+# A config reload builds a new SignalRouter and swaps it in one assignment,
+# so a message is always routed against one consistent table.
+class SignalRouter:
+    def __init__(self, config: Dict[str, Any], traders: List[Any]):
+        routes: Dict[int, Route] = {}
+        for signal in config['signals']:
+            peer_id = abs(int(signal['telegram_source_peer_id']))
+            if peer_id in routes:
+                # same as before: the first signal for a peer id wins
+                print(f"Duplicate telegram_source_peer_id {peer_id} for signal {signal['ticker']}, ignored")
+                continue
+            routes[peer_id] = Route(signal, tuple(
+                Subscriber(idx, trader_config, traders[idx], RiskEngine(trader_config))
+                for idx, trader_config in enumerate(config['traders'])
+                if trader_config['ticker'] == signal['ticker']
+            ))
+        self.routes = routes
+
+    def route(self, peer_id: int) -> Route | None:
+        return self.routes.get(abs(int(peer_id)))
@@ -0,0 +1,60 @@
+from bisect import bisect_right
+from typing import Dict, List
+
+# Weekly trading sessions of a trader's symbol, so signals that arrive while the
+# market is closed (weekend, daily rollover break) are dropped before any call
+# to the terminal. The MetaTrader5 python package has no call for the symbol's
+# session times, they are set per trader in config.json in broker server time,
+# as shown in the terminal's symbol specification, eg.
+#   "trading_sessions": {"mon": ["01:05-23:55"], "tue": ["01:05-23:55"], ..., "fri": ["01:05-23:55"]}
+# A day that is missing has no session. Without "trading_sessions" every hour is
+# open. The symbol's trade_mode (MetaTrader.is_market_avail) is refreshed once a
+# day on top, a disabled or close only symbol is closed all week.
+
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+WEEK = 7 * 24 * 3600
+# 1970-01-01 was a thursday, shifts epoch seconds to seconds since monday 00:00
+MONDAY_OFFSET = 3 * 24 * 3600
+
+def _parse_time(value: str) -> int:
+    hours, minutes = value.split(':')
+    seconds = int(hours) * 3600 + int(minutes) * 60
+    if not 0 <= seconds <= 24 * 3600:
+        raise ValueError(f'Invalid session time: {value}')
+    return seconds
+
+class SessionCalendar:
+    def __init__(self, sessions: Dict[str, List[str]] | None = None, timezone_adjust: int = 0):
+        # timezone_adjust: hours the broker server time is ahead of UTC, as in the trader config
+        self.server_offset = int(timezone_adjust) * 3600
+        self.trade_enabled = True # symbol trade_mode, refreshed by the bot
+        self.always_open = sessions == None
+        # sorted open / close boundaries in seconds since monday 00:00,
+        # even index = opens, so the market is open when bisect lands on an odd index
+        self.bounds: List[int] = []
+        if sessions == None:
+            return
+        unknown = [day for day in sessions if day not in DAYS]
+        if unknown:
+            raise ValueError(f'Unknown session days: {unknown}')
+        ranges = []
+        for day_idx, day in enumerate(DAYS):
+            for session in sessions.get(day, []):
+                start, end = (_parse_time(value) for value in session.split('-'))
+                if end <= start:
+                    raise ValueError(f'Session {day} {session} ends before it starts')
+                ranges.append((day_idx * 24 * 3600 + start, day_idx * 24 * 3600 + end))
+        # sessions touching each other (fri 24:00 / sat 00:00) become one
+        for start, end in sorted(ranges):
+            if self.bounds and start <= self.bounds[-1]:
+                self.bounds[-1] = max(self.bounds[-1], end)
+            else:
+                self.bounds.extend((start, end))
+
+    def is_open(self, t: float) -> bool:
+        # t: unix timestamp
+        if not self.trade_enabled:
+            return False
+        if self.always_open:
+            return True
+        return bisect_right(self.bounds, (t + self.server_offset + MONDAY_OFFSET) % WEEK) % 2 == 1
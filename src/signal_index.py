@@ -0,0 +1,60 @@
+import sqlite3
+import time
+from typing import Iterable, List
+
+# Idempotency index of handled signals, keyed by (peer id, message id, trader id).
+# A signal is claimed for a trader before anything is sent to its terminal, so a
+# message telegram redelivers, or sees again after a restart, is skipped instead
+# of placing the same orders twice. Rows older than ttl seconds are evicted.
+
+class SignalIndex:
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, evict_interval: float = 600):
+        self.path = path
+        self.ttl = ttl
+        self.evict_interval = evict_interval
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS signals ('
+            'peer_id INTEGER NOT NULL, message_id INTEGER NOT NULL, trader_id TEXT NOT NULL, claimed_at REAL NOT NULL, '
+            'PRIMARY KEY (peer_id, message_id, trader_id)) WITHOUT ROWID'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS signals_claimed_at ON signals (claimed_at)')
+        self._last_evict = 0.0
+        self.evict()
+
+    def claim(self, peer_id: int, message_id: int, trader_ids: Iterable[str]) -> List[str]:
+        # returns the trader ids that had not seen this message, now claimed for them
+        now = time.time()
+        if now - self._last_evict > self.evict_interval:
+            self.evict(now)
+        claimed = []
+        self._db.execute('BEGIN')
+        try:
+            for trader_id in trader_ids:
+                cursor = self._db.execute(
+                    'INSERT OR IGNORE INTO signals (peer_id, message_id, trader_id, claimed_at) VALUES (?, ?, ?, ?)',
+                    (peer_id, message_id, trader_id, now),
+                )
+                if cursor.rowcount == 1:
+                    claimed.append(trader_id)
+            self._db.execute('COMMIT')
+        except Exception:
+            self._db.execute('ROLLBACK')
+            raise
+        return claimed
+
+    def seen(self, peer_id: int, message_id: int, trader_id: str) -> bool:
+        return self._db.execute(
+            'SELECT 1 FROM signals WHERE peer_id = ? AND message_id = ? AND trader_id = ?',
+            (peer_id, message_id, trader_id),
+        ).fetchone() != None
+
+    def evict(self, now: float | None = None) -> int:
+        now = time.time() if now == None else now
+        self._last_evict = now
+        return self._db.execute('DELETE FROM signals WHERE claimed_at < ?', (now - self.ttl,)).rowcount
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,64 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+from .mt5_async import AsyncMetaTraderBase
+
+# One per trader. Heartbeats the terminal with terminal_info / account_info every
+# heartbeat_interval seconds, or right away when a call to it fails. A failed
+# heartbeat marks the trader unhealthy, so handle_channel_message skips it
+# instead of paying a timeout per signal, and reconnects with exponential
+# backoff (up to reconnect_max_backoff seconds) until the terminal is back.
+
+class ConnectionSupervisor:
+    def __init__(self, trader: AsyncMetaTraderBase, notify: Callable[[str], Awaitable[None]]):
+        self.trader = trader
+        self.notify = notify
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.trader.check_now.wait(), self.trader.heartbeat_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.trader.check_now.clear()
+            error = await self.check()
+            if error != None:
+                await self.recover(error)
+
+    async def check(self) -> str | None:
+        try:
+            status = await self.trader.check_connection()
+        except Exception as e:
+            return repr(e)
+        return status['error']
+
+    async def recover(self, error: str):
+        trader = self.trader
+        down_since = time.time()
+        trader.healthy = False
+        trader.health_error = error
+        print(f"[{trader.id}] MT5 connection lost: {error}")
+        await self.notify(f'MT5 connection lost, signals are skipped until it is back:\n{error}')
+        backoff = 1
+        while True:
+            try:
+                await trader.reconnect()
+                error = await self.check()
+            except Exception as e:
+                error = repr(e)
+            if error == None:
+                break
+            trader.health_error = error
+            print(f"[{trader.id}] MT5 reconnect failed, retry in {backoff}s: {error}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, trader.reconnect_max_backoff)
+        # positions may have closed while the terminal was away
+        try:
+            await trader.sync_positions()
+        except Exception as e:
+            print(f"[{trader.id}] Position sync error: {e!r}")
+        trader.check_now.clear()
+        trader.health_error = None
+        trader.healthy = True
+        print(f"[{trader.id}] MT5 reconnected after {time.time() - down_since:.1f}s")
+        await self.notify(f'MT5 reconnected after {time.time() - down_since:.0f}s')
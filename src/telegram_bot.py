@@ -1,32 +1,244 @@
+import asyncio
+import functools
+import time
+import traceback
 from telethon import TelegramClient, events
-from .message_parser import MessageParser
-from .mt5 import MetaTrader
-from datetime import datetime, timezone, timedelta
-from .utils import add_noise_int, random_by_probability
+from typing import Any, Dict, List
+from .catch_up import CatchUp, CatchUpClient
+from .config_manager import ConfigDiff, ConfigManager
+from .dialog_cache import DialogCache
+from .dispatcher import AccountDispatcher
+from .ingest import SignalIngest
+from .journal import TradeJournal
+from .message_parser import FormattedMessage, MessageParser
+from .metrics import REGISTRY, MetricsServer
+from .mt5_async import AsyncMetaTraderBase
+from .notifier import NotificationDispatcher
+from .order_planner import OrderPlan, plan_orders
+from .mt5_pool import MetaTraderPool
+from .risk import RiskContext, RiskEngine
+from .router import SignalRouter
+from .signal_index import SignalIndex
+from .supervisor import ConnectionSupervisor
+from .tracing import SignalTrace, TraceLog
+
+SIGNALS = REGISTRY.counter('signals_total', 'Parsed signal messages', ('source', 'valid'))
+SIGNALS_SKIPPED = REGISTRY.counter('signals_skipped_total', 'Signals a trader skipped before the checks', ('trader', 'reason'))
+SIGNAL_SECONDS = REGISTRY.histogram('signal_seconds', 'Message arrival to every trader done')
+ORDER_LEGS = REGISTRY.counter('order_legs_total', 'Order legs sent', ('trader', 'result'))
+ORDER_SEND_SECONDS = REGISTRY.histogram('order_send_seconds', 'order_send latency per leg', ('trader',))
+TRADER_HEALTHY = REGISTRY.gauge('trader_healthy', '1 while the MT5 terminal is connected', ('trader',))
+DISPATCH_DEPTH = REGISTRY.gauge('dispatch_queue_depth', 'Signals queued per account', ('trader',))
+NOTIFY_DEPTH = REGISTRY.gauge('notify_queue_depth', 'Notifications queued per chat', ('chat',))
+NOTIFY_FAILED = REGISTRY.gauge('notify_failed', 'Notifications dropped after retries', ('chat',))
+NOTIFY_FLOOD_WAITS = REGISTRY.gauge('notify_flood_waits', 'Telegram flood waits per chat', ('chat',))
+NOTIFY_LATENCY = REGISTRY.gauge('notify_latency_seconds', 'Enqueue to delivery of notifications (last, max, avg)', ('chat', 'stat'))
 
 class TelegramBot:
-    def __init__(self, config):
+    def __init__(self, config, config_path: str | None = None):
         self.config = config
-        self.parser = MessageParser()
-        self.client = TelegramClient(
-            'telegram_session',
-            config['telegram']['api_id'],
-            config['telegram']['api_hash'],
+        # watched for changes while the bot runs, see src/config_manager.py
+        self.config_path = config_path
+        self.parser = MessageParser(config.get('message_formats'))
+        # every session listens to the signal chats and the first copy of a message
+        # is handled, see src/ingest.py. The first one also sends the notifications
+        sessions = config['telegram'].get('sessions') or ['telegram_session']
+        self.clients: Dict[str, TelegramClient] = {
+            session: CatchUpClient(
+                session,
+                config['telegram']['api_id'],
+                config['telegram']['api_hash'],
+            ) for session in sessions
+        }
+        self.client = self.clients[sessions[0]]
+        # the catch up fetches over the first session, so basic group message ids of both agree
+        self.ingest = SignalIngest(self.receive_message, basic_group_sessions=[sessions[0], 'catch_up'])
+        # last handled message per chat, messages missed while disconnected are fetched, see src/catch_up.py
+        catch_up_path = config.get('catch_up_state', 'catch_up.json')
+        self.catch_up = CatchUp(
+            catch_up_path,
+            float(config.get('catch_up_max_age', 30)),
+            int(config.get('catch_up_limit', 100)),
+        ) if catch_up_path else None
+        self.notifier = NotificationDispatcher(
+            self.client,
+            float(config.get('notification', {}).get('coalesce_window', 0.5)),
+        )
+        # one MT5 worker process per trader, started in start()
+        self.traders = MetaTraderPool(
+            config['traders'],
+            config.get('mt5_module', 'MetaTrader5'),
+            config.get('mt5_mode', 'process'),
         )
-        # create mt5 instance for each traders
-        traders = [None for _ in range(len(config['traders']))]
-        for idx, trader in enumerate(config['traders']):
-            # self, ticker: str, login: int, password: str, server: str, path: str
-            traders[idx] = MetaTrader(
-                trader['ticker'],
-                int(trader['mt5_login']),
-                trader['mt5_password'],
-                trader['mt5_server'],
-                trader['mt5_path'],
-                trader['timezone_adjust'],
+        self.router = SignalRouter(config, self.traders)
+        self.dispatcher = AccountDispatcher()
+        # per-signal latency spans, see src/tracing.py
+        self.trace_log = TraceLog(config['trace_log']) if config.get('trace_log') else None
+        # signals, check decisions and order results, see src/journal.py
+        self.journal = TradeJournal(config['trade_journal']) if config.get('trade_journal') else None
+        # (peer id, message id, trader id) already handled, see src/signal_index.py
+        signal_index_path = config.get('signal_index', 'signal_index.sqlite3')
+        self.signal_index = SignalIndex(signal_index_path, float(config.get('signal_index_ttl', 7 * 24 * 3600))) if signal_index_path else None
+        # configured chats resolve from here on a warm start, see src/dialog_cache.py
+        self.dialog_cache = DialogCache(config.get('dialog_cache', 'dialog_cache.json'))
+        # set by start(), done once every terminal is logged in
+        self.traders_ready: asyncio.Task | None = None
+        # trader id -> position sync and connection supervisor tasks
+        self.background_tasks: Dict[str, List[asyncio.Task]] = {}
+        # session -> NewMessage filter of the configured chats, replaced when a reload changes them
+        self.chats_events: Dict[str, events.NewMessage] = {}
+        self.chats: List[int] = []
+        # wall clock of the pre-trade checks, the replay engine swaps in the replayed time
+        self.clock = time.time
+        # prometheus scrape endpoint, see src/metrics.py
+        metrics_port = int(config.get('metrics_port', 0))
+        self.metrics_server = MetricsServer(REGISTRY, config.get('metrics_host', '127.0.0.1'), metrics_port) if metrics_port else None
+
+    async def apply_config(self, config, diff: ConfigDiff):
+        # new workers log in and new chats resolve first, then everything is swapped
+        # in without an await in between, handlers in flight keep the old tables
+        current = {trader.id: trader for trader in self.traders}
+        restarted = set(diff.added + diff.reconnected)
+        started = {
+            trader_config['id']: self.traders.create(trader_config)
+            for trader_config in config['traders'] if trader_config['id'] in restarted
+        }
+        # in thread mode the old and new worker share the process' one MetaTrader5
+        # connection, the old one's mt5.shutdown() would close the new one's login,
+        # so it is stopped first and the trader is skipped meanwhile
+        stopped_first = diff.removed + diff.reconnected if self.traders.mt5_mode == 'thread' and started else []
+        for trader_id in stopped_first:
+            await self.stop_trader(current[trader_id], 'MT5 worker restarting for a config change')
+        try:
+            await asyncio.gather(*(
+                asyncio.wait_for(trader.start(), trader.timeouts['start']) for trader in started.values()
+            ))
+            chats = await self.resolve_chats(config['signals']) if diff.chats_changed else None
+            if diff.chats_changed and chats == None:
+                raise ValueError("Invalid Source Chat ID in the new config")
+        except BaseException:
+            await asyncio.gather(*(trader.shutdown() for trader in started.values()), return_exceptions=True)
+            # the running config stays, so do its workers
+            for trader_id in stopped_first:
+                trader = current[trader_id]
+                await asyncio.wait_for(trader.start(), trader.timeouts['start'])
+                trader.healthy = True
+                trader.health_error = None
+                self.start_background(trader, next(item for item in self.config['traders'] if item['id'] == trader_id))
+            raise
+        for trader_config in config['traders']:
+            if trader_config['id'] in diff.updated:
+                current[trader_config['id']].update_config(trader_config)
+
+        self.traders.workers = [started.get(trader_config['id']) or current[trader_config['id']] for trader_config in config['traders']]
+        self.router = SignalRouter(config, self.traders)
+        if diff.formats_changed:
+            self.parser = MessageParser(config.get('message_formats'))
+        if chats != None:
+            self.listen(chats)
+        self.config = config
+
+        for trader_id, trader in started.items():
+            trader_config = next(item for item in config['traders'] if item['id'] == trader_id)
+            self.stop_background(trader_id)
+            self.start_background(trader, trader_config)
+            await self.send_noti(
+                int(trader_config['noti_chat_id']),
+                f'MT5 bot started:\nTicker: {trader_config['ticker']}\nServer: {trader_config['mt5_server']}\nAccount: {trader_config['mt5_login']}',
+                trader_id
             )
-        self.traders = traders
+        for trader_id in diff.removed + diff.reconnected:
+            if trader_id in stopped_first:
+                continue
+            if trader_id in diff.removed:
+                self.stop_background(trader_id)
+            await self.stop_trader(current[trader_id])
+
+    async def stop_trader(self, trader: AsyncMetaTraderBase, reason: str | None = None):
+        # old worker of a removed or reconnected trader
+        if reason != None:
+            # skipped by dispatch until its replacement is swapped in
+            trader.healthy = False
+            trader.health_error = reason
+            self.stop_background(trader.id)
+        # signals already queued for the old worker still go out on it
+        await self.dispatcher.drain(trader.id)
+        await trader.shutdown()
+
+    def listen(self, chats: List[int]):
+        # the new filter is added before the old one goes, no message falls in between
+        for session, client in self.clients.items():
+            handler = self.ingest.source(session)
+            chats_event = events.NewMessage(chats=chats)
+            client.add_event_handler(handler, chats_event)
+            if session in self.chats_events:
+                client.remove_event_handler(handler, self.chats_events[session])
+            self.chats_events[session] = chats_event
+        self.chats = chats
+
+    async def start_sessions(self):
+        # one after another, a new session asks for its login on the console
+        for session, client in list(self.clients.items()):
+            if client is self.client:
+                continue
+            try:
+                await client.start()
+            except Exception as e:
+                print(f"Telegram session {session} failed to start, listening without it: {e!r}")
+                del self.clients[session]
+
+    def watch_reconnects(self):
+        # fetch what was posted while a session was reconnecting, see CatchUpClient
+        for client in self.clients.values():
+            client.on_reconnect = self.catch_up_missed
+
+    async def catch_up_missed(self):
+        try:
+            fresh, stale = await self.catch_up.fetch(self.client, self.chats, time.time())
+        except Exception as e:
+            print(f"[CatchUp] Failed: {e!r}")
+            return
+        if fresh or stale:
+            print(f"[CatchUp] {len(fresh)} missed message(s) to handle, {len(stale)} too old skipped")
+        for chat_id, message_id in stale:
+            self.ingest.mark(chat_id, message_id)
+        handler = self.ingest.source('catch_up')
+        for event in fresh:
+            try:
+                await handler(event)
+            except Exception:
+                traceback.print_exc()
+
+    async def run_catch_up(self, save_interval: float = 5):
+        await self.catch_up_missed()
+        while True:
+            await asyncio.sleep(save_interval)
+            self.catch_up.save()
+
+    async def receive_message(self, event):
+        # first copy of every message, from any session or the catch up
+        if self.catch_up != None:
+            self.catch_up.advance(event.chat_id, event.message.id)
+        await self.handle_channel_message(event)
+
+    async def stop_sessions(self):
+        for client in self.clients.values():
+            if client is not self.client:
+                await client.disconnect()
+        if len(self.clients) > 1:
+            print(self.ingest.report())
     
+    def collect_metrics(self):
+        for trader in self.traders:
+            TRADER_HEALTHY.set((trader.id,), 1 if trader.healthy else 0)
+            DISPATCH_DEPTH.set((trader.id,), self.dispatcher.depth(trader.id))
+        for chat_id, stats in self.notifier.metrics().items():
+            NOTIFY_DEPTH.set((chat_id,), stats['queue_depth'])
+            NOTIFY_FAILED.set((chat_id,), stats['failed'])
+            NOTIFY_FLOOD_WAITS.set((chat_id,), stats['flood_waits'])
+            for stat in ('last', 'max', 'avg'):
+                NOTIFY_LATENCY.set((chat_id, stat), stats[f'{stat}_latency'])
+
     async def print_telegram_channels(self):
         await self.client.start()
         dialogs = await self.client.get_dialogs()
@@ -37,18 +249,19 @@ class TelegramBot:
 
     async def start(self):
         print("\nStarting Telegram-MT5 bot...\n")
+        if self.metrics_server != None:
+            await self.metrics_server.start()
+        # terminals log in while telegram connects, handlers wait for them
+        self.traders_ready = asyncio.create_task(self.start_traders())
         await self.client.start()
+        await self.start_sessions()
 
-        dialogs = await self.client.get_dialogs()
-        chats = []
-        for signal in self.config['signals']:
-            dialog = next((item for item in dialogs if str(item.id) == signal['telegram_source_chat_id']), None)
-            if (dialog == None):
-                print(f"Invalid Source Chat ID for signal {signal['ticker']}")
-                await self.client.disconnect()
-                return
-            print(f"Listening to channel [{dialog.title}] for signal [{signal['ticker']}]")
-            chats.append(int(signal['telegram_source_chat_id']))
+        chats = await self.resolve_chats(self.config['signals'])
+        if chats == None:
+            await self.client.disconnect()
+            await self.stop_sessions()
+            await self.stop_traders()
+            return
         for idx, trader_config in enumerate(self.config['traders']):
             await self.send_noti(
                 int(trader_config['noti_chat_id']),
@@ -56,23 +269,119 @@ class TelegramBot:
                 trader_config['id']
             )
             
-        self.client.add_event_handler(
-            self.handle_channel_message,
-            events.NewMessage(chats=chats)
-        )
+        self.listen(chats)
+        catch_up_task = None
+        if self.catch_up != None:
+            self.watch_reconnects()
+            catch_up_task = asyncio.create_task(self.run_catch_up())
+        config_watch = None
+        if self.config_path != None and float(self.config.get('config_reload_interval', 2)) > 0:
+            config_watch = asyncio.create_task(ConfigManager(self, self.config_path, float(self.config.get('config_reload_interval', 2))).run())
         
+        # the registry is global, the collector only lives as long as this run
+        REGISTRY.collectors.append(self.collect_metrics)
         print("Bot started\n")
-        await self.client.run_until_disconnected()
+        try:
+            # start_traders disconnects the client when a terminal fails to log in
+            if not (self.traders_ready.done() and self.traders_ready.exception() != None):
+                await self.client.run_until_disconnected()
+            if self.traders_ready.done():
+                self.traders_ready.result()
+        finally:
+            REGISTRY.collectors.remove(self.collect_metrics)
+            if config_watch != None:
+                config_watch.cancel()
+            if catch_up_task != None:
+                catch_up_task.cancel()
+                self.catch_up.save()
+            if self.metrics_server != None:
+                await self.metrics_server.close()
+            await self.stop_sessions()
+            await self.dispatcher.close()
+            await self.notifier.close()
+            await self.stop_traders()
+            if self.signal_index != None:
+                self.signal_index.close()
+            if self.journal != None:
+                self.journal.close()
+            if self.trace_log != None:
+                self.trace_log.close()
+
+    async def start_traders(self):
+        started = time.perf_counter()
+        try:
+            await self.traders.start()
+        except Exception:
+            print("Failed to start MT5 terminals")
+            traceback.print_exc()
+            # ends run_until_disconnected
+            await self.client.disconnect()
+            raise
+        for trader, trader_config in zip(self.traders, self.config['traders']):
+            self.start_background(trader, trader_config)
+        print(f"MT5 terminals connected in {time.perf_counter() - started:.1f}s")
+
+    def start_background(self, trader: AsyncMetaTraderBase, trader_config):
+        async def notify(message: str):
+            # chat of the running config, a reload can move it without restarting the trader
+            current = next((item for item in self.config['traders'] if item['id'] == trader.id), trader_config)
+            await self.send_noti(int(current['noti_chat_id']), message, trader.id)
+        supervisor = ConnectionSupervisor(trader, notify)
+        self.background_tasks[trader.id] = [
+            asyncio.create_task(trader.run_position_sync()),
+            asyncio.create_task(supervisor.run()),
+            asyncio.create_task(trader.run_calendar_refresh()),
+        ]
+
+    def stop_background(self, trader_id: str):
+        for task in self.background_tasks.pop(trader_id, []):
+            task.cancel()
+
+    async def stop_traders(self):
+        if not self.traders_ready.done():
+            self.traders_ready.cancel()
+        await asyncio.gather(self.traders_ready, return_exceptions=True)
+        for trader_id in list(self.background_tasks):
+            self.stop_background(trader_id)
+        await self.traders.shutdown()
+
+    async def resolve_chats(self, signals: List[Dict[str, Any]]) -> List[int] | None:
+        # configured chats from the session's entity cache and the dialog cache,
+        # the full dialog list is only downloaded when one of them is missing
+        chats = []
+        titles = {}
+        for signal in signals:
+            chat_id = int(signal['telegram_source_chat_id'])
+            title = self.dialog_cache.get(chat_id)
+            if title != None:
+                try:
+                    await self.client.get_input_entity(chat_id)
+                except ValueError:
+                    title = None
+            titles[chat_id] = title
+            chats.append(chat_id)
+
+        if any(title == None for title in titles.values()):
+            dialogs = await self.client.get_dialogs()
+            self.dialog_cache.update(dialogs)
+            self.dialog_cache.save()
+            titles = {chat_id: self.dialog_cache.get(chat_id) for chat_id in titles}
+
+        for signal in signals:
+            title = titles[int(signal['telegram_source_chat_id'])]
+            if (title == None):
+                print(f"Invalid Source Chat ID for signal {signal['ticker']}")
+                return None
+            print(f"Listening to channel [{title}] for signal [{signal['ticker']}]")
+        return chats
     
     async def send_noti(self, chat_id: int, message: str, title: str | None = None,):
+        # queued for the notifier, never waits for telegram
         if chat_id == 0:
             return
-        if self.client.is_connected():
-            formmatted_message = (f'[{title}]\n' + message) if title != None else message
-            # print(formmatted_message)
-            await self.client.send_message(entity=chat_id, message=formmatted_message)
-        else:
-            raise SystemError("Telegram Client is not connected")
+        formmatted_message = (f'[{title}]\n' + message) if title != None else message
+        # print(formmatted_message)
+        self.notifier.enqueue(chat_id, formmatted_message)
         
     async def handle_channel_message(self, event):
         message = event.message
@@ -86,178 +395,193 @@ class TelegramBot:
         if source_peer_id == None:
             raise ValueError("Cannot find Source Peer Id from message")
 
-        signal = next(
-            (item for item in self.config['signals'] if abs(int(item["telegram_source_peer_id"])) == abs(int(source_peer_id))), None
-        )
-        # print(f"match signal: {signal['ticker']}")
-        if signal == None:
+        trace = SignalTrace(source_peer_id, message.id, message.date.timestamp())
+        trace.lap('receive')
+        received = time.perf_counter()
+
+        route = self.router.route(source_peer_id)
+        if route == None:
             raise ValueError("Cannot find match ticker")
-        
-        for idx, trader_config in enumerate(self.config['traders']):
-            # only execute if this trader's ticker matches with signal's
-            if trader_config['ticker'] != signal['ticker']:
-                continue
+        if len(route.subscribers) == 0:
+            # nobody trades this signal, do not even parse it
+            return
+        # print(f"match signal: {route.signal['ticker']}")
+        trace.lap('route')
 
-            # parse telegram msg
-            result = self.parser.parse(event, signal['message_type'])
-            # print(result)
-
-            if result['valid']:
-                # 1. check TG price vs market price
-                tick_data = self.traders[idx].get_tick_data()
-                order_type = None
-                if result['trend'] == 'Up':
-                    order_type = 'BUY'
-                    if abs(tick_data['ask'] - result['current_price']) > float(trader_config['acceptable_price_diff']):
-                        await self.send_noti(
-                            int(trader_config['noti_chat_id']),
-                            f'Tick price [{tick_data['ask']}] & message price [{result['current_price']}] diff > {trader_config['acceptable_price_diff']}',
-                            trader_config['id']
-                        )
-                        continue
-                if result['trend'] == 'Down':
-                    order_type = 'SELL'
-                    if abs(tick_data['bid'] - result['current_price']) > float(trader_config['acceptable_price_diff']):
-                        await self.send_noti(
-                            int(trader_config['noti_chat_id']),
-                            f'Tick price [{tick_data['bid']}] & message price [{result['current_price']}] diff > {trader_config['acceptable_price_diff']}',
-                            trader_config['id']
-                        )
-                        continue
-                if order_type not in ['BUY', 'SELL']:
-                    # sanity check
-                    await self.send_noti(
-                        int(trader_config['noti_chat_id']),
-                        f'Unknown order_type, check bot terminal: ' + str(order_type),
-                        trader_config['id']
-                    )
-                    raise TypeError
-
-                
-                # 2. check open positions counts
-                positions = self.traders[idx].get_positions(trader_config['ticker'])
-                buy_positions = [p for p in positions if p['type'] == 0] # ENUM_POSITION_TYPE.POSITION_TYPE_BUY 
-                sell_positions = [p for p in positions if p['type'] == 1] # ENUM_POSITION_TYPE.POSITION_TYPE_SELL
-                if order_type == 'BUY' and len(buy_positions) >= trader_config['max_total_positions']['buy']:
-                    await self.send_noti(
-                        int(trader_config['noti_chat_id']),
-                        f'Received telegram message but there is/are {len(buy_positions)} buy order already (Max: {trader_config['max_total_positions']['buy']})',
-                        trader_config['id']
-                    )
+        # accounts whose terminal is down or whose market is closed are skipped right away,
+        # see src/supervisor.py and src/session_calendar.py
+        now = self.clock()
+        subscribers = route.subscribers
+        if not all(subscriber.trader.healthy and subscriber.trader.calendar.is_open(now) for subscriber in subscribers):
+            for subscriber in subscribers:
+                if not subscriber.trader.healthy:
+                    check, reason = 'connection', subscriber.trader.health_error
+                    notification = f'Signal skipped, MT5 connection is down: {reason}'
+                elif not subscriber.trader.calendar.is_open(now):
+                    check, reason = 'market_hours', f'{subscriber.trader_config['ticker']} market is closed'
+                    notification = f'Signal skipped, {reason}'
+                else:
                     continue
-                if order_type == 'SELL' and len(sell_positions) >= trader_config['max_total_positions']['sell']:
-                    await self.send_noti(
-                        int(trader_config['noti_chat_id']),
-                        f'Received telegram message but there is/are {len(sell_positions)} sell order already (Max: {trader_config['max_total_positions']['sell']})',
-                        trader_config['id']
+                SIGNALS_SKIPPED.inc((subscriber.trader_config['id'], check))
+                if self.journal != None:
+                    self.journal.record(
+                        'decision', src=source_peer_id, msg=message.id, trader=subscriber.trader_config['id'],
+                        accepted=False, check=check, reason=reason,
                     )
-                    continue
+                await self.send_noti(
+                    int(subscriber.trader_config['noti_chat_id']),
+                    notification,
+                    subscriber.trader_config['id']
+                )
+            subscribers = tuple(subscriber for subscriber in subscribers if subscriber.trader.healthy and subscriber.trader.calendar.is_open(now))
+            if len(subscribers) == 0:
+                return
 
-                # 3. check time - within 30s of signal receive message time vs VM time
-                if abs(tick_data['timestamp'] - result['message_timestamp']) > 30:
-                    await self.send_noti(
-                        int(trader_config['noti_chat_id']),
-                        f'Tick timestamp [{tick_data['timestamp']}] & message timestamp [{result['message_timestamp']}] diff > 30',
-                        trader_config['id']
-                    )
-                    continue
+        # claimed before any terminal call, traders that already handled this message skip it
+        if self.signal_index != None:
+            claimed = self.signal_index.claim(source_peer_id, message.id, [subscriber.trader_config['id'] for subscriber in subscribers])
+            for subscriber in subscribers:
+                if subscriber.trader_config['id'] not in claimed:
+                    SIGNALS_SKIPPED.inc((subscriber.trader_config['id'], 'duplicate'))
+            subscribers = tuple(subscriber for subscriber in subscribers if subscriber.trader_config['id'] in claimed)
+            if len(subscribers) == 0:
+                print(f"Message {message.id} from {source_peer_id} already handled, skipped")
+                return
+            trace.lap('dedup')
 
-                # 4. daily margin
-                today = datetime.now(timezone(timedelta(hours=int(trader_config['daily_margin_cutoff_timezone'])))).isoformat()
-                last_cutoff_timestamp = datetime.fromisoformat(f'{today[0:10]}T00:00:00+{trader_config['daily_margin_cutoff_timezone']}:00').timestamp()
-                equity = self.traders[idx].get_current_equity()
-                prev_equity = self.traders[idx].get_previous_equity(last_cutoff_timestamp)
-                if prev_equity - equity > int(trader_config['daily_margin']):
-                    await self.send_noti(
-                        int(trader_config['noti_chat_id']),
-                        f'Reached daily margin:\nPrevious Equity: {prev_equity}\nCurrent Equity: {equity}\nMargin: {trader_config['daily_margin']}',
-                        trader_config['id']
-                    )
-                    continue
+        # parse telegram msg, once for every trader
+        result = self.parser.parse(event, route.signal['message_type'])
+        # print(result)
+        trace.lap('parse')
+        SIGNALS.inc((source_peer_id, result['valid']))
+        if self.journal != None:
+            self.journal.record(
+                'signal', src=source_peer_id, msg=message.id, valid=result['valid'], type=result.get('type'),
+                trend=result.get('trend'), price=result.get('current_price'), message_ts=result.get('message_timestamp'),
+            )
 
-                if result['type'] == 'normal':
-                    # 5a. order probability, reverse the value to make the code cleaner
-                    if random_by_probability(100 - trader_config['order_probability']):
-                        await self.send_noti(
-                            int(trader_config['noti_chat_id']),
-                            f'Not handling this executing (order probability: {trader_config['order_probability']}%)',
-                            trader_config['id']
-                        )
-                        continue
-
-                    # 6a. place order
-                    orders_id = []
-                    for order_config in trader_config['orders']:
-                        try:
-                            order_result = self.traders[idx].place_order(
-                                float(order_config['lot']),
-                                order_type,
-                                add_noise_int(order_config['sl'], order_config['noise_sl']),
-                                add_noise_int(order_config['tp'], order_config['noise_tp']),
-                                int(order_config['deviation']),
-                                f"{str(result['message_timestamp'])[-4:]}" # comment in mt5
-                            )
-                            orders_id.append(order_result.order)
-                        except Exception as e:
-                            await self.send_noti(
-                                int(trader_config['noti_chat_id']),
-                                f'Unable to place order for this config, please check bot terminal\n' + str(order_config),
-                                trader_config['id']
-                            )
-                            raise e
-                    await self.send_noti(
-                        int(trader_config['noti_chat_id']),
-                        f'Orders placed: ' + str(orders_id),
-                        trader_config['id']
-                    )
+        if self.traders_ready != None and not self.traders_ready.done():
+            # a signal during startup waits for the terminals to log in
+            await asyncio.shield(self.traders_ready)
+            trace.lap('wait_traders')
 
-                elif result['type'] == 'noise_order':
-                    # 5b. noise order probability, reverse the value to make the code cleaner
-                    if random_by_probability(100 - trader_config['noise_order_probaility']):
-                        await self.send_noti(
-                            int(trader_config['noti_chat_id']),
-                            f'Not handling this noise (noise order probability: {trader_config['noise_order_probaility']}%)',
-                            trader_config['id']
-                        )
-                        continue
-
-
-                    # 6b. place noise order
-                    orders_id = []
-                    for order_config in trader_config['noise_order']:
-                        try:
-                            order_result = self.traders[idx].place_order(
-                                float(order_config['lot']),
-                                order_type,
-                                add_noise_int(order_config['sl'], order_config['noise_sl']),
-                                add_noise_int(order_config['tp'], order_config['noise_tp']),
-                                int(order_config['deviation']),
-                                f"{str(result['message_timestamp'])[-4:]}" # comment in mt5
-                            )
-                            orders_id.append(order_result.order)
-                        except Exception as e:
-                            await self.send_noti(
-                                int(trader_config['noti_chat_id']),
-                                f'Unable to place noise order for this config, please check bot terminal\n' + str(order_config),
-                                trader_config['id']
-                            )
-                            raise e
-                    await self.send_noti(
-                        int(trader_config['noti_chat_id']),
-                        f'Noise orders placed: ' + str(orders_id),
-                        trader_config['id']
-                    )
-                    # await self.send_noti(
-                    #     int(trader_config['noti_chat_id']),
-                    #     f'Received noise orders: ' + result['raw_msg'],
-                    #     trader_config['id']
-                    # )
-            else:
+        # SL / TP noise of every trader's legs drawn now, only bid / ask is left for send time
+        plans = [plan_orders(subscriber.trader_config, result) for subscriber in subscribers]
+        trace.lap('plan_orders')
+
+        # every subscribed trader handles the signal at the same time,
+        # queued behind earlier signals of the same account
+        jobs = []
+        for (idx, trader_config, trader, risk), plan in zip(subscribers, plans):
+            # the trader's queue span starts when its job is queued
+            trace.begin(trader_config['id'])
+            jobs.append(self.dispatcher.submit(
+                trader_config['id'],
+                functools.partial(self.handle_trader_signal, trader, trader_config, risk, result, plan, trace),
+            ))
+        outcomes = await asyncio.gather(*jobs, return_exceptions=True)
+        for (idx, trader_config, trader, risk), outcome in zip(subscribers, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"[{trader_config['id']}] Failed to handle signal")
+                traceback.print_exception(outcome)
+        SIGNAL_SECONDS.observe((), time.perf_counter() - received)
+        if self.trace_log != None:
+            self.trace_log.record(trace)
+
+    async def handle_trader_signal(self, trader: AsyncMetaTraderBase, trader_config, risk: RiskEngine, result: FormattedMessage, plan: OrderPlan | None, trace: SignalTrace):
+        trader_id = trader_config['id']
+        trace.lap('queue', trader_id)
+        if result['valid']:
+            order_type = None
+            if result['trend'] == 'Up':
+                order_type = 'BUY'
+            if result['trend'] == 'Down':
+                order_type = 'SELL'
+            if order_type not in ['BUY', 'SELL']:
+                # sanity check
+                await self.send_noti(
+                    int(trader_config['noti_chat_id']),
+                    f'Unknown order_type, check bot terminal: ' + str(order_type),
+                    trader_config['id']
+                )
+                raise TypeError
+
+            # 1-5. pre-trade checks on one snapshot of the account, cheapest first, see src/risk.py
+            planned_volume = sum(leg['lot'] for leg in plan.legs) if plan != None else 0.0
+            ctx = RiskContext(trader, trader_config, result, order_type, self.clock(), planned_volume)
+            rejection = await risk.evaluate(ctx, trace)
+            if self.journal != None:
+                self.journal.record(
+                    'decision', src=trace.source, msg=trace.message_id, trader=trader_id,
+                    accepted=rejection == None, check=ctx.rejected_by, reason=rejection,
+                )
+            if rejection != None:
                 await self.send_noti(
                     int(trader_config['noti_chat_id']),
-                    result['msg'],
+                    rejection,
                     trader_config['id']
                 )
+                return
+
+            if plan != None:
+                # 6. place the planned orders / noise orders
+                await self.place_legs(trader, trader_config, plan, order_type, result, trace)
+                # await self.send_noti(
+                #     int(trader_config['noti_chat_id']),
+                #     f'Received noise orders: ' + result['raw_msg'],
+                #     trader_config['id']
+                # )
+        else:
+            await self.send_noti(
+                int(trader_config['noti_chat_id']),
+                result['msg'],
+                trader_config['id']
+            )
+            trace.lap('notify', trader_id)
+
+    async def place_legs(self, trader: AsyncMetaTraderBase, trader_config, plan: OrderPlan, order_type, result, trace: SignalTrace):
+        # all legs go out in a single call to the terminal,
+        # a failed leg is reported without stopping the remaining ones
+        label = plan.label
+        send_start = time.perf_counter()
+        leg_results = await trader.place_orders(
+            plan.legs,
+            order_type,
+            f"{str(result['message_timestamp'])[-4:]}" # comment in mt5
+        )
+        for leg_result in leg_results:
+            # timings measured inside the worker, placed relative to the call
+            trace.add(f"order_send[{leg_result['leg']}]", trader_config['id'], send_start + leg_result['elapsed'] - leg_result['latency'], leg_result['latency'])
+            ORDER_LEGS.inc((trader_config['id'], 'ok' if leg_result['ok'] else 'failed'))
+            if leg_result['request_price'] != None:
+                # order_send was called
+                ORDER_SEND_SECONDS.observe((trader_config['id'],), leg_result['latency'])
+        trace.lap('place_orders', trader_config['id'])
+        if self.journal != None:
+            for leg, leg_result in zip(plan.legs, leg_results):
+                self.journal.record(
+                    'order', src=trace.source, msg=trace.message_id, trader=trader_config['id'], label=label, order_type=order_type,
+                    leg=leg_result['leg'], ok=leg_result['ok'], order=leg_result['order'], retcode=leg_result['retcode'],
+                    volume=leg['lot'], sl=leg['sl'], tp=leg['tp'], deviation=leg_result['deviation'], request_price=leg_result['request_price'],
+                    price=leg_result['price'], slippage=leg_result['slippage'], latency=leg_result['latency'], error=leg_result['error'],
+                )
+        orders_id = []
+        for order_config, leg_result in zip(plan.orders_config, leg_results):
+            if leg_result['ok']:
+                orders_id.append(leg_result['order'])
+                continue
+            print(f"[{trader_config['id']}] {label} leg {leg_result['leg']} failed: {leg_result['error']}")
+            await self.send_noti(
+                int(trader_config['noti_chat_id']),
+                f'Unable to place {label} for this config, please check bot terminal\n' + str(order_config) + '\n' + str(leg_result['error']),
+                trader_config['id']
+            )
+        await self.send_noti(
+            int(trader_config['noti_chat_id']),
+            f'{label.capitalize()}s placed: ' + str(orders_id),
+            trader_config['id']
+        )
+        trace.lap('notify', trader_config['id'])
 
 
 
@@ -0,0 +1,104 @@
+import json
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Per-signal latency trace: receive -> route -> parse -> per trader tick fetch,
+# each pre-trade check, each order_send and the notification hand off.
+# One compact JSON line per signal:
+#   {"ts": wall clock, "src": peer id, "msg": message id, "lag": ms from telegram
+#    message time to handler start, "spans": [[trader id or null, name, start ms, duration ms], ...]}
+# `py -m src.tracing signal_trace.log` prints percentiles per trader and per signal source.
+
+class SignalTrace:
+    def __init__(self, source: int, message_id: int, message_timestamp: float | None = None):
+        self.source = source
+        self.message_id = message_id
+        self.ts = time.time()
+        self.lag = (self.ts - message_timestamp) * 1000 if message_timestamp != None else None
+        self._start = time.perf_counter()
+        self._laps: Dict[str | None, float] = {}
+        self.spans: List[list] = []
+
+    def begin(self, trader: str):
+        # the next lap of this trader starts now instead of at the trace start
+        self._laps[trader] = time.perf_counter()
+
+    def lap(self, name: str, trader: str | None = None):
+        # span from the previous lap or begin of this trader (or the trace start) to now
+        now = time.perf_counter()
+        start = self._laps.get(trader, self._start)
+        self.add(name, trader, start, now - start)
+        self._laps[trader] = now
+
+    def add(self, name: str, trader: str | None, start: float, duration: float):
+        # start: perf_counter value, duration: seconds
+        self.spans.append([trader, name, round((start - self._start) * 1000, 3), round(duration * 1000, 3)])
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            'ts': round(self.ts, 3),
+            'src': self.source,
+            'msg': self.message_id,
+            'lag': round(self.lag, 3) if self.lag != None else None,
+            'spans': self.spans,
+        }
+
+class TraceLog:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def record(self, trace: SignalTrace):
+        self._file.write(json.dumps(trace.to_record(), ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def close(self):
+        self._file.close()
+
+def load(path: str) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def percentile(values: List[float], p: float) -> float:
+    # nearest rank, values must be sorted
+    if not values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+def summarize(records: Iterable[Dict[str, Any]]) -> Dict[str, Dict[Tuple[str, str], List[float]]]:
+    # {'trader': {(trader id, span): [ms...]}, 'source': {(peer id, span): [ms...]}}
+    by_trader: Dict[Tuple[str, str], List[float]] = {}
+    by_source: Dict[Tuple[str, str], List[float]] = {}
+    for record in records:
+        source = str(record['src'])
+        if record.get('lag') != None:
+            by_source.setdefault((source, 'receive_lag'), []).append(record['lag'])
+        trader_totals: Dict[str, float] = {}
+        for trader, name, start, duration in record['spans']:
+            by_source.setdefault((source, name), []).append(duration)
+            if trader != None:
+                by_trader.setdefault((trader, name), []).append(duration)
+                trader_totals[trader] = max(trader_totals.get(trader, 0.0), start + duration)
+        for trader, total in trader_totals.items():
+            by_trader.setdefault((trader, 'total'), []).append(total)
+    for table in (by_trader, by_source):
+        for values in table.values():
+            values.sort()
+    return {'trader': by_trader, 'source': by_source}
+
+def format_report(summary: Dict[str, Dict[Tuple[str, str], List[float]]]) -> str:
+    lines = []
+    for title, table in (('per trader', summary['trader']), ('per signal source', summary['source'])):
+        lines.append(f"== {title} (ms) ==")
+        lines.append(f"{'key':<16}{'span':<22}{'n':>6}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+        for (key, name), values in sorted(table.items()):
+            lines.append(
+                f"{key:<16}{name:<22}{len(values):>6}"
+                f"{percentile(values, 50):>10.2f}{percentile(values, 90):>10.2f}{percentile(values, 99):>10.2f}{values[-1]:>10.2f}"
+            )
+        lines.append('')
+    return '\n'.join(lines)
+
+if __name__ == "__main__":
+    print(format_report(summarize(load(sys.argv[1] if len(sys.argv) > 1 else 'signal_trace.log'))))
@@ -0,0 +1,35 @@
+import copy
+import json
+import os
+import sys
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+def load_example_config():
+    with open(os.path.join(ROOT, 'config.example.json'), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+@pytest.fixture
+def trader_config():
+    # first trader of config.example.json, against the in-memory fake terminal
+    trader = copy.deepcopy(load_example_config()['traders'][0])
+    trader['tick_stream_interval'] = 0
+    return trader
+
+@pytest.fixture
+def bot_config(tmp_path, monkeypatch):
+    # two traders on src.fake_mt5 worker processes, the telegram session and
+    # every state file land in tmp_path
+    monkeypatch.chdir(tmp_path)
+    config = load_example_config()
+    config.update({'mt5_module': 'src.fake_mt5', 'mt5_mode': 'process', 'trace_log': ''})
+    trader = config['traders'][0]
+    trader.update({'acceptable_price_diff': 10, 'order_probability': 100, 'noti_chat_id': '-1', 'tick_stream_interval': 0})
+    trader['orders'] = trader['orders'][:2]
+    # same account settings, but the fake terminal's price is never this close to the message
+    strict = copy.deepcopy(trader)
+    strict.update({'id': 'trader-2', 'mt5_login': '2', 'noti_chat_id': '-2', 'acceptable_price_diff': 0.000001})
+    config['traders'] = [trader, strict]
+    return config
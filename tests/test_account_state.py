@@ -0,0 +1,56 @@
+import numpy as np
+from src.account_state import deals_array, exposure, floating_pnl, position_totals, positions_array, realized_pnl, side_counts
+from src.fake_mt5 import TradeDeal, TradePosition
+
+def position(ticket: int, type: int, magic: int, volume: float, profit: float, swap: float = 0.0, symbol: str = 'XAUUSD'):
+    return TradePosition(ticket, 1000 + ticket, type, magic, volume, 2650.0, 2651.0, 0.0, 0.0, profit, swap, symbol, '')
+
+def deal(ticket: int, time: int, profit: float, commission: float):
+    return TradeDeal(ticket, ticket, time, 0, 1, 7, ticket, 0.1, 2650.0, commission, 0.0, profit, 'XAUUSD', '')
+
+POSITIONS = [
+    position(1, 0, 7, 0.5, 10.0, -1.0),
+    position(2, 0, 8, 0.3, -5.0),
+    position(3, 1, 7, 0.2, 2.0),
+    position(4, 1, 7, 1.0, 1.0, symbol='NVDA'),
+]
+
+def test_positions_array_columns():
+    positions = positions_array(POSITIONS)
+    assert len(positions) == 4
+    assert positions['ticket'].tolist() == [1, 2, 3, 4]
+    assert positions['symbol'].tolist() == ['XAUUSD', 'XAUUSD', 'XAUUSD', 'NVDA']
+    assert len(positions_array([])) == 0
+
+def test_side_totals_and_floating_pnl():
+    positions = positions_array(POSITIONS)
+    assert side_counts(positions) == (2, 2)
+    assert side_counts(positions, 'XAUUSD') == (2, 1)
+    assert exposure(positions, 'XAUUSD') == (0.8, 0.2)
+    assert floating_pnl(positions, 'XAUUSD') == 6.0
+    assert floating_pnl(positions) == 7.0
+
+def test_position_totals_match_a_dict_per_row():
+    rng = np.random.default_rng(5)
+    rows = [
+        position(ticket, int(rng.integers(2)), int(rng.integers(3)), float(rng.integers(1, 10)) / 10, 0.0, symbol=str(rng.choice(['XAUUSD', 'NVDA', 'BTCUSD'])))
+        for ticket in range(500)
+    ]
+    expected = {}
+    for row in rows:
+        entry = expected.setdefault((row.symbol, row.magic), [0, 0, 0.0, 0.0])
+        entry[row.type] += 1
+        entry[row.type + 2] += row.volume
+    totals = position_totals(positions_array(rows))
+    assert totals.keys() == expected.keys()
+    for key, entry in expected.items():
+        assert totals[key][:2] == entry[:2]
+        assert np.allclose(totals[key][2:], entry[2:])
+    assert position_totals(positions_array([])) == {}
+
+def test_realized_pnl_time_range():
+    deals = deals_array([deal(1, 100, 10.0, -1.0), deal(2, 200, 5.0, -1.0), deal(3, 300, -2.0, -1.0)])
+    assert realized_pnl(deals) == 10.0
+    assert realized_pnl(deals, 200) == 1.0
+    assert realized_pnl(deals, 100, 200) == 13.0
+    assert realized_pnl(deals_array([])) == 0.0
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from telethon import TelegramClient, events
+from telethon.sessions import MemorySession
+from telethon.tl.types import Message, PeerChannel
+from src.catch_up import CatchUp, CatchUpClient
+from src.telegram_bot import TelegramBot
+
+CHAT_ID = -1001234567890 # marked id of channel 1234567890
+
+def message(message_id: int, age: float, now: float) -> Message:
+    return Message(message_id, PeerChannel(1234567890), datetime.fromtimestamp(now - age, timezone.utc), 'XAUUSD')
+
+class FakeClient:
+    def __init__(self, messages):
+        self.messages = messages
+        self.calls = []
+
+    async def get_messages(self, chat_id: int, min_id: int = 0, limit: int = 100):
+        self.calls.append((chat_id, min_id, limit))
+        if chat_id not in self.messages:
+            raise ValueError(f'Cannot find any entity corresponding to "{chat_id}"')
+        # newest first, as telethon returns them
+        return sorted((message for message in self.messages[chat_id] if message.id > min_id), key=lambda message: -message.id)[:limit]
+
+def test_fetch_splits_fresh_and_stale(tmp_path):
+    now = time.time()
+    catch_up = CatchUp(str(tmp_path / 'catch_up.json'), max_age=30, limit=100)
+    catch_up.advance(CHAT_ID, 10)
+    client = FakeClient({CHAT_ID: [message(9, 100, now), message(11, 90, now), message(12, 5, now), message(13, 1, now)]})
+    fresh, stale = asyncio.run(catch_up.fetch(client, [CHAT_ID, -100999], now))
+    assert client.calls[0] == (CHAT_ID, 10, 100)
+    assert [(event.chat_id, event.message.id) for event in fresh] == [(CHAT_ID, 12), (CHAT_ID, 13)]
+    assert stale == [(CHAT_ID, 11)]
+    assert catch_up.last_ids == {str(CHAT_ID): 13}
+
+def test_state_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'catch_up.json')
+    catch_up = CatchUp(path)
+    catch_up.advance(CHAT_ID, 5)
+    catch_up.advance(CHAT_ID, 3)
+    catch_up.save()
+    assert CatchUp(path).last_ids == {str(CHAT_ID): 5}
+    (tmp_path / 'broken.json').write_text('{')
+    assert CatchUp(str(tmp_path / 'broken.json')).last_ids == {}
+
+def test_missed_messages_are_handled_once(bot_config):
+    async def main():
+        bot = TelegramBot(bot_config)
+        now = time.time()
+        bot.client = FakeClient({CHAT_ID: [message(1, 100, now), message(2, 5, now)]})
+        bot.chats = [CHAT_ID]
+        handled = []
+        async def handle_channel_message(event):
+            handled.append(event.message.id)
+        bot.handle_channel_message = handle_channel_message
+        await bot.catch_up_missed()
+        # the live copies arrive late on a session, both are dropped
+        live = bot.ingest.source('telegram_session')
+        for fetched in bot.client.messages[CHAT_ID]:
+            await live(events.NewMessage.Event(fetched))
+        return handled, bot.catch_up.last_ids
+    handled, last_ids = asyncio.run(main())
+    assert handled == [2]
+    assert last_ids == {str(CHAT_ID): 2}
+
+def test_auto_reconnect_calls_on_reconnect(monkeypatch):
+    async def handle_auto_reconnect(self):
+        pass
+    # telethon's own handler sends get_me, there is no connection here
+    monkeypatch.setattr(TelegramClient, '_handle_auto_reconnect', handle_auto_reconnect)
+    async def main():
+        client = CatchUpClient(MemorySession(), 111, 'aaa')
+        reconnects = []
+        async def on_reconnect():
+            reconnects.append(time.time())
+        client.on_reconnect = on_reconnect
+        # what the sender calls once it reconnected by itself
+        await client._sender._auto_reconnect_callback()
+        return reconnects
+    assert len(asyncio.run(main())) == 1
+
+def test_every_session_catches_up_after_a_reconnect(bot_config, monkeypatch):
+    async def handle_auto_reconnect(self):
+        pass
+    monkeypatch.setattr(TelegramClient, '_handle_auto_reconnect', handle_auto_reconnect)
+    bot_config['telegram']['sessions'] = ['session_1', 'session_2']
+    async def main():
+        bot = TelegramBot(bot_config)
+        fetched = []
+        async def fetch(client, chats, now):
+            fetched.append(client)
+            return [], []
+        bot.catch_up.fetch = fetch
+        bot.watch_reconnects()
+        for client in bot.clients.values():
+            await client._sender._auto_reconnect_callback()
+        for client in bot.clients.values():
+            client.session.close()
+        return fetched
+    assert len(asyncio.run(main())) == 2
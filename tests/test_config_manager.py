@@ -0,0 +1,97 @@
+import asyncio
+import copy
+import json
+import os
+import pytest
+from src.config_manager import ConfigManager, diff_config, validate_config
+
+def example_config():
+    with open(os.path.join(os.path.dirname(__file__), '..', 'config.example.json'), 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def with_traders(config, *trader_ids):
+    config['traders'] = [{**copy.deepcopy(config['traders'][0]), 'id': trader_id} for trader_id in trader_ids]
+    return config
+
+def test_example_config_is_valid():
+    validate_config(example_config())
+
+def test_every_problem_is_reported():
+    config = with_traders(example_config(), 'trader-1', 'trader-1', 'trader-3')
+    config['signals'][0]['message_type'] = 'BTCUSD'
+    del config['signals'][1]['ticker']
+    config['traders'][0]['order_probability'] = 101
+    config['traders'][0]['mt5_timeouts'] = {'place_oder': 10}
+    config['traders'][2]['mt5_login'] = 'abc'
+    config['traders'][2]['risk_rules'] = [{'type': 'max_slippage'}]
+    config['mt5_mode'] = 'thread'
+    with pytest.raises(ValueError) as error:
+        validate_config(config)
+    message = str(error.value)
+    for problem in (
+        'signals[0].message_type BTCUSD is unknown',
+        "signals[1] missing ['ticker']",
+        "mt5_mode 'thread' supports one trader only",
+        'traders[1].id trader-1 is duplicated',
+        'traders[0].order_probability is not in 0 to 100',
+        "traders[0].mt5_timeouts unknown ['place_oder']",
+        'traders[2] (trader-3) invalid value',
+        'traders[2].risk_rules: Unknown risk rule type: max_slippage',
+    ):
+        assert problem in message
+
+def test_diff_buckets():
+    old = with_traders(example_config(), 'trader-1', 'trader-2', 'trader-3', 'trader-4')
+    new = with_traders(example_config(), 'trader-1', 'trader-3', 'trader-4', 'trader-5')
+    new['traders'][0]['mt5_login'] = '999'
+    new['traders'][2]['daily_margin'] = 100
+    diff = diff_config(old, new)
+    assert (diff.added, diff.removed, diff.reconnected, diff.updated) == (['trader-5'], ['trader-2'], ['trader-1'], ['trader-4'])
+    assert diff.signals_changed
+    assert not diff.chats_changed
+    assert diff.static_changed == []
+    assert diff_config(old, copy.deepcopy(old)).empty()
+
+def test_signal_and_chat_changes():
+    old = example_config()
+    new = copy.deepcopy(old)
+    new['signals'][0]['message_type'] = 'XAUUSD'
+    diff = diff_config(old, new)
+    assert diff.signals_changed and not diff.chats_changed and not diff.empty()
+    new['signals'][0]['telegram_source_chat_id'] = '-999'
+    assert diff_config(old, new).chats_changed
+
+class FakeBot:
+    def __init__(self, config):
+        self.config = config
+        self.traders_ready = None
+        self.applied = []
+
+    async def apply_config(self, config, diff):
+        self.applied.append((config, diff))
+        self.config = config
+
+def test_reload_keeps_static_keys(tmp_path):
+    old = example_config()
+    new = copy.deepcopy(old)
+    new['mt5_module'] = 'src.fake_mt5'
+    new['traders'][0]['daily_margin'] = 100
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps(new), encoding='utf-8')
+    bot = FakeBot(old)
+    asyncio.run(ConfigManager(bot, str(path)).reload())
+    [(config, diff)] = bot.applied
+    assert diff.static_changed == ['mt5_module']
+    assert diff.updated == ['trader-1']
+    assert config['mt5_module'] == 'MetaTrader5'
+    assert config['traders'][0]['daily_margin'] == 100
+
+def test_invalid_reload_is_not_applied(tmp_path):
+    new = example_config()
+    new['traders'][0]['order_probability'] = 200
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps(new), encoding='utf-8')
+    bot = FakeBot(example_config())
+    with pytest.raises(ValueError):
+        asyncio.run(ConfigManager(bot, str(path)).reload())
+    assert bot.applied == []
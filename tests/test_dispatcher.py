@@ -0,0 +1,51 @@
+import asyncio
+import random
+import pytest
+from src.dispatcher import AccountDispatcher
+
+def test_jobs_of_one_account_run_in_order():
+    async def main():
+        dispatcher = AccountDispatcher()
+        running = {'trader-1': 0, 'trader-2': 0}
+        overlap = {'trader-1': 0, 'trader-2': 0}
+        done = {'trader-1': [], 'trader-2': []}
+        concurrent = []
+        rng = random.Random(3)
+        def job(account_id: str, idx: int):
+            async def run():
+                running[account_id] += 1
+                overlap[account_id] = max(overlap[account_id], running[account_id])
+                concurrent.append(sum(running.values()))
+                await asyncio.sleep(rng.uniform(0, 0.005))
+                running[account_id] -= 1
+                done[account_id].append(idx)
+                return idx
+            return run
+        futures = [dispatcher.submit(account_id, job(account_id, idx)) for idx in range(20) for account_id in done]
+        results = await asyncio.gather(*futures)
+        await dispatcher.close()
+        return done, overlap, concurrent, results
+    done, overlap, concurrent, results = asyncio.run(main())
+    assert done == {'trader-1': list(range(20)), 'trader-2': list(range(20))}
+    assert overlap == {'trader-1': 1, 'trader-2': 1}
+    # the two accounts do run at the same time
+    assert max(concurrent) == 2
+    assert results == [idx for idx in range(20) for _ in range(2)]
+
+def test_failed_job_does_not_stop_the_queue():
+    async def main():
+        dispatcher = AccountDispatcher()
+        async def fail():
+            raise RuntimeError('order_send failed')
+        async def ok():
+            return 'ok'
+        failed = dispatcher.submit('trader-1', fail)
+        after = dispatcher.submit('trader-1', ok)
+        assert dispatcher.depth('trader-1') == 2
+        await dispatcher.drain('trader-1')
+        assert dispatcher.depth('trader-1') == 0
+        await dispatcher.close()
+        with pytest.raises(RuntimeError):
+            failed.result()
+        return after.result()
+    assert asyncio.run(main()) == 'ok'
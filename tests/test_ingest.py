@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime, timezone
+from telethon import events
+from telethon.tl.types import Message, PeerChat
+from src.fake_telegram import FakeSession, broadcast, make_event
+from src.ingest import SignalIngest
+
+def test_first_arrival_is_handled_once():
+    async def main():
+        handled = []
+        async def handle(event):
+            handled.append((event.chat_id, event.message.id))
+        ingest = SignalIngest(handle)
+        sessions = [FakeSession('fast', ingest, 0.0), FakeSession('slow', ingest, 0.02)]
+        events = [make_event(-100678910, message_id, 'XAUUSD') for message_id in range(50)]
+        await broadcast(sessions, events)
+        return handled, ingest
+    handled, ingest = asyncio.run(main())
+    assert handled == [(-100678910, message_id) for message_id in range(50)]
+    assert ingest.stats['fast'].first == 50
+    assert ingest.stats['slow'].first == 0
+    assert ingest.stats['slow'].received == 50
+    assert len(ingest.stats['slow'].lag) == 50
+    assert 'slow' in ingest.report()
+
+def test_same_message_id_in_another_chat_is_not_a_copy():
+    async def main():
+        handled = []
+        async def handle(event):
+            handled.append(event.chat_id)
+        ingest = SignalIngest(handle)
+        source = ingest.source('session')
+        assert ingest.source('session') is source
+        await source(make_event(-100678910, 1, 'XAUUSD'))
+        await source(make_event(-100123456, 1, 'XAUUSD'))
+        return handled
+    assert asyncio.run(main()) == [-100678910, -100123456]
+
+def test_marked_and_evicted_messages():
+    async def main():
+        handled = []
+        async def handle(event):
+            handled.append(event.message.id)
+        ingest = SignalIngest(handle, max_seen=2)
+        source = ingest.source('session')
+        # skipped by the catch up as too old
+        ingest.mark(-100678910, 1)
+        for message_id in (1, 2, 3, 2):
+            await source(make_event(-100678910, message_id, 'XAUUSD'))
+        # only the last two are remembered
+        await source(make_event(-100678910, 1, 'XAUUSD'))
+        return handled
+    assert asyncio.run(main()) == [2, 3, 1]
+
+def test_basic_group_messages_come_from_the_first_session():
+    def basic_group_event(message_id: int):
+        return events.NewMessage.Event(Message(message_id, PeerChat(678910), datetime.now(timezone.utc), 'XAUUSD'))
+    async def main():
+        handled = []
+        async def handle(event):
+            handled.append((event.chat_id, event.message.id))
+        ingest = SignalIngest(handle, basic_group_sessions=['first', 'catch_up'])
+        first, second = ingest.source('first'), ingest.source('second')
+        # one message, numbered by each account
+        await second(basic_group_event(41))
+        await first(basic_group_event(7))
+        await ingest.source('catch_up')(basic_group_event(8))
+        # channels still take the fastest session
+        await second(make_event(-100678910, 1, 'XAUUSD'))
+        await first(make_event(-100678910, 1, 'XAUUSD'))
+        return handled, ingest
+    handled, ingest = asyncio.run(main())
+    assert handled == [(-678910, 7), (-678910, 8), (-100678910, 1)]
+    assert (ingest.stats['second'].received, ingest.stats['second'].first) == (2, 1)
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+import pytest
+from src import journal
+from src.journal import TradeJournal
+from src.replay import ReplayNotifier, make_event
+from src.telegram_bot import TelegramBot
+
+COMBO = 'XAUUSD 1/3 Combo\n入場方向: Long🟢\n現價: 2650.0\n\n\n\n15mins: Uptrend\n1hr: Uptrend'
+
+def test_records_from_many_threads_are_all_written(tmp_path):
+    path = str(tmp_path / 'trade_journal.jsonl')
+    trade_journal = TradeJournal(path)
+    def write(thread_idx: int):
+        for idx in range(200):
+            trade_journal.record('order', trader=f'trader-{thread_idx}', leg=idx)
+    threads = [threading.Thread(target=write, args=(thread_idx,)) for thread_idx in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    trade_journal.close()
+    records = journal.load(path)
+    assert len(records) == 800
+    for thread_idx in range(4):
+        assert [record['leg'] for record in records if record['trader'] == f'trader-{thread_idx}'] == list(range(200))
+
+def test_signal_decisions_and_orders_are_journaled(bot_config, tmp_path):
+    bot_config['trade_journal'] = str(tmp_path / 'trade_journal.jsonl')
+    async def main():
+        bot = TelegramBot(bot_config)
+        bot.notifier = ReplayNotifier()
+        await bot.traders.start()
+        try:
+            await bot.handle_channel_message(make_event({'peer_id': 678910, 'id': 7, 'date': time.time(), 'text': COMBO}))
+        finally:
+            await bot.traders.shutdown()
+            bot.journal.close()
+    asyncio.run(main())
+    records = journal.load(bot_config['trade_journal'])
+    [signal] = [record for record in records if record['kind'] == 'signal']
+    assert (signal['src'], signal['msg'], signal['valid'], signal['trend'], signal['price']) == (678910, 7, True, 'Up', 2650.0)
+    decisions = {record['trader']: record for record in records if record['kind'] == 'decision'}
+    assert decisions['trader-1']['accepted'] and decisions['trader-1']['reason'] == None
+    assert not decisions['trader-2']['accepted'] and decisions['trader-2']['check'] == 'price_diff'
+    orders = [record for record in records if record['kind'] == 'order']
+    assert [(order['trader'], order['leg'], order['ok']) for order in orders] == [('trader-1', 0, True), ('trader-1', 1, True)]
+    # the fake terminal fills at the requested price
+    assert [(order['deviation'], order['slippage']) for order in orders] == [(20, 0.0), (20, 0.0)]
+
+    pyarrow = pytest.importorskip('pyarrow')
+    written = journal.export(bot_config['trade_journal'], str(tmp_path / 'journal'))
+    assert set(written) == {'signal', 'decision', 'order'}
+    table = pyarrow.parquet.read_table(written['order'])
+    assert table.num_rows == 2
+    assert table.column('trader').to_pylist() == ['trader-1', 'trader-1']
@@ -0,0 +1,41 @@
+import numpy as np
+from src.account_state import DEAL_DTYPE
+from src.ledger import DailyPnlLedger
+
+def deals(*rows) -> np.ndarray:
+    # (ticket, time, profit, commission)
+    array = np.zeros(len(rows), dtype=DEAL_DTYPE)
+    for idx, (ticket, time, profit, commission) in enumerate(rows):
+        array[idx]['ticket'] = ticket
+        array[idx]['time'] = time
+        array[idx]['profit'] = profit
+        array[idx]['commission'] = commission
+    return array
+
+def test_add_deals_counts_deals_since_the_cutoff():
+    ledger = DailyPnlLedger()
+    ledger.reset(1000)
+    assert ledger.add_deals(deals((1, 999, 50.0, 0.0), (2, 1000, 10.0, -1.0), (3, 1500, -4.0, -1.0))) == 2
+    assert ledger.realized == 4.0
+    assert ledger.last_ticket == 3
+    assert ledger.last_time == 1500
+    assert ledger.deal_count == 2
+
+def test_add_deals_skips_tickets_already_counted():
+    ledger = DailyPnlLedger()
+    ledger.reset(1000)
+    ledger.add_deals(deals((2, 1000, 10.0, 0.0), (3, 1500, 5.0, 0.0)))
+    # the next sync asks from last_time, the deal at 1500 comes again
+    assert ledger.add_deals(deals((3, 1500, 5.0, 0.0), (4, 1600, 1.0, 0.0))) == 1
+    assert ledger.realized == 16.0
+    assert ledger.add_deals(deals()) == 0
+    assert ledger.deal_count == 3
+
+def test_reset_starts_a_new_day():
+    ledger = DailyPnlLedger()
+    ledger.reset(1000)
+    ledger.add_deals(deals((5, 1200, 10.0, 0.0)))
+    ledger.reset(2000)
+    assert (ledger.realized, ledger.last_ticket, ledger.last_time, ledger.deal_count) == (0.0, 0, 2000, 0)
+    assert ledger.add_deals(deals((5, 1200, 10.0, 0.0), (6, 2100, 3.0, 0.0))) == 1
+    assert ledger.realized == 3.0
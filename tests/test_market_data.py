@@ -0,0 +1,45 @@
+import asyncio
+import multiprocessing
+import time
+from src.market_data import TickSnapshot
+from src.mt5_pool import MetaTraderPool
+
+TICK = {'timestamp': 1700000000.0, 'bid': 2650.1, 'ask': 2650.3, 'point': 0.01}
+
+def write_tick(snapshot: TickSnapshot):
+    snapshot.write(TICK)
+
+def test_read_returns_the_last_fresh_write(monkeypatch):
+    snapshot = TickSnapshot()
+    assert snapshot.read(1.0) == None
+    snapshot.write(TICK)
+    assert snapshot.read(1.0) == TICK
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 2)
+    assert snapshot.read(1.0) == None
+    assert snapshot.read(5.0) == TICK
+
+def test_write_from_another_process():
+    snapshot = TickSnapshot()
+    process = multiprocessing.get_context('spawn').Process(target=write_tick, args=(snapshot,))
+    process.start()
+    process.join(10)
+    assert snapshot.read(5.0) == TICK
+
+def test_worker_streams_ticks_into_the_snapshot(trader_config):
+    trader_config['tick_stream_interval'] = 0.01
+    async def main():
+        pool = MetaTraderPool([trader_config], 'src.fake_mt5')
+        await pool.start()
+        try:
+            for _ in range(100):
+                tick_data = pool[0].tick_snapshot.read(1.0)
+                if tick_data != None:
+                    break
+                await asyncio.sleep(0.01)
+            return tick_data, await pool[0].get_latest_tick()
+        finally:
+            await pool.shutdown()
+    streamed, latest = asyncio.run(main())
+    assert streamed != None and streamed['ask'] > streamed['bid']
+    assert latest['point'] == 0.01
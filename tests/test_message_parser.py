@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+from src.message_parser import MessageParser
+
+COMBO = 'XAUUSD 1/3 Combo\n入場方向: {side}\n現價: 2650.12\n\n\n\n15mins:{m15}\n1hr:{h1}'
+
+def parse(text: str, message_type: str, message_formats = None):
+    event = SimpleNamespace(raw_text=text, message=SimpleNamespace(date=datetime.now(timezone.utc)))
+    return MessageParser(message_formats).parse(event, message_type)
+
+def test_single_line_formats():
+    message = parse('🟢XAUUSD🟢\n現價: 2650.12\n\nPotential Uptrend Started', 'XAUUSD')
+    assert (message['valid'], message['type'], message['ticker'], message['trend'], message['current_price']) == (True, 'normal', 'XAUUSD', 'Up', 2650.12)
+    message = parse('🔴NVDA🔴\n現價: 135.5\n\nPotential Downtrend Started', 'NVDA')
+    assert (message['ticker'], message['trend']) == ('NVIDIA CFD', 'Down')
+    assert not parse('🟢XAUUSD🟢\n現價: abc\n\nPotential Uptrend Started', 'XAUUSD')['valid']
+    assert not parse('Good morning everyone\nno signal today', 'XAUUSD')['valid']
+    assert parse('🟢XAUUSD🟢', 'BTCUSD')['raw_msg'] == None
+
+@pytest.mark.parametrize('side, m15, h1, expected', [
+    ('Long🟢', ' Uptrend', ' Uptrend', 'normal'),
+    ('Long🟢', ' Uptrend', ' Downtrend', 'noise_order'),
+    ('Short🔴', ' Uptrend', ' Downtrend', 'noise_order'),
+    ('Short🔴', ' Sideways', ' Downtrend', 'noise_order'),
+    # an empty line after one that already disagrees is a noise order, as the old parser had it
+    ('Short🔴', ' Uptrend', '', 'noise_order'),
+    ('Long🟢', ' Uptrend', '', None),
+    ('Long🟢', '', ' Uptrend', None),
+    ('Long🟢', 'Uptrend', ' Uptrend', None),
+])
+def test_combo_confirm_fields(side, m15, h1, expected):
+    message = parse(COMBO.format(side=side, m15=m15, h1=h1), 'XAUUSD_COMBO')
+    if expected == None:
+        assert not message['valid']
+    else:
+        assert message['valid'] and message['type'] == expected
+
+def test_format_from_config():
+    message_formats = {
+        'BTCUSD': {
+            'ticker': 'BTCUSD',
+            'fields': {
+                'header': {'line': 0, 'values': ['🔴BTCUSD🔴', '🟢BTCUSD🟢']},
+                'current_price': {'line': 1, 'regex': '^現價: ([^ ]*)$', 'type': 'float'},
+                'trend': {'line': 3, 'map': {'Potential Uptrend Started': 'Up', 'Potential Downtrend Started': 'Down'}},
+            },
+        },
+    }
+    message = parse('🔴BTCUSD🔴\n現價: 97000\n\nPotential Downtrend Started', 'BTCUSD', message_formats)
+    assert (message['valid'], message['ticker'], message['trend'], message['current_price']) == (True, 'BTCUSD', 'Down', 97000.0)
+    with pytest.raises(ValueError):
+        MessageParser({'BTCUSD': {'ticker': 'BTCUSD', 'fields': {}}})
@@ -0,0 +1,73 @@
+import asyncio
+from src.metrics import MetricsRegistry, MetricsServer
+
+def test_counter_and_gauge_text_format():
+    registry = MetricsRegistry()
+    counter = registry.counter('signals_total', 'Signals handled', ('trader', 'result'))
+    counter.inc(('trader-1', 'ok'))
+    counter.inc(('trader-1', 'ok'), 2)
+    counter.inc(('trader "2"', 'skipped'))
+    gauge = registry.gauge('queue_depth', 'Queued signals', ('trader',))
+    gauge.set(('trader-1',), 3)
+    gauge.set(('trader-1',), 1)
+    registry.gauge('up', 'Bot is running').set((), 1)
+    assert registry.counter('signals_total', 'registered twice') is counter
+    assert registry.render() == (
+        '# HELP signals_total Signals handled\n'
+        '# TYPE signals_total counter\n'
+        'signals_total{trader="trader-1",result="ok"} 3\n'
+        'signals_total{trader="trader \\"2\\"",result="skipped"} 1\n'
+        '# HELP queue_depth Queued signals\n'
+        '# TYPE queue_depth gauge\n'
+        'queue_depth{trader="trader-1"} 1\n'
+        '# HELP up Bot is running\n'
+        '# TYPE up gauge\n'
+        'up 1\n'
+    )
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('call_seconds', 'Call time', ('method',), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(('order_send',), value)
+    assert registry.render().splitlines()[2:] == [
+        'call_seconds_bucket{method="order_send",le="0.1"} 2',
+        'call_seconds_bucket{method="order_send",le="1"} 3',
+        'call_seconds_bucket{method="order_send",le="+Inf"} 4',
+        'call_seconds_sum{method="order_send"} 3.65',
+        'call_seconds_count{method="order_send"} 4',
+    ]
+
+def test_collectors_run_before_every_scrape():
+    registry = MetricsRegistry()
+    gauge = registry.gauge('depth', 'Depth')
+    depth = [5]
+    registry.collectors.append(lambda: gauge.set((), depth[0]))
+    def broken():
+        raise RuntimeError('collector failed')
+    registry.collectors.append(broken)
+    assert 'depth 5' in registry.render()
+    depth[0] = 7
+    assert 'depth 7' in registry.render()
+
+def test_server_answers_metrics_only():
+    async def get(port: int, path: str) -> bytes:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        response = await reader.read()
+        writer.close()
+        return response
+    async def main():
+        registry = MetricsRegistry()
+        registry.counter('scrapes_total', 'Scrapes').inc()
+        server = MetricsServer(registry, '127.0.0.1', 0)
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        try:
+            return await get(port, '/metrics'), await get(port, '/')
+        finally:
+            await server.close()
+    metrics, other = asyncio.run(main())
+    assert metrics.startswith(b'HTTP/1.1 200 OK')
+    assert metrics.endswith(b'scrapes_total 1\n')
+    assert other.startswith(b'HTTP/1.1 404 Not Found')
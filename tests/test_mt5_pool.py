@@ -0,0 +1,89 @@
+import asyncio
+import copy
+import time
+import pytest
+from src.account_state import DEAL_DTYPE, POSITION_DTYPE, side_counts
+from src.mt5_pool import MetaTraderPool
+
+LEGS = [{'lot': 0.1, 'sl': 500, 'tp': 150, 'deviation': 20}, {'lot': 0.2, 'sl': 500, 'tp': 150, 'deviation': 20}]
+
+def traders(trader_config, count: int):
+    configs = []
+    for idx in range(count):
+        config = copy.deepcopy(trader_config)
+        config['id'] = f'trader-{idx + 1}'
+        config['mt5_login'] = str(idx + 1)
+        configs.append(config)
+    return configs
+
+def test_process_workers_keep_their_own_account(trader_config):
+    async def main():
+        pool = MetaTraderPool(traders(trader_config, 2), 'src.fake_mt5', 'process')
+        await pool.start()
+        try:
+            started = time.time() - 60
+            results = await pool[0].place_orders(LEGS, 'BUY')
+            await pool[1].place_orders(LEGS[:1], 'SELL')
+            checks = [await worker.check_connection() for worker in pool]
+            positions = [await worker.get_positions_array() for worker in pool]
+            deals = await pool[0].get_deals_array(started)
+            count = await pool[0].get_position_count(trader_config['ticker'], 'BUY')
+        finally:
+            await pool.shutdown()
+        return results, checks, positions, deals, count
+    results, checks, positions, deals, count = asyncio.run(main())
+    assert [result['ok'] for result in results] == [True, True]
+    assert [check['ok'] for check in checks] == [True, True]
+    assert positions[0].dtype == POSITION_DTYPE and positions[1].dtype == POSITION_DTYPE
+    assert side_counts(positions[0]) == (2, 0)
+    assert side_counts(positions[1]) == (0, 1)
+    assert deals.dtype == DEAL_DTYPE and len(deals) == 2
+    assert count == 2
+
+def test_crashed_worker_is_started_again(trader_config):
+    async def main():
+        pool = MetaTraderPool(traders(trader_config, 1), 'src.fake_mt5', 'process')
+        await pool.start()
+        try:
+            pool[0]._process.kill()
+            await asyncio.to_thread(pool[0]._process.join, 5)
+            with pytest.raises(RuntimeError):
+                await pool[0].check_connection()
+            # a failed call wakes the supervisor, which reconnects
+            woken = pool[0].check_now.is_set()
+            crashed_conn = pool[0]._conn
+            await pool[0].reconnect()
+            return woken, await pool[0].check_connection(), crashed_conn
+        finally:
+            await pool.shutdown()
+    woken, check, crashed_conn = asyncio.run(main())
+    assert woken
+    assert check['ok']
+    # the pipe of the crashed worker is closed by the restart
+    assert crashed_conn.closed
+
+def test_shutdown_closes_the_pipe(trader_config):
+    async def main():
+        pool = MetaTraderPool(traders(trader_config, 2), 'src.fake_mt5', 'process')
+        await pool.start()
+        await pool.shutdown()
+        return pool
+    pool = asyncio.run(main())
+    assert all(worker._conn.closed for worker in pool)
+    assert not any(worker._reader.is_alive() for worker in pool)
+
+def test_thread_mode(trader_config):
+    with pytest.raises(ValueError):
+        MetaTraderPool(traders(trader_config, 2), 'src.fake_mt5', 'thread')
+    async def main():
+        pool = MetaTraderPool(traders(trader_config, 1), 'src.fake_mt5', 'thread')
+        await pool.start()
+        try:
+            await pool[0].place_orders(LEGS[:1], 'SELL')
+            await pool[0].sync_positions()
+            return pool[0].position_book.count(trader_config['ticker'], 'SELL'), await pool[0].is_market_avail()
+        finally:
+            await pool.shutdown()
+    count, market_avail = asyncio.run(main())
+    assert count == 1
+    assert market_avail
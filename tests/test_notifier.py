@@ -0,0 +1,92 @@
+import asyncio
+from telethon.errors import FloodWaitError
+from src.metrics import REGISTRY
+from src.notifier import TELEGRAM_MAX_MESSAGE_LENGTH, NotificationDispatcher
+from src.telegram_bot import TelegramBot
+
+class FakeClient:
+    def __init__(self, errors = ()):
+        # raised by the next send_message calls, one each
+        self.errors = list(errors)
+        self.sent = []
+
+    def is_connected(self):
+        return True
+
+    async def send_message(self, entity, message):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((entity, message))
+
+def test_burst_is_coalesced_into_one_message():
+    async def main():
+        client = FakeClient()
+        notifier = NotificationDispatcher(client, coalesce_window=0.05)
+        for idx in range(3):
+            notifier.enqueue(-54321, f'order {idx}')
+        notifier.enqueue(-12345, 'other chat')
+        await notifier.close()
+        return client.sent, notifier.metrics()
+    sent, metrics = asyncio.run(main())
+    assert sorted(sent) == [(-54321, 'order 0\n\norder 1\n\norder 2'), (-12345, 'other chat')]
+    assert (metrics[-54321]['queued'], metrics[-54321]['sent'], metrics[-54321]['batches']) == (3, 3, 1)
+
+def test_long_batches_are_split_at_the_length_limit():
+    messages = ['a' * 2000, 'b' * 2000, 'c' * 2000, 'd' * 5000]
+    chunks = NotificationDispatcher._chunks([(0.0, message) for message in messages])
+    assert [[item[1][0] for item in chunk] for chunk in chunks] == [['a', 'b'], ['c'], ['d']]
+    async def main():
+        client = FakeClient()
+        notifier = NotificationDispatcher(client, coalesce_window=0.05)
+        for message in messages:
+            notifier.enqueue(-54321, message)
+        await notifier.close()
+        return client.sent
+    sent = asyncio.run(main())
+    assert [len(message) for _, message in sent] == [4002, 2000, TELEGRAM_MAX_MESSAGE_LENGTH]
+
+def test_failed_send_is_retried_then_dropped():
+    async def send(errors, max_retries: int):
+        client = FakeClient(errors)
+        notifier = NotificationDispatcher(client, coalesce_window=0, max_retries=max_retries)
+        notifier.enqueue(-54321, 'order')
+        await notifier.close()
+        return client.sent, notifier.metrics()[-54321]
+    sent, metrics = asyncio.run(send([ConnectionError('reset')], 1))
+    assert sent == [(-54321, 'order')]
+    assert (metrics['sent'], metrics['failed']) == (1, 0)
+    sent, metrics = asyncio.run(send([ConnectionError('reset')], 0))
+    assert sent == []
+    assert (metrics['sent'], metrics['failed']) == (0, 1)
+
+def flood_wait():
+    # a 0s wait, as telegram raises it
+    return FloodWaitError(request=None, capture=0)
+
+def test_flood_waits_do_not_use_up_the_retries():
+    async def send(errors, max_retries: int, max_flood_waits: int):
+        client = FakeClient(errors)
+        notifier = NotificationDispatcher(client, coalesce_window=0, max_retries=max_retries, max_flood_waits=max_flood_waits)
+        notifier.enqueue(-54321, 'order')
+        await notifier.close()
+        return client.sent, notifier.metrics()[-54321]
+    sent, metrics = asyncio.run(send([flood_wait(), flood_wait(), ConnectionError('reset'), flood_wait()], 1, 3))
+    assert sent == [(-54321, 'order')]
+    assert (metrics['sent'], metrics['failed'], metrics['flood_waits']) == (1, 0, 3)
+    sent, metrics = asyncio.run(send([flood_wait(), flood_wait()], 5, 1))
+    assert sent == []
+    assert (metrics['sent'], metrics['failed'], metrics['flood_waits']) == (0, 1, 2)
+
+def test_delivery_stats_are_exported(bot_config):
+    async def main():
+        bot = TelegramBot(bot_config)
+        bot.notifier = NotificationDispatcher(FakeClient([flood_wait()]), coalesce_window=0)
+        bot.notifier.enqueue(-54321, 'order')
+        await bot.notifier.close()
+        bot.collect_metrics()
+        return bot.notifier.metrics()[-54321]
+    metrics = asyncio.run(main())
+    text = REGISTRY.render()
+    assert 'notify_flood_waits{chat="-54321"} 1' in text
+    for stat in ('last', 'max', 'avg'):
+        assert f'notify_latency_seconds{{chat="-54321",stat="{stat}"}} {metrics[f'{stat}_latency']}' in text
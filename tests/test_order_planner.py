@@ -0,0 +1,51 @@
+import pytest
+from src.market_data import TickSnapshot
+from src.mt5_async import load_metatrader_class, metatrader_args
+from src.order_planner import plan_orders
+
+TICK = {'timestamp': 1700000000.0, 'bid': 2650.0, 'ask': 2650.2, 'point': 0.01}
+
+def signal(type: str = 'normal', trend: str = 'Up'):
+    return {'valid': True, 'type': type, 'ticker': 'XAUUSD', 'trend': trend, 'current_price': 2650.0, 'message_timestamp': 1700000000.0, 'raw_msg': ''}
+
+@pytest.fixture
+def planned_config(trader_config):
+    trader_config['orders'] = [
+        {'lot': 0.8, 'sl': 500, 'tp': 150, 'noise_tp': 0, 'noise_sl': 0, 'deviation': 7},
+        {'lot': 0.4, 'sl': 300, 'tp': 900, 'noise_tp': 10, 'noise_sl': 10, 'deviation': 35},
+    ]
+    trader_config['noise_order'] = [{'lot': 0.1, 'sl': 50, 'tp': 20, 'noise_tp': 0, 'noise_sl': 0, 'deviation': 5}]
+    return trader_config
+
+def test_plan_orders_legs(planned_config):
+    plan = plan_orders(planned_config, signal())
+    assert plan.label == 'order'
+    assert plan.orders_config is planned_config['orders']
+    assert plan.legs[0] == {'lot': 0.8, 'sl': 500, 'tp': 150, 'deviation': 7}
+    assert (plan.legs[1]['lot'], plan.legs[1]['deviation']) == (0.4, 35)
+    assert 290 <= plan.legs[1]['sl'] <= 310 and 890 <= plan.legs[1]['tp'] <= 910
+    noise = plan_orders(planned_config, signal('noise_order'))
+    assert (noise.label, noise.legs) == ('noise order', [{'lot': 0.1, 'sl': 50, 'tp': 20, 'deviation': 5}])
+    assert plan_orders(planned_config, {'valid': False, 'msg': '', 'raw_msg': ''}) == None
+
+def test_requests_of_buy_and_sell_legs(planned_config):
+    MetaTrader = load_metatrader_class('src.fake_mt5')
+    trader = MetaTrader(*metatrader_args(planned_config, TickSnapshot()))
+    [leg] = plan_orders(planned_config, signal()).legs[:1]
+    buy = trader._build_request(TICK, leg['lot'], 'BUY', leg['sl'], leg['tp'], leg['deviation'])
+    assert (buy['price'], buy['volume'], buy['deviation']) == (2650.2, 0.8, 7)
+    assert buy['sl'] == pytest.approx(2650.2 - 5.0)
+    assert buy['tp'] == pytest.approx(2650.2 + 1.5)
+    sell = trader._build_request(TICK, leg['lot'], 'SELL', leg['sl'], leg['tp'], leg['deviation'])
+    # SELL legs used to go out with a fixed deviation of 20
+    assert (sell['price'], sell['volume'], sell['deviation']) == (2650.0, 0.8, 7)
+    assert sell['sl'] == pytest.approx(2650.0 + 5.0)
+    assert sell['tp'] == pytest.approx(2650.0 - 1.5)
+
+def test_sent_legs_report_deviation_and_slippage(planned_config):
+    MetaTrader = load_metatrader_class('src.fake_mt5')
+    trader = MetaTrader(*metatrader_args(planned_config, TickSnapshot()))
+    results = trader.place_orders(plan_orders(planned_config, signal(trend='Down')).legs, 'SELL')
+    assert [(result['ok'], result['deviation']) for result in results] == [(True, 7), (True, 35)]
+    # the fake terminal fills at the requested price
+    assert [result['slippage'] for result in results] == [0.0, 0.0]
@@ -0,0 +1,46 @@
+from src.position_book import PositionBook
+
+def test_add_fill_counts_per_symbol_and_side():
+    book = PositionBook()
+    book.add_fill('XAUUSD', 1, 'BUY', 0.5)
+    book.add_fill('XAUUSD', 2, 'BUY', 0.3)
+    book.add_fill('XAUUSD', 1, 'SELL', 0.1)
+    book.add_fill('NVDA', 1, 'BUY', 1.0)
+    assert book.count('XAUUSD', 'BUY') == 2
+    assert book.count('XAUUSD', 'SELL') == 1
+    assert book.volume('XAUUSD', 'BUY') == 0.8
+    assert book.count('NVDA', 'SELL') == 0
+    assert book.last_fill_at != None
+
+def test_reconcile_replays_fills_after_the_token():
+    book = PositionBook()
+    book.add_fill('XAUUSD', 1, 'BUY', 0.5)
+    token = book.begin_reconcile()
+    # lands while positions_get is in flight, so it is not in its result
+    book.add_fill('XAUUSD', 1, 'SELL', 0.2)
+    book.reconcile({('XAUUSD', 1): [1, 0, 0.5, 0.0]}, token)
+    assert book.synced
+    assert book.totals == {('XAUUSD', 1): [1, 1, 0.5, 0.2]}
+
+def test_reconcile_drops_fills_before_the_token():
+    book = PositionBook()
+    book.add_fill('XAUUSD', 1, 'BUY', 0.5)
+    book.add_fill('XAUUSD', 1, 'BUY', 0.5)
+    token = book.begin_reconcile()
+    # both closed by SL before the sync
+    book.reconcile({}, token)
+    assert book.count('XAUUSD', 'BUY') == 0
+    # replayed fills are only replayed once
+    book.add_fill('XAUUSD', 1, 'BUY', 0.1)
+    token = book.begin_reconcile()
+    book.reconcile({('XAUUSD', 1): [1, 0, 0.1, 0.0]}, token)
+    assert book.count('XAUUSD', 'BUY') == 1
+
+def test_reconcile_does_not_touch_the_given_totals():
+    book = PositionBook()
+    totals = {('XAUUSD', 1): [1, 0, 0.5, 0.0]}
+    token = book.begin_reconcile()
+    book.add_fill('XAUUSD', 1, 'BUY', 0.5)
+    book.reconcile(totals, token)
+    assert totals == {('XAUUSD', 1): [1, 0, 0.5, 0.0]}
+    assert book.count('XAUUSD', 'BUY') == 2
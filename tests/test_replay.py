@@ -0,0 +1,59 @@
+import json
+import os
+import numpy as np
+from src.replay import TickHistory, run_variants
+
+COMBO = 'XAUUSD 1/3 Combo\n入場方向: {side}\n現價: {price}\n\n\n\n15mins: {trend}\n1hr: {trend}'
+START = 1737338986.0
+
+def make_config():
+    with open(os.path.join(os.path.dirname(__file__), '..', 'config.example.json'), 'r', encoding='utf-8') as file:
+        config = json.load(file)
+    config['traders'] = config['traders'][:1]
+    config['traders'][0].update({
+        'acceptable_price_diff': 5,
+        'order_probability': 100,
+        'max_total_positions': {'buy': 10, 'sell': 10},
+        'daily_margin': 10 ** 9,
+        'orders': [{'lot': 0.1, 'sl': 500, 'tp': 150, 'noise_tp': 0, 'noise_sl': 0, 'deviation': 20}],
+    })
+    return config
+
+def rising_ticks() -> TickHistory:
+    # bid up 0.1 a second from 2650, 0.2 spread
+    times = START + np.arange(600, dtype=np.float64)
+    bid = 2650 + np.arange(600) * 0.1
+    return TickHistory(times, bid, bid + 0.2)
+
+def message(message_id: int, offset: float, side: str, trend: str, price: float):
+    return {'peer_id': 678910, 'id': message_id, 'date': START + offset, 'text': COMBO.format(side=side, trend=trend, price=price)}
+
+def test_long_hits_tp_and_short_hits_sl():
+    messages = [message(1, 10, 'Long🟢', 'Uptrend', 2651.0), message(2, 100, 'Short🔴', 'Downtrend', 2660.0)]
+    reports = run_variants(make_config(), messages, rising_ticks(), [{'name': 'base', 'trader': {}}])
+    report = reports['base']['trader-1']
+    assert report['legs'] == 2
+    assert report['wins'] == 1
+    # long: +1.5 tp, short: sl 5.0 above the bid it sold at, 0.1 lot x 100, give or take a 0.1 tick
+    assert -37 < report['pnl'] < -34
+
+def test_variants_replay_from_a_clean_account():
+    messages = [message(1, 10, 'Long🟢', 'Uptrend', 2651.0)]
+    variants = [
+        {'name': 'base', 'trader': {}},
+        {'name': 'no_orders', 'trader': {'order_probability': 0}},
+        {'name': 'far_price', 'trader': {'acceptable_price_diff': 0.01}},
+    ]
+    reports = run_variants(make_config(), messages, rising_ticks(), variants)
+    assert reports['base']['trader-1']['legs'] == 1
+    assert reports['no_orders']['trader-1']['legs'] == 0
+    assert reports['far_price']['trader-1']['legs'] == 0
+
+def test_ticks_load_from_csv(tmp_path):
+    path = tmp_path / 'ticks.csv'
+    path.write_text('time,bid,ask\n3,1.3,1.4\n1,1.1,1.2\n2,1.2,1.3\n')
+    ticks = TickHistory.load(str(path))
+    assert ticks.times.tolist() == [1, 2, 3]
+    assert ticks.bid.tolist() == [1.1, 1.2, 1.3]
+    assert ticks.index_at(2.5) == 1
+    assert ticks.index_at(0) == -1
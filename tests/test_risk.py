@@ -0,0 +1,100 @@
+import asyncio
+import time
+from src.mt5_pool import MetaTraderPool
+from src.risk import RISK_RULES, RiskContext, RiskEngine
+
+LEGS = [{'lot': 0.5, 'sl': 500, 'tp': 150, 'deviation': 20}, {'lot': 0.3, 'sl': 500, 'tp': 150, 'deviation': 20}]
+
+def signal(price: float = 2650.0):
+    return {'valid': True, 'type': 'normal', 'ticker': 'XAUUSD', 'trend': 'Up', 'current_price': price, 'message_timestamp': time.time(), 'raw_msg': ''}
+
+class CountingTrader:
+    # what a RiskContext reads, with a count of every call
+    def __init__(self, ask: float = 2650.2):
+        self.calls = {'get_latest_tick': 0, 'get_exposure': 0, 'get_equity_snapshot': 0}
+        self.ask = ask
+
+    async def get_latest_tick(self):
+        self.calls['get_latest_tick'] += 1
+        return {'timestamp': time.time(), 'bid': self.ask - 0.2, 'ask': self.ask, 'point': 0.01}
+
+    async def get_exposure(self, ticker, order_type):
+        self.calls['get_exposure'] += 1
+        return {'count': 0, 'volume': 0.0, 'last_fill_at': None}
+
+    async def get_equity_snapshot(self, timestamp):
+        self.calls['get_equity_snapshot'] += 1
+        return {'equity': 10000.0, 'previous_equity': 10000.0, 'realized': 0.0, 'floating': 0.0}
+
+def evaluate(trader, trader_config, result, now: float | None = None, planned_volume: float = 0.0):
+    engine = RiskEngine(trader_config)
+    ctx = RiskContext(trader, trader_config, result, 'BUY', time.time() if now == None else now, planned_volume)
+    return engine.evaluate(ctx)
+
+def test_checks_run_cheapest_first(trader_config):
+    trader_config['risk_rules'] = [{'type': 'max_exposure', 'lots': 4}, {'type': 'cooldown', 'seconds': 30}, {'type': 'max_spread', 'points': 40}]
+    engine = RiskEngine(trader_config)
+    assert [check.name for check in engine.checks] == [
+        'probability', 'price_diff', 'timestamp', 'max_spread', 'max_positions', 'max_exposure', 'cooldown', 'daily_margin',
+    ]
+    costs = [check.cost for check in engine.checks]
+    assert costs == sorted(costs)
+    assert costs == [RISK_RULES[check.name][0] for check in engine.checks]
+
+def test_every_part_of_the_snapshot_is_read_once(trader_config):
+    trader_config.update({'acceptable_price_diff': 5, 'order_probability': 100, 'daily_margin': 4000})
+    trader_config['risk_rules'] = [{'type': 'max_spread', 'points': 40}, {'type': 'cooldown', 'seconds': 30}]
+    trader = CountingTrader()
+    assert asyncio.run(evaluate(trader, trader_config, signal())) == None
+    assert trader.calls == {'get_latest_tick': 1, 'get_exposure': 1, 'get_equity_snapshot': 1}
+
+def test_first_rejection_stops_the_checks(trader_config):
+    trader_config.update({'acceptable_price_diff': 5, 'order_probability': 100, 'daily_margin': 4000, 'risk_rules': []})
+    trader = CountingTrader(ask=2700.0)
+    rejection = asyncio.run(evaluate(trader, trader_config, signal()))
+    assert rejection.startswith('Tick price [2700.0]')
+    assert trader.calls == {'get_latest_tick': 1, 'get_exposure': 0, 'get_equity_snapshot': 0}
+    trader_config['order_probability'] = 0
+    trader = CountingTrader(ask=2700.0)
+    assert asyncio.run(evaluate(trader, trader_config, signal())).startswith('Not handling this executing')
+    assert trader.calls == {'get_latest_tick': 0, 'get_exposure': 0, 'get_equity_snapshot': 0}
+
+def test_new_rules_against_the_fake_terminal(trader_config):
+    # the fake terminal quotes a 0.2 spread, 20 points
+    trader_config.update({'acceptable_price_diff': 1000, 'order_probability': 100, 'daily_margin': 4000})
+    async def main():
+        pool = MetaTraderPool([trader_config], 'src.fake_mt5')
+        await pool.start()
+        trader = pool[0]
+        try:
+            rejections = {}
+            for name, rules in {
+                'tight_spread': [{'type': 'max_spread', 'points': 10}],
+                'spread': [{'type': 'max_spread', 'points': 40}],
+                'cooldown_flat': [{'type': 'cooldown', 'seconds': 30}],
+                'exposure_flat': [{'type': 'max_exposure', 'lots': 0.8}],
+                'exposure_flat_over': [{'type': 'max_exposure', 'lots': 0.5}],
+            }.items():
+                rejections[name] = await evaluate(trader, {**trader_config, 'risk_rules': rules}, signal(), planned_volume=0.8)
+            # 0.8 lots bought just now
+            await trader.place_orders(LEGS, 'BUY')
+            for name, rules, now in (
+                ('cooldown', [{'type': 'cooldown', 'seconds': 30}], time.time()),
+                ('cooldown_over', [{'type': 'cooldown', 'seconds': 30}], time.time() + 31),
+                ('exposure', [{'type': 'max_exposure', 'lots': 1.5}], time.time()),
+                ('exposure_room', [{'type': 'max_exposure', 'lots': 1.6}], time.time()),
+            ):
+                rejections[name] = await evaluate(trader, {**trader_config, 'risk_rules': rules}, signal(), now, planned_volume=0.8)
+            return rejections
+        finally:
+            await pool.shutdown()
+    rejections = asyncio.run(main())
+    assert rejections['tight_spread'] == 'Spread [20] > 10 points'
+    assert rejections['spread'] == None
+    assert rejections['cooldown_flat'] == None
+    assert rejections['exposure_flat'] == None
+    assert rejections['exposure_flat_over'] == 'Open buy volume [0] + planned [0.8] > max exposure 0.5 lots'
+    assert rejections['cooldown'].startswith('Last order was 0s ago')
+    assert rejections['cooldown_over'] == None
+    assert rejections['exposure'] == 'Open buy volume [0.8] + planned [0.8] > max exposure 1.5 lots'
+    assert rejections['exposure_room'] == None
@@ -0,0 +1,38 @@
+import copy
+import json
+import os
+from src.router import SignalRouter
+
+def make_config():
+    with open(os.path.join(os.path.dirname(__file__), '..', 'config.example.json'), 'r', encoding='utf-8') as file:
+        config = json.load(file)
+    gold = config['traders'][0]
+    nvda = copy.deepcopy(gold)
+    nvda.update({'id': 'trader-2', 'ticker': 'NVIDIA CFD'})
+    gold_2 = copy.deepcopy(gold)
+    gold_2['id'] = 'trader-3'
+    config['traders'] = [gold, nvda, gold_2]
+    return config
+
+def test_route_by_peer_id():
+    config = make_config()
+    router = SignalRouter(config, ['worker-1', 'worker-2', 'worker-3'])
+    route = router.route(678910)
+    assert route.signal is config['signals'][1]
+    assert [(subscriber.idx, subscriber.trader_config['id'], subscriber.trader) for subscriber in route.subscribers] == [
+        (0, 'trader-1', 'worker-1'), (2, 'trader-3', 'worker-3'),
+    ]
+    # group peer ids may be configured or received negative
+    assert router.route(-12345).signal is config['signals'][0]
+    assert router.route('12345').signal is config['signals'][0]
+    assert router.route(999) == None
+
+def test_first_signal_of_a_peer_id_wins():
+    config = make_config()
+    nvda = copy.deepcopy(config['signals'][1])
+    nvda.update({'ticker': 'NVIDIA CFD', 'message_type': 'NVDA'})
+    config['signals'].append(nvda)
+    config['signals'].append({**nvda, 'telegram_source_peer_id': '555'})
+    router = SignalRouter(config, ['worker-1', 'worker-2', 'worker-3'])
+    assert router.route(678910).signal['ticker'] == 'XAUUSD'
+    assert [subscriber.trader for subscriber in router.route(555).subscribers] == ['worker-2']
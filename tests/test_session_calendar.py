@@ -0,0 +1,69 @@
+import random
+from datetime import datetime, timedelta, timezone
+import pytest
+from src.session_calendar import DAYS, SessionCalendar
+
+SESSIONS = {
+    'mon': ['00:00-02:00', '03:05-23:55'],
+    'tue': ['01:05-12:00', '11:00-23:55'],
+    'wed': ['01:05-23:55'],
+    'fri': ['01:05-24:00'],
+    'sat': ['00:00-00:30'],
+    'sun': ['22:00-24:00'],
+}
+
+def server_time(timezone_adjust: int, day: str, hour: int, minute: int = 0) -> float:
+    # unix timestamp of a weekday and time in broker server time, 2024-01-01 was a monday
+    monday = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return (monday + timedelta(days=DAYS.index(day), hours=hour - timezone_adjust, minutes=minute)).timestamp()
+
+def is_open_linear(sessions, timezone_adjust: int, t: float) -> bool:
+    server = datetime.fromtimestamp(t + timezone_adjust * 3600, timezone.utc)
+    seconds = server.hour * 3600 + server.minute * 60 + server.second + server.microsecond / 1e6
+    for session in sessions.get(DAYS[server.weekday()], []):
+        start, end = ((int(value[:2]) * 3600 + int(value[3:]) * 60) for value in session.split('-'))
+        if start <= seconds < end:
+            return True
+    return False
+
+def test_is_open_matches_a_linear_scan():
+    calendar = SessionCalendar(SESSIONS, 2)
+    rng = random.Random(7)
+    start = server_time(2, 'mon', 0)
+    times = [start + rng.uniform(0, 4 * 7 * 24 * 3600) for _ in range(20000)]
+    # every boundary, and right before it
+    for day in DAYS:
+        for session in SESSIONS.get(day, []):
+            for value in session.split('-'):
+                hour, minute = (int(part) for part in value.split(':'))
+                times.extend((server_time(2, day, hour, minute), server_time(2, day, hour, minute) - 1))
+    for t in times:
+        assert calendar.is_open(t) == is_open_linear(SESSIONS, 2, t), datetime.fromtimestamp(t, timezone.utc)
+
+def test_is_open_wraps_around_the_week():
+    calendar = SessionCalendar({'sun': ['22:00-24:00'], 'mon': ['00:00-01:00']}, 0)
+    assert calendar.is_open(server_time(0, 'sun', 23, 59))
+    assert calendar.is_open(server_time(0, 'mon', 0))
+    assert calendar.is_open(server_time(0, 'mon', 0) + 7 * 24 * 3600)
+    assert not calendar.is_open(server_time(0, 'mon', 1))
+    assert not calendar.is_open(server_time(0, 'sun', 21, 59))
+
+def test_timezone_adjust_shifts_the_sessions():
+    calendar = SessionCalendar({'mon': ['01:00-02:00']}, 3)
+    assert calendar.is_open(server_time(3, 'mon', 1, 30))
+    assert not calendar.is_open(server_time(0, 'mon', 1, 30))
+
+def test_touching_sessions_merge():
+    calendar = SessionCalendar({'fri': ['20:00-24:00'], 'sat': ['00:00-01:00']}, 0)
+    assert calendar.bounds == [4 * 86400 + 20 * 3600, 5 * 86400 + 3600]
+
+def test_without_sessions_or_trade_mode():
+    calendar = SessionCalendar(None, 2)
+    assert calendar.is_open(server_time(2, 'sun', 12))
+    calendar.trade_enabled = False
+    assert not calendar.is_open(server_time(2, 'mon', 12))
+
+@pytest.mark.parametrize('sessions', [{'monday': ['01:00-02:00']}, {'mon': ['02:00-01:00']}, {'mon': ['01:00-25:00']}])
+def test_invalid_sessions(sessions):
+    with pytest.raises(ValueError):
+        SessionCalendar(sessions)
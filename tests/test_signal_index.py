@@ -0,0 +1,30 @@
+from src.signal_index import SignalIndex
+
+def test_claim_is_idempotent(tmp_path):
+    index = SignalIndex(str(tmp_path / 'signal_index.sqlite3'))
+    assert index.claim(678910, 1, ['trader-1', 'trader-2']) == ['trader-1', 'trader-2']
+    assert index.claim(678910, 1, ['trader-1', 'trader-2']) == []
+    # a trader added later still gets the message once
+    assert index.claim(678910, 1, ['trader-1', 'trader-3']) == ['trader-3']
+    assert index.claim(678910, 2, ['trader-1']) == ['trader-1']
+    assert index.claim(12345, 1, ['trader-1']) == ['trader-1']
+    assert index.seen(678910, 1, 'trader-2')
+    assert not index.seen(678910, 2, 'trader-2')
+    index.close()
+
+def test_claims_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'signal_index.sqlite3')
+    index = SignalIndex(path)
+    index.claim(678910, 1, ['trader-1'])
+    index.close()
+    index = SignalIndex(path)
+    assert index.claim(678910, 1, ['trader-1']) == []
+    index.close()
+
+def test_evict_expires_old_claims(tmp_path):
+    index = SignalIndex(str(tmp_path / 'signal_index.sqlite3'), ttl=60)
+    index.claim(678910, 1, ['trader-1'])
+    assert index.evict() == 0
+    assert index.evict(index._last_evict + 61) == 1
+    assert index.claim(678910, 1, ['trader-1']) == ['trader-1']
+    index.close()
@@ -0,0 +1,70 @@
+import asyncio
+import copy
+import time
+from src.config_manager import diff_config
+from src.replay import ReplayNotifier, make_event
+from src.telegram_bot import TelegramBot
+
+COMBO = 'XAUUSD 1/3 Combo\n入場方向: Long🟢\n現價: 2650.0\n\n\n\n15mins: Uptrend\n1hr: Uptrend'
+
+async def wait_for(condition, timeout: float):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise TimeoutError
+        await asyncio.sleep(0.05)
+
+def test_outage_skips_the_trader_until_it_reconnects(bot_config, monkeypatch):
+    # the fake terminal drops 0.5s after it logs in, for 1s
+    monkeypatch.setenv('FAKE_MT5_OUTAGE', '0.5:1')
+    bot_config['traders'] = bot_config['traders'][:1]
+    bot_config['traders'][0].update({'heartbeat_interval': 0.1, 'reconnect_max_backoff': 1})
+    async def main():
+        bot = TelegramBot(bot_config)
+        bot.notifier = ReplayNotifier()
+        await bot.traders.start()
+        trader = bot.traders[0]
+        bot.start_background(trader, bot_config['traders'][0])
+        try:
+            await wait_for(lambda: not trader.healthy, 3)
+            await bot.handle_channel_message(make_event({'peer_id': 678910, 'id': 1, 'date': time.time(), 'text': COMBO}))
+            await wait_for(lambda: trader.healthy, 10)
+            await bot.handle_channel_message(make_event({'peer_id': 678910, 'id': 2, 'date': time.time(), 'text': COMBO}))
+            positions = await trader.get_positions()
+        finally:
+            bot.stop_background(trader.id)
+            await bot.traders.shutdown()
+        return positions, [message for _, message in bot.notifier.messages]
+    positions, messages = asyncio.run(main())
+    # only the second signal was traded
+    assert len(positions) == 2
+    assert sum('MT5 connection lost' in message for message in messages) == 1
+    assert sum('MT5 reconnected after' in message for message in messages) == 1
+    assert sum('Signal skipped, MT5 connection is down' in message for message in messages) == 1
+    assert any('Orders placed' in message for message in messages)
+
+def test_outage_is_reported_to_the_reloaded_chat(bot_config, monkeypatch):
+    monkeypatch.setenv('FAKE_MT5_OUTAGE', '0.5:0.5')
+    bot_config['traders'] = bot_config['traders'][:1]
+    bot_config['traders'][0].update({'heartbeat_interval': 0.1, 'reconnect_max_backoff': 1})
+    async def main():
+        bot = TelegramBot(bot_config)
+        bot.notifier = ReplayNotifier()
+        await bot.traders.start()
+        trader = bot.traders[0]
+        bot.start_background(trader, bot_config['traders'][0])
+        try:
+            # the chat moves before the terminal drops, the trader keeps running
+            new = copy.deepcopy(bot_config)
+            new['traders'][0]['noti_chat_id'] = '-3'
+            diff = diff_config(bot_config, new)
+            assert diff.updated == ['trader-1']
+            await bot.apply_config(new, diff)
+            await wait_for(lambda: not trader.healthy, 3)
+            await wait_for(lambda: trader.healthy, 10)
+        finally:
+            bot.stop_background(trader.id)
+            await bot.traders.shutdown()
+        return bot.notifier.messages
+    messages = asyncio.run(main())
+    assert [chat_id for chat_id, message in messages if 'MT5 connection lost' in message or 'MT5 reconnected after' in message] == [-3, -3]
@@ -0,0 +1,131 @@
+import asyncio
+import time
+import pytest
+from src.metrics import REGISTRY
+from src.replay import ReplayNotifier, make_event
+from src.telegram_bot import TelegramBot
+
+COMBO = 'XAUUSD 1/3 Combo\n入場方向: Long🟢\n現價: {price}\n\n\n\n15mins: Uptrend\n1hr: Uptrend'
+
+def test_signal_goes_through_routing_checks_and_orders(bot_config):
+    async def main():
+        bot = TelegramBot(bot_config)
+        bot.notifier = ReplayNotifier()
+        await bot.traders.start()
+        try:
+            await bot.handle_channel_message(make_event({'peer_id': 678910, 'id': 1, 'date': time.time(), 'text': COMBO.format(price=2650.0)}))
+            await bot.handle_channel_message(make_event({'peer_id': 678910, 'id': 2, 'date': time.time(), 'text': 'Good morning everyone'}))
+            with pytest.raises(ValueError):
+                await bot.handle_channel_message(make_event({'peer_id': 999, 'id': 3, 'date': time.time(), 'text': COMBO.format(price=2650.0)}))
+            positions = [await trader.get_positions() for trader in bot.traders]
+        finally:
+            await bot.traders.shutdown()
+        return positions, bot.notifier.messages
+    positions, messages = asyncio.run(main())
+    assert [len(trader_positions) for trader_positions in positions] == [2, 0]
+    assert all(position['type'] == 0 for position in positions[0])
+    trader_1 = [message for chat_id, message in messages if chat_id == -1]
+    trader_2 = [message for chat_id, message in messages if chat_id == -2]
+    assert trader_1[0].startswith('[trader-1]\nOrders placed: ')
+    assert 'diff > 1e-06' in trader_2[0]
+    assert all('Bot failed to read the telegram message' in chat_messages[1] for chat_messages in (trader_1, trader_2))
+    assert len(messages) == 4
+
+def test_redelivered_message_is_handled_once(bot_config):
+    bot_config['traders'] = bot_config['traders'][:1]
+    async def main():
+        bot = TelegramBot(bot_config)
+        bot.notifier = ReplayNotifier()
+        await bot.traders.start()
+        try:
+            event = make_event({'peer_id': 678910, 'id': 1, 'date': time.time(), 'text': COMBO.format(price=2650.0)})
+            await bot.handle_channel_message(event)
+            await bot.handle_channel_message(event)
+            return await bot.traders[0].get_positions()
+        finally:
+            await bot.traders.shutdown()
+    assert len(asyncio.run(main())) == 2
+
+def test_closed_market_is_skipped_before_the_terminal(bot_config):
+    # no session on any day
+    bot_config['traders'][1]['trading_sessions'] = {}
+    async def main():
+        bot = TelegramBot(bot_config)
+        bot.notifier = ReplayNotifier()
+        await bot.traders.start()
+        try:
+            await bot.handle_channel_message(make_event({'peer_id': 678910, 'id': 1, 'date': time.time(), 'text': COMBO.format(price=2650.0)}))
+            positions = [await trader.get_positions() for trader in bot.traders]
+        finally:
+            await bot.traders.shutdown()
+        return positions, bot.notifier.messages
+    positions, messages = asyncio.run(main())
+    assert [len(trader_positions) for trader_positions in positions] == [2, 0]
+    assert (-2, '[trader-2]\nSignal skipped, XAUUSD market is closed') in messages
+    assert len([message for chat_id, message in messages if chat_id == -2]) == 1
+
+def test_max_exposure_counts_the_planned_orders(bot_config):
+    # 2 legs of 0.8 lots on a flat account
+    bot_config['traders'] = bot_config['traders'][:1]
+    bot_config['traders'][0]['risk_rules'] = [{'type': 'max_exposure', 'lots': 1}]
+    async def main():
+        bot = TelegramBot(bot_config)
+        bot.notifier = ReplayNotifier()
+        await bot.traders.start()
+        try:
+            await bot.handle_channel_message(make_event({'peer_id': 678910, 'id': 1, 'date': time.time(), 'text': COMBO.format(price=2650.0)}))
+            return await bot.traders[0].get_positions(), bot.notifier.messages
+        finally:
+            await bot.traders.shutdown()
+    positions, messages = asyncio.run(main())
+    assert positions == []
+    assert messages == [(-1, '[trader-1]\nOpen buy volume [0] + planned [1.6] > max exposure 1 lots')]
+
+class IdleClient:
+    # the telegram client start() talks to, disconnected once the terminals are up
+    def __init__(self, bot):
+        self.bot = bot
+        self.collectors_while_running = None
+
+    async def start(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    async def send_message(self, entity, message):
+        pass
+
+    def add_event_handler(self, handler, event):
+        pass
+
+    async def run_until_disconnected(self):
+        await self.bot.traders_ready
+        self.collectors_while_running = list(REGISTRY.collectors)
+
+async def run_bot(bot_config) -> TelegramBot:
+    bot = TelegramBot(bot_config)
+    bot.client = IdleClient(bot)
+    bot.clients = {'telegram_session': bot.client}
+    bot.notifier.client = bot.client
+    async def resolve_chats(signals):
+        return [678910]
+    bot.resolve_chats = resolve_chats
+    await bot.start()
+    return bot
+
+def test_each_run_removes_its_metrics_collector(bot_config):
+    bot_config.update({'catch_up_state': '', 'config_reload_interval': 0})
+    collectors = list(REGISTRY.collectors)
+    for _ in range(2):
+        bot = asyncio.run(run_bot(bot_config))
+        assert bot.client.collectors_while_running == collectors + [bot.collect_metrics]
+        assert REGISTRY.collectors == collectors
+
+def test_run_closes_the_trace_log(bot_config):
+    bot_config.update({'catch_up_state': '', 'config_reload_interval': 0, 'trace_log': 'signal_trace.log'})
+    bot = asyncio.run(run_bot(bot_config))
+    assert bot.trace_log._file.closed
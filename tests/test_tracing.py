@@ -0,0 +1,47 @@
+import asyncio
+import time
+from src.replay import ReplayNotifier, make_event
+from src.telegram_bot import TelegramBot
+from src.tracing import SignalTrace, format_report, load, summarize
+
+COMBO = 'XAUUSD 1/3 Combo\n入場方向: Long🟢\n現價: 2650.0\n\n\n\n15mins: Uptrend\n1hr: Uptrend'
+
+def spans(record, trader):
+    return {name: (start, duration) for span_trader, name, start, duration in record['spans'] if span_trader == trader}
+
+def test_trader_laps_start_at_begin():
+    trace = SignalTrace(678910, 1, time.time())
+    trace.lap('parse')
+    time.sleep(0.05)
+    trace.begin('trader-1')
+    trace.lap('queue', 'trader-1')
+    trace.lap('check_price_diff', 'trader-1')
+    trader = spans(trace.to_record(), 'trader-1')
+    assert trader['queue'][0] >= 50
+    assert trader['queue'][1] < 50
+    # spans are rounded to the microsecond
+    assert trader['check_price_diff'][0] >= trader['queue'][0] + trader['queue'][1] - 0.002
+
+def test_signal_trace_is_written_per_signal(bot_config):
+    bot_config['trace_log'] = 'signal_trace.log'
+    async def main():
+        bot = TelegramBot(bot_config)
+        bot.notifier = ReplayNotifier()
+        await bot.traders.start()
+        try:
+            await bot.handle_channel_message(make_event({'peer_id': 678910, 'id': 1, 'date': time.time(), 'text': COMBO}))
+        finally:
+            await bot.traders.shutdown()
+            bot.trace_log.close()
+    asyncio.run(main())
+    [record] = load('signal_trace.log')
+    assert (record['src'], record['msg']) == (678910, 1)
+    planned = spans(record, None)['plan_orders']
+    for trader in ('trader-1', 'trader-2'):
+        queue = spans(record, trader)['queue']
+        # from the enqueue, not the trace start
+        assert queue[0] >= planned[0] + planned[1] - 0.002
+    assert {'order_send[0]', 'order_send[1]', 'place_orders'} <= set(spans(record, 'trader-1'))
+    assert 'check_price_diff' in spans(record, 'trader-2')
+    report = format_report(summarize([record]))
+    assert 'trader-1' in report and 'receive_lag' in report